@@ -0,0 +1,71 @@
+import json
+import re
+from typing import Dict, List, Tuple
+
+from app.data_collect_clean import tokens
+
+BATCH_INSTRUCTION = (
+    "\n\n- BatchMode: 用户输入包含多条记录，每条以 [编号] 开头。"
+    "请对每条记录分别按上述要求独立处理，只输出一个 JSON 对象，"
+    "键为记录编号（不含方括号），值为该记录的处理结果字符串，不要输出其他内容。"
+)
+
+_THINK_RE = re.compile(r"<think>.*?</think>", re.S)
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+
+
+def pack_batches(items: List[Tuple[str, str]], max_records: int, token_budget: int) -> List[List[Tuple[str, str]]]:
+    """按记录数和 token 预算把 (key, content) 打包成批次"""
+    batches = []
+    current = []
+    current_tokens = 0
+    for key, content in items:
+        content_tokens = tokens.estimate_tokens(content)
+        if current and (len(current) >= max_records or current_tokens + content_tokens > token_budget):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append((key, content))
+        current_tokens += content_tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def build_batch_prompt(batch: List[Tuple[str, str]]) -> Tuple[str, Dict[str, str]]:
+    """生成批量请求内容，返回 (用户内容, 编号 -> 记录 key)"""
+    keys = {}
+    parts = []
+    for i, (key, content) in enumerate(batch, 1):
+        label = f"r{i}"
+        keys[label] = key
+        parts.append(f"[{label}]\n{content}")
+    return "\n\n".join(parts), keys
+
+
+def parse_batch_response(text: str, keys: Dict[str, str]) -> Dict[str, str]:
+    """
+    解析批量响应，返回 记录 key -> 结果。
+    无法解析或缺失、为空的记录不出现在结果中，由调用方单条重试。
+    """
+    if not text:
+        return {}
+    text = _FENCE_RE.sub("", _THINK_RE.sub("", text)).strip()
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        start, end = text.find("{"), text.rfind("}")
+        if start < 0 or end <= start:
+            return {}
+        try:
+            data = json.loads(text[start : end + 1])
+        except json.JSONDecodeError:
+            return {}
+    if not isinstance(data, dict):
+        return {}
+
+    results = {}
+    for label, value in data.items():
+        label = str(label).strip("[] ")
+        if label in keys and isinstance(value, str) and value.strip():
+            results[keys[label]] = value.strip()
+    return results
@@ -1,15 +1,27 @@
+import hashlib
 import re
+import time
 import logging
 from abc import ABC, abstractmethod
-from retrying import retry
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from openai import OpenAI
 from datetime import datetime
 from config.settings import settings
 from tqdm import tqdm
 from app.db import base
+from app.data_collect_clean import batching, dedup, filters, hedging, llm_cache, llm_controller, mail_reducer, normalize, relevance, tokens
 
 logger = logging.getLogger(__name__)
 
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def content_hash(title, body) -> str:
+    """标题和正文的内容哈希，忽略空白差异，用于判断记录是否被编辑过"""
+    text = _WHITESPACE_RE.sub(" ", f"{title or ''}\n{body or ''}").strip()
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
 
 class Record:
     def __init__(self, base_data, processed):
@@ -33,6 +45,10 @@ class FormattedRecord:
         source_type,
         source_id,
         source_closed,
+        tokens_saved=0,
+        duplicate_of=None,
+        content_hash=None,
+        change_status=None,
     ):
         self.title = title
         self.body = body
@@ -47,103 +63,628 @@ class FormattedRecord:
         self.source_type = source_type
         self.source_id = source_id
         self.source_closed = source_closed
+        self.tokens_saved = tokens_saved
+        # 近似重复记录关联的规范记录，格式为 "source_type:source_id"
+        self.duplicate_of = duplicate_of
+        self.content_hash = content_hash
+        # new / changed / unchanged，存储层据此决定是否覆盖 clean_data
+        self.change_status = change_status
 
 
 class BaseCleaner(ABC):
+    # 社区标识，用于从 CLEAN_FILTERS 中加载排除规则
+    community = None
+
     def __init__(self, collector):
+        # 重试由 llm_controller 统一处理，关闭客户端自带的重试
         self.client = OpenAI(
-            api_key=settings.llm_api_key, base_url=settings.llm_api_url
+            api_key=settings.llm_api_key,
+            base_url=settings.llm_api_url,
+            timeout=settings.llm_request_timeout,
+            max_retries=0,
         )
+        self.llm_controller = llm_controller.controller
+        self.llm_hedger = hedging.hedger
+        # time.monotonic() 时间点，由 process 传入并向每次调用传递
+        self._run_deadline = None
         self.collector = collector
         self.model = settings.llm_model
         self.system_prompt = self._get_system_prompt()
+        self.exclusion_filter = filters.ExclusionFilter.from_config(
+            settings.clean_filters, self.community, self.source_type
+        )
+        self.concurrency = max(1, int(settings.llm_concurrency or 1))
+        self.stats = {}
+        self.llm_cache = llm_cache.response_cache
+        # source_id -> 是否已有 clean_data，由 _prefetch_existing 按批次预取
+        self._existing_index = {}
+        # source_id -> 库中记录的内容哈希
+        self._stored_hashes = {}
+        self.batch_enabled = settings.llm_batch_enabled
+        # source_id -> 批量请求得到的结果
+        self._batched_summaries = {}
+        self._batch_stats = {}
+        # 预处理阶段校验失败的记录，逐条处理时直接抛出，避免重复校验
+        self._rejected = {}
+        self.dedup_index = (
+            dedup.NearDuplicateIndex(
+                threshold=settings.dedup_threshold,
+                num_perm=settings.dedup_num_perm,
+                bands=settings.dedup_bands,
+                shingle_size=settings.dedup_shingle_size,
+                max_chars=settings.dedup_max_chars,
+                window_days=settings.dedup_window_days,
+            )
+            if settings.dedup_enabled
+            else None
+        )
+        # source_id -> (规范记录 (source_id, source_type), 摘要)；本批内的规范记录摘要尚未生成时为 None
+        self._duplicate_of = {}
+        # 规范记录 (source_id, source_type) -> 摘要的 Future，本批内的重复记录等待它完成
+        self._canonical_futures = {}
+        self._signatures = {}
+        self._dedup_entries = []
+        self._dedup_stats = {}
+        # source_id -> (去除的字符数, 去除的 token 数)，邮件精简的统计
+        self._mail_reductions = {}
+        # 本轮命中的排除规则 (字段, 规则)，结束时一次合并到 exclusion_filter 的统计中
+        self._exclusion_hits = []
+        self.relevance_gate = relevance.gate
+        # source_id -> 本轮处理失败的异常
+        self.failures = {}
+        # source_id -> (是否相关, 分数)
+        self._relevance = {}
 
     @abstractmethod
     def _get_system_prompt(self) -> str:
         pass
 
-    @retry(stop_max_attempt_number=3, wait_fixed=1000)
     def _llm_process(self, content):
+        cache_key = None
+        if self.llm_cache.enabled:
+            cache_key = self.llm_cache.make_key(self.model, self.system_prompt, content)
+            cached = self.llm_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        result = self._llm_request(content)
+        if cache_key:
+            self.llm_cache.set(cache_key, self.model, result)
+        return result
+
+    def _llm_request(self, content, system_prompt=None):
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": content},
-                ],
+            return self.llm_controller.call(
+                lambda: self._chat_completion(content, system_prompt or self.system_prompt),
+                deadline=self._run_deadline,
             )
-            return response.choices[0].message.content
         except Exception as e:
             logger.error(f"API调用失败: {str(e)}")
             raise
 
+    def _chat_completion(self, content, system_prompt):
+        return self.llm_hedger.complete(
+            self.client,
+            self.model,
+            [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": content},
+            ],
+            deadline=self._run_deadline,
+            controller=self.llm_controller,
+        )
+
     def _basic_clean(self, text):
-        text = re.sub(r"<.*?>", "", text)
-        return re.sub(r"[^\u4e00-\u9fa5a-zA-Z0-9，。！？；：、]", " ", text).strip()
+        return normalize.basic_clean(text)
 
     def _basic_clean_before_llm(self, text):
-        text = re.sub(r"(?m)^\s*发件人：.*$", "", text)
-        text = re.sub(r"(?m)^\s*发送日期：.*$", "", text)
-        text = re.sub(r"(?m)^\s*收件人：.*$", "", text)
-        # 多个空格合并为一个空格
-        text = re.sub(r"\s+", " ", text)
-        # 去除多余空白
-        return text.strip()
-    
-    def process(self, start_date):
+        return normalize.clean_before_llm(text)
+
+    def _truncate_blocks(self, body):
+        return tokens.truncate_blocks(
+            body, settings.llm_block_head_lines, settings.llm_block_tail_lines
+        )
+
+    def _summarize(self, title, body):
+        """
+        按 token 预算调用大模型：截断代码块和日志段，超长正文走分块摘要再汇总。
+        返回 (摘要, 相比直接发送全文节省的 token 数)。分块摘要时各块与汇总请求合计可能超过全文，此时节省数为 0。
+        """
+        full_tokens = tokens.estimate_tokens(f"标题：{title}\n内容：{body}")
+        reduced = self._truncate_blocks(body)
+        sent_tokens = 0
+        if tokens.estimate_tokens(reduced) > settings.llm_map_reduce_threshold:
+            chunks = tokens.split_chunks(reduced, settings.llm_chunk_tokens)
+            partials = []
+            for i, chunk in enumerate(chunks, 1):
+                content = f"标题：{title}\n内容（第{i}/{len(chunks)}部分）：{chunk}"
+                sent_tokens += tokens.estimate_tokens(content)
+                partials.append(self._llm_process(content))
+            reduced = "\n".join(partials)
+        content = tokens.fit_to_budget(
+            f"标题：{title}\n内容：{reduced}", settings.llm_max_input_tokens
+        )
+        sent_tokens += tokens.estimate_tokens(content)
+        return self._llm_process(content), max(0, full_tokens - sent_tokens)
+
+    def process(self, start_date, deadline=None):
         data_before_clean = self.collector.collect(start_date)
+        yield from self.process_records(data_before_clean, deadline=deadline)
+
+    def process_records(self, data_before_clean, deadline=None):
+        """清洗已采集的数据，失败的记录保存在 self.failures 中"""
+        self._run_deadline = deadline
+        self._mail_reductions = {}
+        self._exclusion_hits = []
+        self._relevance = {}
+        self.failures = {}
+        self.llm_cache.evict()
+        data_before_clean = self._unique_records(data_before_clean)
+        self._prefetch_existing(data_before_clean)
+        if self.relevance_gate.mode == "deprioritize":
+            data_before_clean = self._deprioritize_irrelevant(data_before_clean)
+        self._prepare_llm_work(data_before_clean)
+        total = len(data_before_clean)
+        succeeded = 0
+        tokens_saved = 0
+        change_counts = {"new": 0, "changed": 0, "unchanged": 0}
+        started = time.monotonic()
+        if self.concurrency > 1:
+            records = self._process_concurrently(data_before_clean)
+        else:
+            records = self._process_sequentially(data_before_clean)
+        for record in records:
+            succeeded += 1
+            tokens_saved += getattr(record, "tokens_saved", 0)
+            if getattr(record, "change_status", None) in change_counts:
+                change_counts[record.change_status] += 1
+            yield record
+        self._persist_signatures()
+        self.exclusion_filter.merge_hits(self._exclusion_hits)
+        self._report_throughput(total, succeeded, time.monotonic() - started, tokens_saved, change_counts)
+
+    def _unique_records(self, data_before_clean):
+        """采集结果中重复出现的同一记录只处理第一次；本清洗器只处理一种数据源，按 source_id 即可区分"""
+        seen = set()
+        unique = []
+        for raw_data in data_before_clean:
+            source_id = raw_data.get("id")
+            if source_id is not None:
+                if str(source_id) in seen:
+                    continue
+                seen.add(str(source_id))
+            unique.append(raw_data)
+        if len(unique) < len(data_before_clean):
+            logger.info(f"{self.source_type} 采集结果中有 {len(data_before_clean) - len(unique)} 条重复记录，已跳过")
+        return unique
+
+    def _process_sequentially(self, data_before_clean):
         for raw_data in tqdm(data_before_clean, desc="Processing data"):
             try:
-                record = self._build_record(raw_data)
-                yield record
+                yield self._build_record(raw_data)
+            except Exception as e:
+                self._log_failure(raw_data, e)
+
+    def _process_concurrently(self, data_before_clean):
+        """并发调用大模型，按采集顺序输出结果，单条失败不影响其他记录"""
+        # 在途任务数限制为并发数的两倍，既保证线程池不空转，也避免一次性提交全部数据
+        window = self.concurrency * 2
+        pending = deque()
+        with ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix=f"{self.source_type}-cleaner"
+        ) as executor, tqdm(total=len(data_before_clean), desc="Processing data") as progress:
+            for raw_data in data_before_clean:
+                pending.append((raw_data, executor.submit(self._build_record, raw_data)))
+                if len(pending) >= window:
+                    yield from self._collect_finished(pending, progress, limit=1)
+            yield from self._collect_finished(pending, progress)
+
+    def _collect_finished(self, pending, progress, limit=None):
+        collected = 0
+        while pending and (limit is None or collected < limit):
+            raw_data, future = pending.popleft()
+            collected += 1
+            try:
+                record = future.result()
             except Exception as e:
-                logger.error(f"处理失败: {raw_data.get('id', '未知ID')} - {str(e)}")
+                self._log_failure(raw_data, e)
+                continue
+            finally:
+                progress.update(1)
+            yield record
+
+    def _log_failure(self, raw_data, error):
+        self.failures[str(raw_data.get("id"))] = error
+        logger.error(f"处理失败: {raw_data.get('id', '未知ID')} - {str(error)}")
+
+    def _report_throughput(self, total, succeeded, elapsed, tokens_saved=0, change_counts=None):
+        throughput = total / elapsed if elapsed > 0 else 0.0
+        self.stats = {
+            "total": total,
+            "succeeded": succeeded,
+            "failed": total - succeeded,
+            "elapsed": elapsed,
+            "throughput": throughput,
+            "tokens_saved": tokens_saved,
+            "changes": change_counts or {},
+            "llm_cache": self.llm_cache.stats(),
+            "batch": self._batch_stats,
+            "dedup": self._dedup_report(),
+            "mail_reduction": self._mail_reduction_report(),
+            "relevance": self._relevance_report(),
+            "llm_controller": self.llm_controller.stats(),
+            "hedging": self.llm_hedger.stats(),
+        }
+        logger.info(
+            f"{self.source_type} 清洗完成: 成功 {succeeded}/{total} 条, "
+            f"并发 {self.concurrency}, 耗时 {elapsed:.1f}s, 吞吐 {throughput:.2f} 条/秒, "
+            f"节省约 {tokens_saved} tokens"
+        )
+        if change_counts:
+            logger.info(
+                f"{self.source_type} 新增 {change_counts['new']} 条, "
+                f"内容变化 {change_counts['changed']} 条, 未变化 {change_counts['unchanged']} 条"
+            )
+        logger.info(f"{self.source_type} 大模型缓存: {self.stats['llm_cache']}")
+        logger.info(f"{self.source_type} 大模型调用: {self.stats['llm_controller']}")
+        logger.info(f"{self.source_type} 对冲请求: {self.stats['hedging']}")
+        if self._batch_stats:
+            logger.info(f"{self.source_type} 批量请求: {self._batch_stats}")
+        if self.stats["mail_reduction"]:
+            logger.info(f"{self.source_type} 邮件引用/签名精简: {self.stats['mail_reduction']}")
+        if self.stats["relevance"]:
+            logger.info(f"{self.source_type} 相关性判定: {self.stats['relevance']}")
+        if self.stats["dedup"]:
+            logger.info(f"{self.source_type} 近似重复: {self.stats['dedup']}")
+        logger.info(f"{self.source_type} 排除规则命中: {self.exclusion_filter.hit_counts()}")
+
+    EXIST_LOOKUP_CHUNK_SIZE = 1000
+
+    def _prefetch_existing(self, data_before_clean):
+        """一次性批量查询本批数据在库中的状态，替代逐条 _is_exist 查询"""
+        source_ids = list({str(d["id"]) for d in data_before_clean if "id" in d})
+        index = {source_id: False for source_id in source_ids}
+        hashes = {}
+        try:
+            with base.SessionLocal() as session:
+                for i in range(0, len(source_ids), self.EXIST_LOOKUP_CHUNK_SIZE):
+                    chunk = source_ids[i : i + self.EXIST_LOOKUP_CHUNK_SIZE]
+                    rows = session.query(
+                        base.Discussion.source_id, base.Discussion.clean_data, base.Discussion.content_hash
+                    ).filter(
+                        base.Discussion.source_type == self.source_type,
+                        base.Discussion.source_id.in_(chunk),
+                    )
+                    for source_id, clean_data, stored_hash in rows:
+                        index[source_id] = bool(clean_data)
+                        hashes[source_id] = stored_hash
+        except Exception as e:
+            logger.warning(f"批量查询已存在记录失败，回退为逐条查询: {str(e)}")
+            self._existing_index = {}
+            self._stored_hashes = {}
+            return
+        self._existing_index = index
+        self._stored_hashes = hashes
+        logger.info(
+            f"{self.source_type} 已存在记录 {sum(index.values())}/{len(index)} 条"
+        )
 
     def _is_exist(self, source_id: str) -> bool:
+        if source_id in self._existing_index:
+            return self._existing_index[source_id]
         with base.SessionLocal() as session:
             existing_record = (
                 session.query(base.Discussion)
-                .filter(base.Discussion.source_id == source_id)
+                .filter(
+                    base.Discussion.source_id == source_id,
+                    base.Discussion.source_type == self.source_type,
+                )
                 .first()
             )
             if not existing_record:
                 return False
+            self._stored_hashes[source_id] = existing_record.content_hash
             if not existing_record.clean_data:
                 return False
             return True
 
-    @abstractmethod
+    def _change_status(self, raw_data) -> str:
+        """
+        new：库中没有摘要；changed：内容哈希与库中不同，需要重新摘要；unchanged：沿用已有摘要。
+        库中尚无哈希的旧记录视为未变化，由本次写入补齐哈希
+        """
+        source_id = str(raw_data["id"])
+        if not self._is_exist(source_id):
+            return "new"
+        stored = self._stored_hashes.get(source_id)
+        if stored and stored != content_hash(raw_data["title"], raw_data["body"]):
+            return "changed"
+        return "unchanged"
+
+    def _prepare_llm_work(self, data_before_clean):
+        """调用大模型前的预处理：先做近似重复检测，剩余记录再按批量模式打包"""
+        self._rejected = {}
+        self._batched_summaries = {}
+        self._batch_stats = {}
+        self._duplicate_of = {}
+        self._canonical_futures = {}
+        self._signatures = {}
+        self._dedup_entries = []
+        self._dedup_stats = {}
+        if not (self.batch_enabled or self.dedup_index):
+            return
+
+        pending = []
+        for raw_data in data_before_clean:
+            try:
+                self._validate_raw(raw_data)
+            except ValueError as e:
+                self._rejected[str(raw_data.get("id"))] = e
+                continue
+            if self._change_status(raw_data) == "unchanged":
+                continue
+            if not self._is_relevant(raw_data) and self.relevance_gate.mode == "drop":
+                continue
+            body, _ = self._llm_body(raw_data)
+            if body is None:
+                continue
+            pending.append((raw_data, body))
+
+        if self.dedup_index:
+            pending = self._detect_duplicates(pending)
+        if self.batch_enabled:
+            self._prefill_batched_summaries(pending)
+
+    def _detect_duplicates(self, pending):
+        """近似重复的记录复用规范记录的摘要，返回仍需调用大模型的记录"""
+        signatures = [self.dedup_index.signature(raw_data["title"], body) for raw_data, body in pending]
+        try:
+            self.dedup_index.load_candidates(signatures)
+        except Exception as e:
+            logger.warning(f"加载历史签名失败，仅在本批内去重: {str(e)}")
+        remaining = []
+        cross_run = in_run = 0
+        for (raw_data, body), signature in zip(pending, signatures):
+            source_id = str(raw_data["id"])
+            key = (source_id, self.source_type)
+            self._signatures[source_id] = signature
+            found = self.dedup_index.find_persisted(signature, exclude=key)
+            if found:
+                self._duplicate_of[source_id] = found
+                cross_run += 1
+                continue
+            canonical = self.dedup_index.find_in_run(signature, exclude=key)
+            if canonical:
+                self._duplicate_of[source_id] = (canonical, None)
+                self._canonical_futures.setdefault(canonical, Future())
+                in_run += 1
+                continue
+            self.dedup_index.add_to_run(key, signature)
+            remaining.append((raw_data, body))
+
+        self._dedup_stats = {
+            "checked": len(pending),
+            "duplicates": cross_run + in_run,
+            "cross_run": cross_run,
+            "in_run": in_run,
+            "duplicate_ratio": (cross_run + in_run) / len(pending) if pending else 0.0,
+        }
+        return remaining
+
+    def _is_relevant(self, raw_data) -> bool:
+        """本地分类器判定；log / deprioritize 模式只记录，不拦截"""
+        if not self.relevance_gate.enabled:
+            return True
+        source_id = str(raw_data.get("id"))
+        if source_id not in self._relevance:
+            self._relevance[source_id] = self.relevance_gate.is_relevant(self.source_type, raw_data)
+        return self._relevance[source_id][0]
+
+    def _deprioritize_irrelevant(self, data_before_clean):
+        """需要调用大模型的低分记录排到最后，运行截止时间先到时优先放弃它们"""
+        relevant, deferred = [], []
+        for raw_data in data_before_clean:
+            needs_llm = "id" in raw_data and "title" in raw_data and "body" in raw_data
+            if needs_llm and self._change_status(raw_data) != "unchanged" and not self._is_relevant(raw_data):
+                deferred.append(raw_data)
+            else:
+                relevant.append(raw_data)
+        return relevant + deferred
+
+    def _relevance_report(self):
+        if not self._relevance:
+            return {}
+        scores = [score for _, score in self._relevance.values()]
+        return {
+            "mode": self.relevance_gate.mode,
+            "scored": len(scores),
+            "below_threshold": sum(1 for relevant, _ in self._relevance.values() if not relevant),
+            "mean_score": sum(scores) / len(scores),
+        }
+
+    def _mail_reduction_report(self):
+        if not self._mail_reductions:
+            return {}
+        reductions = list(self._mail_reductions.values())
+        return {
+            "records": len(reductions),
+            "removed_chars": sum(chars for chars, _ in reductions),
+            "removed_tokens": sum(removed for _, removed in reductions),
+        }
+
+    def _dedup_report(self):
+        if not self._dedup_stats:
+            return {}
+        return dict(
+            self._dedup_stats,
+            llm_calls_avoided=sum(1 for entry in self._dedup_entries if entry["canonical"]),
+        )
+
+    def _persist_signatures(self):
+        if not self.dedup_index or not self._dedup_entries:
+            return
+        try:
+            self.dedup_index.persist(self._dedup_entries)
+            self.dedup_index.purge()
+        except Exception as e:
+            logger.warning(f"保存近似重复签名失败: {str(e)}")
+
+    def _record_signature(self, source_id, summary, canonical=None):
+        signature = self._signatures.get(source_id)
+        if signature is None or not summary:
+            return
+        self._dedup_entries.append({
+            "source_id": source_id,
+            "source_type": self.source_type,
+            "signature": signature,
+            "summary": summary,
+            "canonical": canonical,
+        })
+
+    def _reuse_duplicate(self, source_id, title, body):
+        """返回 (规范记录的摘要, 节省的 tokens)；不是重复记录或规范记录失败时返回 None"""
+        duplicate = self._duplicate_of.get(source_id)
+        if duplicate is None:
+            return None
+        canonical, summary = duplicate
+        if summary is None:
+            try:
+                summary = self._canonical_futures[canonical].result(
+                    timeout=settings.llm_request_timeout * settings.llm_max_attempts
+                )
+            except Exception as e:
+                logger.warning(f"{source_id} 的规范记录 {canonical[0]} 未生成摘要，单独调用大模型: {str(e)}")
+                self._duplicate_of.pop(source_id, None)
+                return None
+        self._record_signature(source_id, summary, canonical)
+        logger.info(f"{source_id} 与 {canonical[1]}:{canonical[0]} 近似重复，复用其摘要")
+        return summary, tokens.estimate_tokens(f"标题：{title}\n内容：{body}")
+
+    def _prefill_batched_summaries(self, pending):
+        """批量模式：把较短的记录打包进一次请求，按记录拆分结果；缺失的记录之后单条调用"""
+        candidates = {}
+        for raw_data, body in pending:
+            content = f"标题：{raw_data['title']}\n内容：{self._truncate_blocks(body)}"
+            if tokens.estimate_tokens(content) > settings.llm_batch_record_max_tokens:
+                continue
+            if self.llm_cache.enabled and self.llm_cache.get(
+                self.llm_cache.make_key(self.model, self.system_prompt, content)
+            ) is not None:
+                continue
+            candidates[str(raw_data["id"])] = content
+
+        batches = batching.pack_batches(
+            list(candidates.items()),
+            settings.llm_batch_max_records,
+            settings.llm_batch_token_budget,
+        )
+        if not batches:
+            return
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for results in executor.map(self._run_batch, batches):
+                for source_id, summary in results.items():
+                    self._batched_summaries[source_id] = summary
+                    if self.llm_cache.enabled:
+                        key = self.llm_cache.make_key(self.model, self.system_prompt, candidates[source_id])
+                        self.llm_cache.set(key, self.model, summary)
+
+        self._batch_stats = {
+            "requests": len(batches),
+            "candidates": len(candidates),
+            "batched": len(self._batched_summaries),
+            "fallback": len(candidates) - len(self._batched_summaries),
+        }
+
+    def _run_batch(self, batch):
+        content, keys = batching.build_batch_prompt(batch)
+        try:
+            response = self._llm_request(content, self.system_prompt + batching.BATCH_INSTRUCTION)
+        except Exception as e:
+            logger.warning(f"批量请求失败，{len(batch)} 条记录将单条处理: {str(e)}")
+            return {}
+        results = batching.parse_batch_response(response, keys)
+        if len(results) < len(batch):
+            logger.warning(f"批量响应缺少 {len(batch) - len(results)}/{len(batch)} 条记录，将单条处理")
+        return results
+
     def _is_valid(self, title, body) -> bool:
+        matched = self.exclusion_filter.match(title, body)
+        if matched:
+            self._exclusion_hits.append(matched)
+            field, rule = matched
+            logger.debug(f"命中排除规则 {field}:{rule} - {title}")
+            return False
         return True
 
-    def _build_record(self, raw_data):
+    def _llm_body(self, raw_data):
+        """返回需要交给大模型处理的正文；无需调用大模型时返回 (None, 直接使用的内容)"""
+        if self.source_type == 'mail':
+            body = raw_data["body"]
+            if settings.mail_strip_quotes:
+                body, removed_chars, removed_tokens = mail_reducer.reduce(body)
+                if removed_chars:
+                    self._mail_reductions[str(raw_data["id"])] = (removed_chars, removed_tokens)
+            clean_body = self._basic_clean_before_llm(body)
+            if len(clean_body) <= 1000:
+                return None, f"标题：{raw_data['title']}\n内容：{clean_body}"
+            return clean_body, None
+        return raw_data["body"], None
+
+    def _clean_content(self, raw_data):
+        body, passthrough = self._llm_body(raw_data)
+        if self.source_type == 'mail':
+            logger.info(f"中间清理数据：{body or passthrough}")
+        if body is None:
+            return passthrough, 0
+        source_id = str(raw_data["id"])
+        reused = self._reuse_duplicate(source_id, raw_data["title"], body)
+        if reused is not None:
+            return reused
+        future = self._canonical_futures.get((source_id, self.source_type))
+        try:
+            batched = self._batched_summaries.pop(source_id, None)
+            result = (batched, 0) if batched is not None else self._summarize(raw_data["title"], body)
+        except Exception as e:
+            if future is not None:
+                future.set_exception(e)
+            raise
+        if future is not None:
+            future.set_result(result[0])
+        self._record_signature(source_id, result[0])
+        return result
+
+    def _validate_raw(self, raw_data):
         if not all(k in raw_data for k in ("id", "title", "body")):
             raise ValueError("缺失必要字段")
         if raw_data["body"].strip() == "":
             raise ValueError(f"本数据无效{raw_data['id']} - {raw_data['title']}")
         if not self._is_valid(raw_data["title"], raw_data["body"]):
             raise ValueError(f"本数据无效{raw_data['id']} - {raw_data['title']}")
+
+    def _build_record(self, raw_data):
+        rejected = self._rejected.pop(str(raw_data.get("id")), None)
+        if rejected:
+            raise rejected
+        self._validate_raw(raw_data)
         created_at = raw_data.get("created_at", datetime.now())
         if isinstance(created_at, datetime):
             created_at = created_at.strftime("%Y-%m-%d %H:%M:%S")
         updated_at = raw_data.get("updated_at", None)
         if isinstance(updated_at, datetime):
             updated_at = updated_at.strftime("%Y-%m-%d %H:%M:%S")
-        if not self._is_exist(str(raw_data["id"])):
-            if self.source_type == 'mail':
-                clean_body = self._basic_clean_before_llm(raw_data["body"])
-                logger.info(f"中间清理数据：{clean_body}")
-                if len(clean_body) <= 1000:
-                    llm_content = f"标题：{raw_data['title']}\n内容：{clean_body}"
-                else:
-                    llm_content = self._llm_process(
-                        f"标题：{raw_data['title']}\n内容：{clean_body}"
-                    )
-            else:
-                clean_body = raw_data["body"]
-                llm_content = self._llm_process(
-                    f"标题：{raw_data['title']}\n内容：{clean_body}"
-                )
+        tokens_saved = 0
+        duplicate_of = None
+        change_status = self._change_status(raw_data)
+        if change_status != "unchanged":
+            if not self._is_relevant(raw_data) and self.relevance_gate.mode == "drop":
+                raise ValueError(f"相关性低于阈值，跳过{raw_data['id']} - {raw_data['title']}")
+            if change_status == "changed":
+                logger.info(f"{raw_data['id']} 内容已变化，重新生成摘要")
+            llm_content, tokens_saved = self._clean_content(raw_data)
+            if tokens_saved:
+                logger.info(f"{raw_data['id']} 节省约 {tokens_saved} tokens")
+            if duplicate := self._duplicate_of.get(str(raw_data["id"])):
+                canonical_id, canonical_type = duplicate[0]
+                duplicate_of = f"{canonical_type}:{canonical_id}"
         else:
             llm_content = ""
         return FormattedRecord(
@@ -160,6 +701,10 @@ class BaseCleaner(ABC):
             source_type=self.source_type,
             source_id=raw_data["id"],
             source_closed=raw_data.get("state", "") == "closed",
+            tokens_saved=tokens_saved,
+            duplicate_of=duplicate_of,
+            content_hash=content_hash(raw_data["title"], raw_data["body"]),
+            change_status=change_status,
         )
 
     @property
@@ -206,6 +751,8 @@ def get_forum_cleaner(community, collector):
 
 
 class CANNForumCleaner(BaseCleaner):
+    community = "cann"
+
     @property
     def source_type(self):
         return "forum"
@@ -213,13 +760,10 @@ class CANNForumCleaner(BaseCleaner):
     def _get_system_prompt(self):
         return settings.cann_forum_prompt
 
-    def _is_valid(self, title, body):
-        if re.search(r"从入门到精通|学习|指导|笔记|分享|训练营", title):
-            return False
-        return True
-
 
 class CANNIssueCleaner(BaseCleaner):
+    community = "cann"
+
     @property
     def source_type(self):
         return "issue"
@@ -227,20 +771,9 @@ class CANNIssueCleaner(BaseCleaner):
     def _get_system_prompt(self):
         return settings.cann_issue_prompt
 
-    def _is_valid(self, title, body):
-        if re.search(r"从入门到精通|学习|指导|笔记|分享|训练营|test", title):
-            return False
-        return True
-
 
 class OpenUBMCForumCleaner(BaseCleaner):
-    def _is_valid(self, title, body):
-        if re.search(
-            r"维护通知|QA 运作规则讨论|指南|例会|启航行动|一键创建|模板|变更声明|qqqq|openUBMC各sig组本周|投票|FAQ|活动|【维护通知】",
-            title,
-        ):
-            return False
-        return True
+    community = "openubmc"
 
     @property
     def source_type(self):
@@ -251,6 +784,8 @@ class OpenUBMCForumCleaner(BaseCleaner):
 
 
 class OpenUBMCIssueCleaner(BaseCleaner):
+    community = "openubmc"
+
     @property
     def source_type(self):
         return "issue"
@@ -259,13 +794,10 @@ class OpenUBMCIssueCleaner(BaseCleaner):
     def _get_system_prompt(self):
         return settings.openubmc_issue_prompt
 
-    def _is_valid(self, title, body):
-        if re.search(r"模板|指南|normally open|自动生成代码|引入了几个实体", title):
-            return False
-        return True
-
 
 class OpenGaussIssueCleaner(BaseCleaner):
+    community = "opengauss"
+
     @property
     def source_type(self):
         return "issue"
@@ -273,13 +805,10 @@ class OpenGaussIssueCleaner(BaseCleaner):
     def _get_system_prompt(self):
         return settings.opengauss_issue_prompt
 
-    def _is_valid(self, title, body):
-        if re.search(r"用户数据迁移授权协议|个人信息迁移同意书|normally open", title):
-            return False
-        return True
-
 
 class OpenGaussMailCleaner(BaseCleaner):
+    community = "opengauss"
+
     @property
     def source_type(self):
         return "mail"
@@ -287,17 +816,10 @@ class OpenGaussMailCleaner(BaseCleaner):
     def _get_system_prompt(self):
         return settings.opengauss_mail_prompt
 
-    def _is_valid(self, title, body):
-        if re.search(
-            r"例会|公示|公告|纪要|非问题|公式关闭|升级通知|会议|转测试", title
-        ):
-            return False
-        if re.search(r"邀请您参加|会议主题", body):
-            return False
-        return True
-
 
 class OpenEulerMailCleaner(BaseCleaner):
+    community = "openeuler"
+
     @property
     def source_type(self):
         return "mail"
@@ -305,18 +827,10 @@ class OpenEulerMailCleaner(BaseCleaner):
     def _get_system_prompt(self):
         return settings.openeuler_mail_prompt
 
-    def _is_valid(self, title, body):
-        if re.search(
-            r"例会|公示|公告|纪要|非问题|公式关闭|升级|会议|转测试|订阅|年报|月报|需求持续收集中|[PATCH]|进度报告|议题申报|提醒|告警|申请|说明|指南|议程|OLK|感谢信|兼容性列表需求",
-            title,
-        ):
-            return False
-        if re.search(r"邀请您参加|会议主题", body):
-            return False
-        return True
-
 
 class MindSporeForumCleaner(BaseCleaner):
+    community = "mindspore"
+
     @property
     def source_type(self):
         return "forum"
@@ -324,13 +838,10 @@ class MindSporeForumCleaner(BaseCleaner):
     def _get_system_prompt(self):
         return settings.mindspore_forum_prompt
 
-    def _is_valid(self, title, body):
-        if re.search(r"指南|干货小卖部|开发者说|课程|体验|0day同步！|扩散模型|应用系列|推导", title):
-            return False
-        return True
-
 
 class OpenEulerForumCleaner(BaseCleaner):
+    community = "openeuler"
+
     @property
     def source_type(self):
         return "forum"
@@ -338,18 +849,10 @@ class OpenEulerForumCleaner(BaseCleaner):
     def _get_system_prompt(self):
         return settings.openeuler_forum_prompt
 
-    def _is_valid(self, title, body):
-        if re.search(
-            r"练习|综合实践|test|指南$|攻略$|探究|问题收集|公告|用户体验提升|分享|基于anaconda的搭建|网赌|【openEuler系列】|贡献报告|加油|新世界|经验总结|升级专项|升级专题|基线升级|软件包升级|",
-            title,
-        ):
-            return False
-        if re.search(r"实验介绍|已被社区举报", body):
-            return False
-        return True
-
 
 class MindSporeIssueCleaner(BaseCleaner):
+    community = "mindspore"
+
     @property
     def source_type(self):
         return "issue"
@@ -357,31 +860,13 @@ class MindSporeIssueCleaner(BaseCleaner):
     def _get_system_prompt(self):
         return settings.mindspore_issue_prompt
 
-    def _is_valid(self, title, body):
-        if re.search(r"开源实习|测试任务|任务|-教程|CVE-|优化|clean code|代码示例|【自提单】|Code Check|大赛|活动|交流帖|更新版本|实习|官网用例", title):
-            return False
-        if re.search(r"转测对象", body):
-            return False
-        return True
-
 
 class OpenEulerIssueCleaner(BaseCleaner):
+    community = "openeuler"
+
     @property
     def source_type(self):
         return "issue"
 
     def _get_system_prompt(self):
         return settings.openeuler_issue_prompt
-
-    def _is_valid(self, title, body):
-        pattern = (
-            r"需求征集|English translation|补丁|CVE-|【EulerMaker】|【OEPKG】|【openEuler 25.03】|技术测评|"
-            "软件包贡献|【Easysoftware】|公告|技术交流|【22.03-SP4】|OLK|调研|特性|【EUR】|test|【EasySoftware】|"
-            "汇总|文档和脚本整理|请忽略|建议升级|探索|开发路线图|迁移至|数据集生成工具|实习|模板|构建流程优化|问题清单|"
-            "代码提交规范|文档捉虫|111|添加贡献说明|Changelog异常整改|changelog信息显示混乱|汇报|需求收集|构建失败，请及时处理"
-        )
-        if re.search(pattern, title):
-            return False
-        if re.search(r"openEuler-AutoRepair|特性描述|开源之夏|参考上游社区，更新该软件包|Current Latest upstream version|openEuler Embedded CI-:x:FAILD", body):
-            return False
-        return True
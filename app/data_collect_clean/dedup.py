@@ -0,0 +1,222 @@
+import hashlib
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert
+from app.db import base
+
+logger = logging.getLogger(__name__)
+
+_MAX_HASH = (1 << 64) - 1
+_NORMALIZE_RE = re.compile(r"[\W_]+")
+
+SourceKey = Tuple[str, str]
+
+
+def normalize(title: str, body: str, max_chars: int = 4000) -> str:
+    text = f"{title or ''} {body or ''}".lower()
+    return _NORMALIZE_RE.sub("", text)[:max_chars]
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def minhash(text: str, num_perm: int = 64, shingle_size: int = 4) -> List[int]:
+    """
+    单次哈希的 MinHash（one permutation hashing）：
+    每个 shingle 只计算一次 64 位哈希，按哈希值分桶取桶内最小值，空桶向后借用相邻桶的值。
+    """
+    if len(text) < shingle_size:
+        shingles = {text} if text else set()
+    else:
+        shingles = {text[i : i + shingle_size] for i in range(len(text) - shingle_size + 1)}
+    signature = [_MAX_HASH] * num_perm
+    for shingle in shingles:
+        h = _hash64(shingle)
+        slot, value = h % num_perm, h // num_perm
+        if value < signature[slot]:
+            signature[slot] = value
+    filled = [i for i, v in enumerate(signature) if v != _MAX_HASH]
+    if not filled:
+        return signature
+    for i in range(num_perm):
+        if signature[i] == _MAX_HASH:
+            j = next((f for f in filled if f > i), filled[0])
+            # 借用的值按距离加上偏移，使其不会与桶内真实的最小值相等
+            signature[i] = signature[j] + (((j - i) % num_perm) << 58)
+    return signature
+
+
+def similarity(a: List[int], b: List[int]) -> float:
+    if not a or len(a) != len(b):
+        return 0.0
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def band_keys(signature: List[int], bands: int) -> List[int]:
+    rows = len(signature) // bands
+    keys = []
+    for band in range(bands):
+        chunk = signature[band * rows : (band + 1) * rows]
+        digest = hashlib.blake2b(f"{band}:{chunk}".encode("utf-8"), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "big", signed=True))
+    return keys
+
+
+class NearDuplicateIndex:
+    """
+    近似重复检测。LSH 分桶键持久化在 signature_band 表中，签名和摘要保存在 discussion_signature 表中，
+    跨运行、跨数据源（issue / forum / mail）查找。
+    """
+
+    LOOKUP_CHUNK_SIZE = 1000
+
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 4,
+        max_chars: int = 4000,
+        window_days: int = 90,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm 必须能被 bands 整除")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        self.max_chars = max_chars
+        self.window = timedelta(days=window_days)
+        # 本轮已登记的签名：key -> (签名, 分桶键)
+        self._run_entries: Dict[SourceKey, List[int]] = {}
+        self._run_buckets: Dict[int, List[SourceKey]] = {}
+        # 历史记录：key -> (签名, 摘要)
+        self._persisted: Dict[SourceKey, Tuple[List[int], str]] = {}
+        self._persisted_buckets: Dict[int, List[SourceKey]] = {}
+
+    def signature(self, title: str, body: str) -> List[int]:
+        return minhash(normalize(title, body, self.max_chars), self.num_perm, self.shingle_size)
+
+    def load_candidates(self, signatures: Iterable[List[int]]):
+        """按本批签名的分桶键批量加载历史候选"""
+        keys = list({k for sig in signatures for k in band_keys(sig, self.bands)})
+        self._persisted, self._persisted_buckets = {}, {}
+        if not keys:
+            return
+        since = datetime.now(timezone.utc) - self.window
+        with base.SessionLocal() as session:
+            for i in range(0, len(keys), self.LOOKUP_CHUNK_SIZE):
+                rows = (
+                    session.query(
+                        base.SignatureBand.band_key,
+                        base.DiscussionSignature.source_id,
+                        base.DiscussionSignature.source_type,
+                        base.DiscussionSignature.signature,
+                        base.DiscussionSignature.summary,
+                    )
+                    .join(base.DiscussionSignature, base.SignatureBand.signature_id == base.DiscussionSignature.id)
+                    .filter(
+                        base.SignatureBand.band_key.in_(keys[i : i + self.LOOKUP_CHUNK_SIZE]),
+                        base.DiscussionSignature.created_at >= since,
+                        base.DiscussionSignature.summary.isnot(None),
+                        base.DiscussionSignature.summary != "",
+                    )
+                )
+                for band_key, source_id, source_type, signature, summary in rows:
+                    key = (source_id, source_type)
+                    self._persisted[key] = (signature, summary)
+                    self._persisted_buckets.setdefault(band_key, []).append(key)
+
+    def find_persisted(self, signature: List[int], exclude: SourceKey = None) -> Optional[Tuple[SourceKey, str]]:
+        best = self._best_match(signature, self._persisted_buckets, lambda k: self._persisted[k][0], exclude)
+        return (best, self._persisted[best][1]) if best else None
+
+    def find_in_run(self, signature: List[int], exclude: SourceKey = None) -> Optional[SourceKey]:
+        return self._best_match(signature, self._run_buckets, self._run_entries.get, exclude)
+
+    def add_to_run(self, key: SourceKey, signature: List[int]):
+        self._run_entries[key] = signature
+        for band_key in band_keys(signature, self.bands):
+            self._run_buckets.setdefault(band_key, []).append(key)
+
+    def _best_match(self, signature, buckets, get_signature, exclude) -> Optional[SourceKey]:
+        best, best_score = None, self.threshold
+        seen = set()
+        for band_key in band_keys(signature, self.bands):
+            for key in buckets.get(band_key, ()):
+                if key in seen or key == exclude:
+                    continue
+                seen.add(key)
+                score = similarity(signature, get_signature(key))
+                if score >= best_score:
+                    best, best_score = key, score
+        return best
+
+    def persist(self, entries: List[dict]):
+        """
+        批量保存签名、摘要和规范记录关联，entries 中每项包含
+        source_id、source_type、signature、summary、canonical（SourceKey 或 None）
+        """
+        if not entries:
+            return
+        now = datetime.now(timezone.utc)
+        # 同一批次中同一记录只保留最后一次
+        rows = {
+            (e["source_id"], e["source_type"]): {
+                "source_id": e["source_id"],
+                "source_type": e["source_type"],
+                "signature": e["signature"],
+                "summary": e["summary"],
+                "canonical_source_id": (e.get("canonical") or (None, None))[0],
+                "canonical_source_type": (e.get("canonical") or (None, None))[1],
+                "created_at": now,
+            }
+            for e in entries
+        }
+        rows = list(rows.values())
+        with base.SessionLocal() as session:
+            for i in range(0, len(rows), self.LOOKUP_CHUNK_SIZE):
+                chunk = rows[i : i + self.LOOKUP_CHUNK_SIZE]
+                stmt = insert(base.DiscussionSignature).values(chunk)
+                result = session.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=["source_id", "source_type"],
+                        set_={
+                            col: stmt.excluded[col]
+                            for col in ("signature", "summary", "canonical_source_id", "canonical_source_type", "created_at")
+                        },
+                    ).returning(
+                        base.DiscussionSignature.id,
+                        base.DiscussionSignature.source_id,
+                        base.DiscussionSignature.source_type,
+                    )
+                )
+                ids = {(source_id, source_type): id_ for id_, source_id, source_type in result}
+                session.query(base.SignatureBand).filter(
+                    base.SignatureBand.signature_id.in_(list(ids.values()))
+                ).delete(synchronize_session=False)
+                bands = [
+                    {"band_key": band_key, "signature_id": ids[(row["source_id"], row["source_type"])]}
+                    for row in chunk
+                    for band_key in set(band_keys(row["signature"], self.bands))
+                ]
+                session.execute(insert(base.SignatureBand).values(bands).on_conflict_do_nothing())
+            session.commit()
+
+    def purge(self) -> int:
+        """删除超出查找窗口的签名，signature_band 中的分桶键随外键级联删除"""
+        cutoff = datetime.now(timezone.utc) - self.window
+        with base.SessionLocal() as session:
+            deleted = (
+                session.query(base.DiscussionSignature)
+                .filter(base.DiscussionSignature.created_at < cutoff)
+                .delete(synchronize_session=False)
+            )
+            session.commit()
+        if deleted:
+            logger.info(f"已清理 {deleted} 条超过 {self.window.days} 天的近似重复签名")
+        return deleted
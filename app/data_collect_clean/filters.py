@@ -0,0 +1,107 @@
+import logging
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def compile_literals(literals: List[str]) -> Optional[re.Pattern]:
+    """
+    将字面量规则编译为一个交替正则，命中文本即为对应规则。
+    较长的规则排在前面，同一位置同时命中时报告更长的规则。
+    """
+    if not literals:
+        return None
+    return re.compile("|".join(map(re.escape, sorted(set(literals), key=len, reverse=True))))
+
+
+def _no_match(text: str) -> None:
+    return None
+
+
+class RuleSet:
+    """单个字段（标题或正文）的排除规则"""
+
+    def __init__(self, literals: List[str] = None, patterns: List[str] = None):
+        self.literals = self._non_empty(literals, "literal")
+        self.patterns = self._non_empty(patterns, "regex")
+        literal_re = compile_literals(self.literals)
+        self._literal_search = literal_re.search if literal_re else None
+        self._pattern_res = [re.compile(p) for p in self.patterns]
+        # 字面量与正则合并为一个正则，只用于快速判断是否命中，命中后再定位具体规则
+        alternatives = ([literal_re.pattern] if literal_re else []) + [f"(?:{p})" for p in self.patterns]
+        self._any_search = re.compile("|".join(alternatives)).search if alternatives else None
+
+    @staticmethod
+    def _non_empty(rules, kind) -> List[str]:
+        result = []
+        for rule in rules or []:
+            rule = str(rule)
+            if rule == "":
+                # 空规则会匹配任意文本，直接忽略
+                logger.warning(f"忽略空的 {kind} 过滤规则")
+                continue
+            result.append(rule)
+        return result
+
+    def search(self, text: str) -> bool:
+        """是否命中任一规则，只执行一次合并正则"""
+        return self._any_search is not None and self._any_search(text) is not None
+
+    def locate(self, text: str) -> Optional[str]:
+        """返回命中的规则：优先报告字面量规则，其次按配置顺序报告第一条命中的正则"""
+        if self._literal_search and (m := self._literal_search(text)):
+            return m.group(0)
+        for pattern, compiled in zip(self.patterns, self._pattern_res):
+            if compiled.search(text):
+                return pattern
+        return None
+
+    def match(self, text: str) -> Optional[str]:
+        if not text or not self.search(text):
+            return None
+        return self.locate(text)
+
+
+class ExclusionFilter:
+    """按社区和数据源配置的排除规则引擎，返回命中的字段和规则"""
+
+    FIELDS = ("title", "body")
+
+    def __init__(self, rules: Dict = None):
+        rules = rules or {}
+        self.rule_sets = {
+            field: RuleSet(
+                (rules.get(field) or {}).get("literals"),
+                (rules.get(field) or {}).get("regex"),
+            )
+            for field in self.FIELDS
+        }
+        # 未命中是绝大多数情况，match 中只执行合并正则，命中后再定位具体规则
+        self._title_search = self.rule_sets["title"]._any_search or _no_match
+        self._body_search = self.rule_sets["body"]._any_search or _no_match
+        self._hits = Counter()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict, community: str, source_type: str) -> "ExclusionFilter":
+        return cls(((config or {}).get(community) or {}).get(source_type))
+
+    def match(self, title: str, body: str) -> Optional[Tuple[str, str]]:
+        if title and self._title_search(title):
+            return "title", self.rule_sets["title"].locate(title)
+        if body and self._body_search(body):
+            return "body", self.rule_sets["body"].locate(body)
+        return None
+
+    def merge_hits(self, hits: Iterable[Tuple[str, str]]):
+        """合并一轮清洗中记录的命中 (字段, 规则)，match 本身不做统计"""
+        counts = Counter(hits)
+        with self._lock:
+            self._hits.update(counts)
+
+    def hit_counts(self) -> Dict[str, int]:
+        with self._lock:
+            return {f"{field}:{rule}": count for (field, rule), count in self._hits.most_common()}
@@ -0,0 +1,217 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import List, Optional
+
+from openai import OpenAI
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class LatencyTracker:
+    """最近 N 次主请求耗时的滑动窗口"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, latency: float):
+        with self._lock:
+            self._samples.append(latency)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, math.ceil(pct / 100 * len(samples)) - 1))
+        return samples[index]
+
+
+class HedgedCompletion:
+    """
+    带截止时间和对冲的大模型调用。
+    主请求超过滚动 p95 仍未返回时，向备用端点/模型发送一份相同请求，先成功返回者胜出。
+    落败的请求无法中断，由单次请求超时兜底。
+    主请求在独立线程中执行，不会排在落败请求之后；对冲请求使用单独的有上限线程池，
+    线程池已满或调用控制器没有空闲并发额度时不发送对冲，继续等待主请求。
+    对冲请求占用控制器的一个并发额度，直到两个请求都结束才释放。
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        request_timeout: float = 120,
+        percentile: float = 95,
+        min_samples: int = 20,
+        min_delay: float = 5,
+        hedge_api_url: str = None,
+        hedge_api_key: str = None,
+        hedge_model: str = None,
+        max_workers: int = 8,
+    ):
+        self.enabled = enabled
+        self.request_timeout = request_timeout
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.hedge_api_url = hedge_api_url
+        self.hedge_api_key = hedge_api_key
+        self.hedge_model = hedge_model
+        self.latencies = LatencyTracker()
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-hedge")
+        # 对冲线程池的空闲线程数，没有空闲线程时不提交，避免排队
+        self._hedge_slots = threading.BoundedSemaphore(max_workers)
+        self._hedge_client = None
+        self._lock = threading.Lock()
+        self._metrics = {"calls": 0, "hedged": 0, "hedge_wins": 0, "primary_wins": 0, "deadline_exceeded": 0, "hedge_skipped": 0}
+
+    def complete(
+        self, client, model: str, messages: List[dict], deadline: Optional[float] = None, controller=None
+    ) -> str:
+        """controller 为调用方使用的 LLMCallController，对冲请求向它申请额外的并发额度"""
+        timeout = self._remaining(deadline)
+        self._incr("calls")
+        hedge_after = self._hedge_delay()
+        if hedge_after is None or hedge_after >= timeout:
+            return self._primary(client, model, messages, timeout)
+
+        primary = self._start(self._primary, client, model, messages, timeout)
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            self._incr("primary_wins")
+            return primary.result()
+
+        hedge = self._submit_hedge(primary, model, messages, deadline, controller)
+        if hedge is None:
+            self._incr("hedge_skipped")
+            return primary.result()
+
+        self._incr("hedged")
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self._incr("hedge_wins" if future is hedge else "primary_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _submit_hedge(self, primary: Future, model, messages, deadline, controller) -> Optional[Future]:
+        hedge_timeout = self._remaining(deadline)
+        if not self._hedge_slots.acquire(blocking=False):
+            return None
+        if controller is not None and not controller.try_acquire():
+            self._hedge_slots.release()
+            return None
+        hedge = self._executor.submit(
+            self._create, self._get_hedge_client(), self.hedge_model or model, messages, hedge_timeout
+        )
+        hedge.add_done_callback(lambda _: self._hedge_slots.release())
+        if controller is not None:
+            # 控制器为本次调用占用一个额度，对冲再占用一个；两个请求都结束后才释放对冲的额度，
+            # 落败但仍在进行的请求继续计入在途请求数
+            remaining = [2]
+            lock = threading.Lock()
+
+            def finished(_):
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    controller.release()
+
+            primary.add_done_callback(finished)
+            hedge.add_done_callback(finished)
+        return hedge
+
+    @staticmethod
+    def _start(fn, *args) -> Future:
+        """在新线程中执行 fn，不与落败后仍未返回的请求争用线程池"""
+        future = Future()
+
+        def run():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name="llm-primary", daemon=True).start()
+        return future
+
+    def stats(self) -> dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+        metrics["hedge_rate"] = metrics["hedged"] / metrics["calls"] if metrics["calls"] else 0.0
+        metrics["hedge_delay"] = self._hedge_delay()
+        return metrics
+
+    def _remaining(self, deadline: Optional[float]) -> float:
+        if deadline is None:
+            return self.request_timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self._incr("deadline_exceeded")
+            raise DeadlineExceeded("已超过本轮运行截止时间")
+        return min(self.request_timeout, remaining)
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.enabled or len(self.latencies) < self.min_samples:
+            return None
+        return max(self.min_delay, self.latencies.percentile(self.percentile))
+
+    def _primary(self, client, model, messages, timeout):
+        started = time.monotonic()
+        result = self._create(client, model, messages, timeout)
+        # 主请求即使在对冲中落败也记录耗时，避免 p95 被低估
+        self.latencies.add(time.monotonic() - started)
+        return result
+
+    @staticmethod
+    def _create(client, model, messages, timeout):
+        response = client.chat.completions.create(model=model, messages=messages, timeout=timeout)
+        return response.choices[0].message.content
+
+    def _get_hedge_client(self):
+        with self._lock:
+            if self._hedge_client is None:
+                self._hedge_client = OpenAI(
+                    api_key=self.hedge_api_key,
+                    base_url=self.hedge_api_url,
+                    timeout=self.request_timeout,
+                    max_retries=0,
+                )
+            return self._hedge_client
+
+    def _incr(self, name: str):
+        with self._lock:
+            self._metrics[name] += 1
+
+
+hedger = HedgedCompletion(
+    enabled=settings.llm_hedge_enabled,
+    request_timeout=settings.llm_request_timeout,
+    percentile=settings.llm_hedge_percentile,
+    min_samples=settings.llm_hedge_min_samples,
+    min_delay=settings.llm_hedge_min_delay,
+    hedge_api_url=settings.llm_hedge_api_url or settings.llm_api_url,
+    hedge_api_key=settings.llm_hedge_api_key or settings.llm_api_key,
+    hedge_model=settings.llm_hedge_model or settings.llm_model,
+    max_workers=max(1, settings.llm_concurrency),
+)
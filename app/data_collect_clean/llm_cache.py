@@ -0,0 +1,173 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from config.settings import settings
+from app.db import base
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """
+    大模型响应缓存。
+    进程内 LRU 作为一级缓存，discussion 所在的 PostgreSQL 中的 llm_cache 表作为持久化二级缓存，
+    多个部署共享同一份缓存。
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        bypass: bool = False,
+        max_entries: int = 50000,
+        ttl_days: int = 30,
+        memory_entries: int = 2048,
+    ):
+        self.enabled = enabled
+        self.bypass = bypass
+        self.max_entries = max_entries
+        self.ttl = timedelta(days=ttl_days)
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics = {"memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, content: str) -> str:
+        payload = json.dumps([model, system_prompt or "", content], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled or self.bypass:
+            return None
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and time.time() - entry[1] < self.ttl.total_seconds():
+                self._memory.move_to_end(key)
+                self._metrics["memory_hits"] += 1
+                return entry[0]
+            if entry:
+                del self._memory[key]
+
+        try:
+            row = self._db_get(key)
+        except Exception as e:
+            logger.warning(f"读取大模型缓存失败: {str(e)}")
+            self._incr("errors")
+            row = None
+
+        if row is None:
+            self._incr("misses")
+            return None
+        response, created_at = row
+        self._remember(key, response, created_at)
+        self._incr("db_hits")
+        return response
+
+    def set(self, key: str, model: str, response: str):
+        if not self.enabled or response is None:
+            return
+        self._remember(key, response, time.time())
+        try:
+            self._db_set(key, model, response)
+            self._incr("stores")
+        except Exception as e:
+            logger.warning(f"写入大模型缓存失败: {str(e)}")
+            self._incr("errors")
+
+    def evict(self):
+        """删除过期条目，并按最近命中时间淘汰超出容量的条目"""
+        if not self.enabled:
+            return
+        try:
+            with base.SessionLocal() as session:
+                expired = (
+                    session.query(base.LLMCache)
+                    .filter(base.LLMCache.created_at < self._expire_before())
+                    .delete(synchronize_session=False)
+                )
+                overflow_keys = (
+                    select(base.LLMCache.cache_key)
+                    .order_by(base.LLMCache.last_hit_at.desc())
+                    .offset(self.max_entries)
+                )
+                overflow = (
+                    session.query(base.LLMCache)
+                    .filter(base.LLMCache.cache_key.in_(overflow_keys))
+                    .delete(synchronize_session=False)
+                )
+                session.commit()
+            if expired or overflow:
+                logger.info(f"大模型缓存淘汰: 过期 {expired} 条, 超出容量 {overflow} 条")
+        except Exception as e:
+            logger.warning(f"大模型缓存淘汰失败: {str(e)}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+        lookups = metrics["memory_hits"] + metrics["db_hits"] + metrics["misses"]
+        hits = metrics["memory_hits"] + metrics["db_hits"]
+        metrics["hit_rate"] = hits / lookups if lookups else 0.0
+        return metrics
+
+    def _remember(self, key: str, response: str, created_ts: float):
+        with self._lock:
+            self._memory[key] = (response, created_ts)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _incr(self, name: str):
+        with self._lock:
+            self._metrics[name] += 1
+
+    def _expire_before(self) -> datetime:
+        return datetime.now(timezone.utc) - self.ttl
+
+    def _db_get(self, key: str):
+        with base.SessionLocal() as session:
+            row = (
+                session.query(base.LLMCache)
+                .filter(
+                    base.LLMCache.cache_key == key,
+                    base.LLMCache.created_at >= self._expire_before(),
+                )
+                .first()
+            )
+            if not row:
+                return None
+            result = (row.response, row.created_at.timestamp())
+            row.last_hit_at = datetime.now(timezone.utc)
+            row.hit_count = (row.hit_count or 0) + 1
+            session.commit()
+            return result
+
+    def _db_set(self, key: str, model: str, response: str):
+        now = datetime.now(timezone.utc)
+        with base.SessionLocal() as session:
+            session.execute(
+                insert(base.LLMCache)
+                .values(cache_key=key, model=model, response=response, created_at=now, last_hit_at=now)
+                .on_conflict_do_update(
+                    index_elements=["cache_key"],
+                    set_={"response": response, "created_at": now, "last_hit_at": now},
+                )
+            )
+            session.commit()
+
+
+response_cache = LLMResponseCache(
+    enabled=settings.llm_cache_enabled,
+    bypass=settings.llm_cache_bypass,
+    max_entries=settings.llm_cache_max_entries,
+    ttl_days=settings.llm_cache_ttl_days,
+    memory_entries=settings.llm_cache_memory_entries,
+)
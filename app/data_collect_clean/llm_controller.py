@@ -0,0 +1,231 @@
+import logging
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+
+import openai
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_KINDS = {"rate_limit", "timeout", "connection", "server"}
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def classify_error(error: Exception) -> str:
+    if isinstance(error, openai.RateLimitError):
+        return "rate_limit"
+    if isinstance(error, openai.APITimeoutError):
+        return "timeout"
+    if isinstance(error, openai.APIConnectionError):
+        return "connection"
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code >= 500:
+            return "server"
+        if error.status_code in (408, 409):
+            return "timeout"
+        return "client"
+    return "unknown"
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    """解析 '1.5'、'6m0s'、'250ms' 等形式的时长，单位为秒"""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(n) * _DURATION_UNITS[unit] for n, unit in parts)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """从限流响应头中读取建议的等待时间"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    if (value := headers.get("retry-after-ms")) is not None:
+        # retry-after-ms 只是毫秒数，不按带单位的时长解析（"5s" 不应被当作 5 毫秒）
+        try:
+            return float(value) / 1000
+        except ValueError:
+            return None
+    if (value := headers.get("retry-after")) is not None:
+        seconds = _parse_duration(value)
+        if seconds is not None:
+            return seconds
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+    resets = [
+        _parse_duration(v)
+        for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")
+        if (v := headers.get(name)) is not None
+    ]
+    resets = [r for r in resets if r is not None]
+    return max(resets) if resets else None
+
+
+class LLMCallController:
+    """
+    大模型调用控制器。
+    按错误类型决定是否重试（指数退避 + 抖动，优先遵循限流响应头），
+    并根据 429 和延迟以 AIMD 方式调整允许的在途请求数。
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        min_concurrency: int = 1,
+        max_concurrency: int = 4,
+        latency_target: float = 30.0,
+        adjust_interval: float = 5.0,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.latency_target = latency_target
+        self.adjust_interval = adjust_interval
+        self._limit = float(self.max_concurrency)
+        self._in_flight = 0
+        self._latency_ewma = None
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._metrics = {
+            "calls": 0,
+            "attempts": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "retries": 0,
+            "throttled": 0,
+            "limit_increases": 0,
+            "limit_decreases": 0,
+            "errors": {},
+        }
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def call(self, fn: Callable, deadline: Optional[float] = None):
+        """执行 fn，失败时按错误类型重试。deadline 为 time.monotonic() 时间点，超过后不再重试"""
+        with self._cond:
+            self._metrics["calls"] += 1
+        for attempt in range(1, self.max_attempts + 1):
+            self._acquire()
+            started = time.monotonic()
+            try:
+                result = fn()
+            except Exception as e:
+                self._release()
+                kind = classify_error(e)
+                self._on_error(kind)
+                delay = self._retry_delay(e, attempt)
+                out_of_time = deadline is not None and time.monotonic() + delay >= deadline
+                if kind not in RETRYABLE_KINDS or attempt == self.max_attempts or out_of_time:
+                    with self._cond:
+                        self._metrics["failed"] += 1
+                    raise
+                with self._cond:
+                    self._metrics["retries"] += 1
+                logger.warning(f"大模型调用失败({kind})，{delay:.1f}s 后第 {attempt + 1} 次尝试: {str(e)}")
+                time.sleep(delay)
+                continue
+            self._release()
+            self._on_success(time.monotonic() - started)
+            return result
+
+    def stats(self) -> dict:
+        with self._cond:
+            metrics = dict(self._metrics, errors=dict(self._metrics["errors"]))
+            metrics["concurrency_limit"] = self.limit
+            metrics["in_flight"] = self._in_flight
+            metrics["latency_ewma"] = round(self._latency_ewma, 3) if self._latency_ewma else None
+        return metrics
+
+    def try_acquire(self) -> bool:
+        """不等待地占用一个并发额度（如对冲请求），成功后需调用 release"""
+        with self._cond:
+            if self._in_flight >= self.limit:
+                return False
+            self._in_flight += 1
+            self._metrics["attempts"] += 1
+            return True
+
+    def release(self):
+        self._release()
+
+    def _acquire(self):
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+            self._metrics["attempts"] += 1
+
+    def _release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        hinted = retry_after_seconds(error)
+        if hinted is not None:
+            return min(self.max_delay, hinted + random.uniform(0, self.base_delay))
+        # full jitter
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def _on_error(self, kind: str):
+        with self._cond:
+            errors = self._metrics["errors"]
+            errors[kind] = errors.get(kind, 0) + 1
+            if kind == "rate_limit":
+                self._metrics["throttled"] += 1
+                self._decrease(0.5)
+
+    def _on_success(self, latency: float):
+        with self._cond:
+            self._metrics["succeeded"] += 1
+            self._latency_ewma = latency if self._latency_ewma is None else 0.8 * self._latency_ewma + 0.2 * latency
+            if self._latency_ewma > self.latency_target:
+                self._decrease(max(0.0, 1 - 1 / max(self._limit, 1)))
+            elif self._limit < self.max_concurrency:
+                # 每成功一个窗口的请求，上限加 1
+                before = self.limit
+                self._limit = min(float(self.max_concurrency), self._limit + 1 / max(self._limit, 1))
+                if self.limit > before:
+                    self._metrics["limit_increases"] += 1
+                    self._cond.notify_all()
+
+    def _decrease(self, factor: float):
+        """调用方需持有锁；调整间隔内只降一次，避免一批 429 把并发降到底"""
+        now = time.monotonic()
+        if now - self._last_decrease < self.adjust_interval:
+            return
+        before = self.limit
+        self._limit = max(float(self.min_concurrency), self._limit * factor)
+        self._last_decrease = now
+        if self.limit < before:
+            self._metrics["limit_decreases"] += 1
+            logger.info(f"大模型并发上限调整: {before} -> {self.limit}")
+
+
+controller = LLMCallController(
+    max_attempts=settings.llm_max_attempts,
+    base_delay=settings.llm_retry_base_delay,
+    max_delay=settings.llm_retry_max_delay,
+    min_concurrency=settings.llm_min_concurrency,
+    max_concurrency=settings.llm_concurrency,
+    latency_target=settings.llm_latency_target,
+)
@@ -0,0 +1,88 @@
+"""
+邮件正文精简：在交给大模型前去除引用的历史邮件、签名和邮件列表页脚。
+按行单次扫描，规则在导入时编译，结果只取决于输入文本。
+"""
+import re
+from typing import List, Tuple
+
+from app.data_collect_clean import tokens
+
+# "> 原文" 形式的逐行引用
+_QUOTE_RE = re.compile(r"^\s*[>＞]")
+# 引用归属行："在 2024-01-10 09:00，王五 写道：" / "王五 <w@x> 于2024年1月10日 写道：" / "On Mon, ... wrote:"
+_ATTRIBUTION_RE = re.compile(
+    r"^\s*(?:在.{1,160}写道|.{1,160}于.{1,80}写道|On\s.{1,240}\swrote)\s*[：:]\s*$", re.IGNORECASE
+)
+# 此行之后均为历史邮件、签名或页脚，直接截断
+_CUT_RE = re.compile(
+    r"^\s*(?:"
+    r"-{2,}\s*(?:Original Message|Forwarded message|原始邮件|转发邮件|转发的邮件)\s*-{2,}"
+    r"|_{10,}"
+    r"|-- ?"
+    r"|To unsubscribe\b.*"
+    r"|This e-?mail and its attachments\b.*"
+    r"|本邮件及其附件.*"
+    r")\s*$",
+    re.IGNORECASE,
+)
+# Outlook 风格的引用头：From:/发件人： 后紧跟 Sent:/To:/Subject: 等字段
+_OUTLOOK_FROM_RE = re.compile(r"^\s*(?:From|发件人)\s*[:：]", re.IGNORECASE)
+_HEADER_FIELD_RE = re.compile(
+    r"^\s*(?:Sent|Date|To|Cc|Subject|发送时间|发送日期|时间|收件人|抄送|主题)\s*[:：]", re.IGNORECASE
+)
+_OUTLOOK_LOOKAHEAD = 3
+
+
+def _is_outlook_header(lines: List[str], i: int) -> bool:
+    if not _OUTLOOK_FROM_RE.match(lines[i]):
+        return False
+    return any(_HEADER_FIELD_RE.match(line) for line in lines[i + 1 : i + 1 + _OUTLOOK_LOOKAHEAD])
+
+
+def _is_attribution(lines: List[str], i: int) -> int:
+    """返回归属行占用的行数（0 表示不是归属行）；Gmail 会把较长的 "On ... wrote:" 折成两行"""
+    if _ATTRIBUTION_RE.match(lines[i]):
+        return 1
+    if i + 1 < len(lines) and lines[i].lstrip().startswith("On ") and _ATTRIBUTION_RE.match(
+        f"{lines[i]} {lines[i + 1]}"
+    ):
+        return 2
+    return 0
+
+
+def reduce(text: str) -> Tuple[str, int, int]:
+    """
+    去除引用、签名和页脚，返回 (精简后的正文, 去除的字符数, 去除的估算 token 数)。
+    开头的邮件头行保留给后续清理；精简后没有剩余内容时返回原文。
+    """
+    lines = text.splitlines()
+    kept = []
+    has_content = dropped = False
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if _QUOTE_RE.match(line):
+            dropped = True
+            i += 1
+            continue
+        if _CUT_RE.match(line) or (has_content and _is_outlook_header(lines, i)):
+            dropped = True
+            break
+        span = _is_attribution(lines, i)
+        if span:
+            dropped = True
+            i += span
+            # 归属行后没有逐行引用时，剩余内容都是被引用的历史邮件
+            following = next((l for l in lines[i:] if l.strip()), None)
+            if following is not None and not _QUOTE_RE.match(following):
+                break
+            continue
+        kept.append(line)
+        if line.strip():
+            has_content = True
+        i += 1
+
+    reduced = "\n".join(kept).strip()
+    if not dropped or not reduced:
+        return text, 0, 0
+    return reduced, len(text) - len(reduced), tokens.estimate_tokens(text) - tokens.estimate_tokens(reduced)
@@ -0,0 +1,62 @@
+"""
+文本规范化。规则在导入时编译一次，尽量减少对文本的遍历次数：
+- basic_clean：去除 HTML 标签后，用 str.translate 查表把允许字符集以外的字符替换为空格
+- clean_before_llm：一次正则去除邮件头行，再用 split/join 合并空白
+输出与原先 BaseCleaner 中的多次 re.sub 逐字节一致。
+"""
+import json
+import re
+from typing import Iterable, List
+
+_TAG_RE = re.compile(r"<.*?>")
+_MAIL_HEADER_RE = re.compile(r"(?m)^\s*(?:发件人|发送日期|收件人)：.*$")
+_MAIL_HEADER_MARKERS = ("发件人：", "发送日期：", "收件人：")
+_ALLOWED_PUNCTUATION = frozenset("，。！？；：、")
+
+
+def _is_allowed(code: int) -> bool:
+    return (
+        0x4E00 <= code <= 0x9FA5
+        or 0x30 <= code <= 0x39
+        or 0x41 <= code <= 0x5A
+        or 0x61 <= code <= 0x7A
+        or chr(code) in _ALLOWED_PUNCTUATION
+    )
+
+
+# str.translate 的映射表，按码位下标查找（列表比 dict 查找快）：允许的字符映射为自身，其余映射为空格。
+# 只覆盖 BMP，超出范围的字符 translate 会原样保留，再由 _ASTRAL_RE 统一替换为空格
+_FILTER_TABLE = [chr(code) if _is_allowed(code) else " " for code in range(0x10000)]
+_ASTRAL_RE = re.compile("[\U00010000-\U0010FFFF]")
+
+
+def basic_clean(text: str) -> str:
+    """去除 HTML 标签，只保留中英文、数字和中文标点"""
+    if "<" in text:
+        text = _TAG_RE.sub("", text)
+    return _ASTRAL_RE.sub(" ", text.translate(_FILTER_TABLE)).strip()
+
+
+def clean_before_llm(text: str) -> str:
+    """去除邮件头行并合并空白"""
+    if any(marker in text for marker in _MAIL_HEADER_MARKERS):
+        text = _MAIL_HEADER_RE.sub("", text)
+    return " ".join(text.split())
+
+
+def basic_clean_many(texts: Iterable[str]) -> List[str]:
+    return [basic_clean(text) for text in texts]
+
+
+def clean_before_llm_many(texts: Iterable[str]) -> List[str]:
+    return [clean_before_llm(text) for text in texts]
+
+
+def decode_quoted_json(value):
+    """clean_data 为 JSON 字符串字面量（以双引号开头）时解码，否则原样返回"""
+    if isinstance(value, str) and value[:1] == '"':
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            pass
+    return value
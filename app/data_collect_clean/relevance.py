@@ -0,0 +1,249 @@
+"""
+调用大模型前的本地相关性分类器。
+特征为标题和正文开头的字符 n-gram；模型为逻辑回归，保存时只保留绝对值最大的 max_features 个权重。
+n-gram 直接作为权重表的键，评分时省去逐个 n-gram 计算哈希的开销。
+离线从 discussion 表训练：posted 为正样本，is_deleted 或超过观察期仍未上榜的记录为负样本。
+
+训练: python -m app.data_collect_clean.relevance --output models/relevance.json
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import random
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from app.db import base
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+# 低于阈值的判定单独输出，便于人工复核
+decision_logger = logging.getLogger(f"{__name__}.decisions")
+
+Sample = Tuple[str, str, int]
+
+
+def _ngram_counts(title: str, body: str, ngram: int, max_chars: int) -> Counter:
+    # 先截取再合并空白，避免对超长正文整体处理
+    text = " ".join(f"{title or ''} {(body or '')[: max_chars * 2]}".lower().split())[:max_chars]
+    return Counter(text[i : i + ngram] for i in range(max(1, len(text) - ngram + 1)))
+
+
+def extract_features(title: str, body: str, ngram: int, max_chars: int) -> Dict[str, float]:
+    """字符 n-gram 计数，按 L2 归一化"""
+    counts = _ngram_counts(title, body, ngram, max_chars)
+    norm = math.sqrt(sum(c * c for c in counts.values())) or 1.0
+    return {gram: count / norm for gram, count in counts.items()}
+
+
+class RelevanceModel:
+    def __init__(
+        self,
+        weights: Dict[str, float] = None,
+        bias: float = 0.0,
+        max_features: int = 1 << 18,
+        ngram: int = 3,
+        max_chars: int = 160,
+    ):
+        if max_features <= 0:
+            raise ValueError("max_features 必须大于 0")
+        self.weights = weights or {}
+        self.bias = bias
+        self.max_features = max_features
+        self.ngram = ngram
+        self.max_chars = max_chars
+
+    def features(self, title: str, body: str) -> Dict[str, float]:
+        return extract_features(title, body, self.ngram, self.max_chars)
+
+    def score(self, title: str, body: str) -> float:
+        """记录成为热点相关内容的概率"""
+        # 与 extract_features 等价，省去构造归一化字典
+        counts = _ngram_counts(title, body, self.ngram, self.max_chars)
+        get = self.weights.get
+        dot = sum(get(gram, 0.0) * count for gram, count in counts.items())
+        z = self.bias + dot / (math.sqrt(sum(c * c for c in counts.values())) or 1.0)
+        return 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, z))))
+
+    def prune(self):
+        """只保留绝对值最大的 max_features 个非零权重"""
+        weights = sorted(
+            ((gram, w) for gram, w in self.weights.items() if abs(w) > 1e-6), key=lambda item: -abs(item[1])
+        )
+        self.weights = dict(weights[: self.max_features])
+
+    def save(self, path: str):
+        self.prune()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "max_features": self.max_features,
+                    "ngram": self.ngram,
+                    "max_chars": self.max_chars,
+                    "bias": self.bias,
+                    "weights": {gram: round(w, 6) for gram, w in self.weights.items()},
+                },
+                f,
+                ensure_ascii=False,
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "RelevanceModel":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(
+            weights=data["weights"],
+            bias=data["bias"],
+            max_features=data["max_features"],
+            ngram=data["ngram"],
+            max_chars=data["max_chars"],
+        )
+
+
+def train(
+    samples: List[Sample],
+    epochs: int = 5,
+    learning_rate: float = 0.5,
+    l2: float = 1e-6,
+    seed: int = 0,
+    **model_kwargs,
+) -> RelevanceModel:
+    """SGD 训练逻辑回归，正负样本按数量反比加权"""
+    model = RelevanceModel(**model_kwargs)
+    positives = sum(1 for _, _, label in samples if label)
+    negatives = len(samples) - positives
+    if not positives or not negatives:
+        raise ValueError("训练样本需要同时包含正负样本")
+    class_weight = {1: len(samples) / (2 * positives), 0: len(samples) / (2 * negatives)}
+    data = [(model.features(title, body), label) for title, body, label in samples]
+    rng = random.Random(seed)
+    weights = model.weights
+    for epoch in range(epochs):
+        rng.shuffle(data)
+        rate = learning_rate / (1 + epoch)
+        for features, label in data:
+            z = model.bias + sum(weights.get(gram, 0.0) * v for gram, v in features.items())
+            prediction = 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, z))))
+            gradient = (prediction - label) * class_weight[label]
+            model.bias -= rate * gradient
+            for gram, v in features.items():
+                weights[gram] = weights.get(gram, 0.0) * (1 - rate * l2) - rate * gradient * v
+    model.prune()
+    return model
+
+
+def evaluate(model: RelevanceModel, samples: List[Sample], threshold: float) -> dict:
+    tp = fp = fn = tn = 0
+    for title, body, label in samples:
+        predicted = model.score(title, body) >= threshold
+        tp += predicted and label
+        fp += predicted and not label
+        fn += (not predicted) and label
+        tn += (not predicted) and not label
+    return {
+        "samples": len(samples),
+        "precision": tp / (tp + fp) if tp + fp else 0.0,
+        "recall": tp / (tp + fn) if tp + fn else 0.0,
+        # 被拦截的记录占比，即可节省的大模型调用比例
+        "dropped_ratio": (fn + tn) / len(samples) if samples else 0.0,
+    }
+
+
+def load_training_samples(label_after_days: int = 30, limit: Optional[int] = None) -> List[Sample]:
+    cutoff = datetime.now(timezone.utc) - timedelta(days=label_after_days)
+    with base.SessionLocal() as session:
+        query = (
+            session.query(
+                base.Discussion.title,
+                base.Discussion.body,
+                base.Discussion.posted,
+                base.Discussion.is_deleted,
+                base.Discussion.created_at,
+            )
+            .order_by(base.Discussion.id.desc())
+            .yield_per(1000)
+        )
+        if limit:
+            query = query.limit(limit)
+        samples = []
+        for title, body, posted, is_deleted, created_at in query:
+            if posted and not is_deleted:
+                samples.append((title, body, 1))
+            elif is_deleted or (created_at is not None and created_at < cutoff):
+                samples.append((title, body, 0))
+    return samples
+
+
+class RelevanceGate:
+    """
+    清洗流程中的相关性判定。mode:
+    - off: 不启用
+    - log: 只记录判定结果，不影响处理
+    - deprioritize: 低分记录排到本轮最后处理
+    - drop: 低分记录不调用大模型，直接丢弃
+    """
+
+    MODES = ("off", "log", "deprioritize", "drop")
+
+    def __init__(self, model: Optional[RelevanceModel], mode: str = "log", threshold: float = 0.2):
+        if mode not in self.MODES:
+            raise ValueError(f"未知的相关性判定模式: {mode}")
+        self.model = model
+        self.mode = mode if model is not None else "off"
+        self.threshold = threshold
+
+    @classmethod
+    def from_config(cls, mode: str, model_path: str, threshold: float) -> "RelevanceGate":
+        model = None
+        if mode != "off" and model_path:
+            try:
+                model = RelevanceModel.load(model_path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"加载相关性模型失败，跳过相关性判定: {str(e)}")
+        return cls(model, mode, threshold)
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def is_relevant(self, source_type: str, raw_data: dict) -> Tuple[bool, float]:
+        score = self.model.score(raw_data.get("title", ""), raw_data.get("body", ""))
+        relevant = score >= self.threshold
+        if not relevant:
+            decision_logger.info(
+                f"[{self.mode}] {source_type}:{raw_data.get('id')} 相关性 {score:.3f} 低于阈值 "
+                f"{self.threshold} - {raw_data.get('title', '')}"
+            )
+        return relevant, score
+
+
+gate = RelevanceGate.from_config(
+    settings.relevance_mode, settings.relevance_model_path, settings.relevance_threshold
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从 discussion 表训练相关性分类器")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--label-after-days", type=int, default=30)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--holdout", type=float, default=0.2)
+    args = parser.parse_args()
+
+    samples = load_training_samples(args.label_after_days, args.limit)
+    random.Random(0).shuffle(samples)
+    split = int(len(samples) * (1 - args.holdout))
+    model = train(samples[:split], epochs=args.epochs)
+    logger.info(f"训练样本 {split} 条，验证集评估: {evaluate(model, samples[split:], args.threshold)}")
+    model.save(args.output)
+    logger.info(f"相关性模型已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import math
+import re
+from typing import List
+
+# 中日韩文字及全角符号按约 1 token/字估算，其余字符按约 4 字符/token 估算
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]")
+CJK_TOKENS_PER_CHAR = 1.0
+OTHER_CHARS_PER_TOKEN = 4.0
+
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+# 日志、堆栈、命令输出等机器生成的行
+_LOG_LINE_RE = re.compile(
+    r"^\s*(?:"
+    r"\[?\d{4}[-/]\d{2}[-/]\d{2}[ T]\d{2}:\d{2}"  # 时间戳
+    r"|\[\s*\d+\.\d+\]"  # dmesg
+    r"|at \S+\(.*\)"  # Java 堆栈
+    r"|File \".*\", line \d+"  # Python 堆栈
+    r"|Traceback \(most recent call last\)"
+    r"|#\d+\s+0x[0-9a-fA-F]+"  # gdb 堆栈
+    r"|(?:ERROR|WARN(?:ING)?|INFO|DEBUG|FATAL|TRACE)\b"
+    r"|[+$] \S"  # shell 提示符/回显
+    r"|0x[0-9a-fA-F]{6,}"
+    r"|[\w.-]+:\d+:(?:\d+:)? "  # 编译器输出 file:line:col
+    r")"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    other = len(text) - cjk
+    return math.ceil(cjk * CJK_TOKENS_PER_CHAR + other / OTHER_CHARS_PER_TOKEN)
+
+
+def _elide(lines: List[str], head: int, tail: int) -> List[str]:
+    if len(lines) <= head + tail:
+        return lines
+    omitted = len(lines) - head - tail
+    return lines[:head] + [f"...（省略 {omitted} 行）..."] + lines[len(lines) - tail :]
+
+
+def truncate_blocks(text: str, head_lines: int = 20, tail_lines: int = 10, min_log_run: int = 0) -> str:
+    """
+    截断代码块和连续的日志/堆栈行，仅保留首尾若干行。
+    min_log_run 为判定为日志段所需的最少连续行数，默认为 head_lines + tail_lines。
+    """
+    if not text or "\n" not in text:
+        return text
+    min_log_run = min_log_run or head_lines + tail_lines
+    lines = text.split("\n")
+    result = []
+    i = 0
+    while i < len(lines):
+        if _FENCE_RE.match(lines[i]):
+            fence = _FENCE_RE.match(lines[i]).group(1)
+            end = i + 1
+            while end < len(lines) and not lines[end].lstrip().startswith(fence):
+                end += 1
+            result.append(lines[i])
+            result.extend(_elide(lines[i + 1 : end], head_lines, tail_lines))
+            if end < len(lines):
+                result.append(lines[end])
+            i = end + 1
+            continue
+        if _LOG_LINE_RE.match(lines[i]):
+            end = i
+            while end < len(lines) and (_LOG_LINE_RE.match(lines[end]) or not lines[end].strip()):
+                end += 1
+            run = lines[i:end]
+            result.extend(_elide(run, head_lines, tail_lines) if len(run) >= min_log_run else run)
+            i = end
+            continue
+        result.append(lines[i])
+        i += 1
+    return "\n".join(result)
+
+
+def fit_to_budget(text: str, max_tokens: int, head_ratio: float = 0.7) -> str:
+    """超出预算时按比例保留开头和结尾"""
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    keep_chars = int(len(text) * max_tokens / tokens)
+    head = int(keep_chars * head_ratio)
+    tail = keep_chars - head
+    return f"{text[:head]}\n...（内容过长，已省略）...\n{text[len(text) - tail:] if tail else ''}"
+
+
+def split_chunks(text: str, chunk_tokens: int) -> List[str]:
+    """按 token 预算切分文本，优先在换行处切分"""
+    chunks = []
+    current = []
+    current_tokens = 0
+    for line in text.split("\n"):
+        line_tokens = estimate_tokens(line) + 1
+        if line_tokens > chunk_tokens:
+            # 单行过长（如被压成一行的论坛正文），按字符切分
+            step = max(1, int(len(line) * chunk_tokens / line_tokens))
+            pieces = [line[j : j + step] for j in range(0, len(line), step)]
+        else:
+            pieces = [line]
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece) + 1
+            if current and current_tokens + piece_tokens > chunk_tokens:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
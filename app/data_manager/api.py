@@ -1,7 +1,18 @@
+import zlib
 from datetime import datetime, timedelta
+from typing import Iterator
 
-from app.data_manager.manager import DataManager
-from fastapi import APIRouter, HTTPException, status, Body, Query
+import anyio
+
+from app.data_manager.async_manager import async_data_manager
+from app.data_manager.counts import COUNT_MODES, count_cache
+from app.data_manager.manager import DataManager, data_cursor_after, export_columns, latest_cursor_after, next_cursor
+from app.data_manager.response_cache import etag_matches, render, response_cache
+from app.db.data_version import data_version
+from config.settings import settings
+from fastapi import APIRouter, HTTPException, status, Body, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 import logging
 
 router = APIRouter()
@@ -9,15 +20,52 @@ logger = logging.getLogger(__name__)
 data_manager = DataManager()
 
 
+async def read(method: str, *args):
+    """读接口的数据访问：启用异步读取时走 asyncpg 连接池，否则在线程池中执行同步查询"""
+    if settings.read_async_enabled:
+        return await getattr(async_data_manager, method)(*args)
+    return await run_in_threadpool(getattr(data_manager, method), *args)
+
+
+async def cached_json(request: Request, key: tuple, build):
+    """
+    按数据版本缓存序列化后的响应；If-None-Match 与当前版本的 ETag 一致时返回 304，不查询 discussion。
+    版本号取自数据库，读取失败时不使用缓存
+    """
+    version = await data_version.refresh(lambda: read("get_data_version"))
+    if not settings.response_cache_enabled or version is None:
+        return await build()
+    entry = response_cache.get(key, version)
+    if entry is None:
+        entry = response_cache.put(key, version, render(await build()))
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+
 @router.get("/data")
-def get_data(
+async def get_data(
+    request: Request,
     page: int = Query(1, ge=1, description="分页页码"),
     page_size: int = Query(100, ge=1, le=500, description="每页数量"),
+    cursor: str = Query(None, description="上一页返回的 next_cursor，指定时忽略 page"),
 ):
+    mode = settings.count_mode if settings.count_mode in COUNT_MODES else "exact"
+    return await cached_json(
+        request, ("data", page, page_size, cursor, mode), lambda: build_data(page, page_size, cursor, mode)
+    )
+
+
+async def build_data(page: int, page_size: int, cursor: str, mode: str):
     try:
         # 获取分页数据和总数
-        result = data_manager.fetch_paginated_from_pg(page=page, page_size=page_size)
-        total = data_manager.get_total_count()
+        after_id = data_cursor_after(cursor) if cursor else None
+        result = await read("fetch_paginated_from_pg", page, page_size, after_id)
+        counted = await count_cache.get(
+            mode, lambda: read("estimate_total_count" if mode == "estimate" else "get_total_count")
+        )
+        total = counted["total"]
 
         return {
             "status": "success",
@@ -27,7 +75,11 @@ def get_data(
                 "page_size": page_size,
                 "total_items": total,
                 "total_pages": (total + page_size - 1) // page_size,
+                # 总数为缓存值：是否为估算值，及计算总数的时间（绝对时间，响应被缓存后仍然准确）
+                "total_estimated": counted["estimated"],
+                "total_counted_at": counted["counted_at"],
             },
+            "next_cursor": next_cursor("data", result, page_size),
         }
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -39,27 +91,97 @@ def get_data(
 
 
 @router.get("/latest")
-def get_latest(
+async def get_latest(
+    request: Request,
     page: int = Query(1, ge=1, description="分页页码"),
     page_size: int = Query(100, ge=1, le=500, description="每页数量"),
+    cursor: str = Query(None, description="上一页返回的 next_cursor，指定时忽略 page"),
 ):
-    try:
-        today = datetime.now()
-        days_since_friday = (today.weekday() - 4) % 7  # 4代表周五的weekday索引
-        last_friday = today - timedelta(days=days_since_friday)
-        if days_since_friday == 0:
-            last_friday -= timedelta(days=7)
-        last_friday_start = last_friday.replace(hour=0, minute=0, second=0, microsecond=0)
+    today = datetime.now()
+    days_since_friday = (today.weekday() - 4) % 7  # 4代表周五的weekday索引
+    last_friday = today - timedelta(days=days_since_friday)
+    if days_since_friday == 0:
+        last_friday -= timedelta(days=7)
+    last_friday_start = last_friday.replace(hour=0, minute=0, second=0, microsecond=0)
+    # 起始时间每周变化，作为缓存键的一部分
+    return await cached_json(
+        request,
+        ("latest", last_friday_start.isoformat(), page, page_size, cursor),
+        lambda: build_latest(last_friday_start, page, page_size, cursor),
+    )
 
-        posts = data_manager.fetch_posts_created_after(last_friday_start, page, page_size)
+
+async def build_latest(last_friday_start: datetime, page: int, page_size: int, cursor: str):
+    try:
+        after = latest_cursor_after(cursor) if cursor else None
+        posts = await read("fetch_posts_created_after", last_friday_start, page, page_size, after)
 
         return {
             "status": "success",
             "data": posts,
             "since": last_friday_start.isoformat(),
+            "next_cursor": next_cursor("latest", posts, page_size),
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取上周五之后帖子失败: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    try:
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close:
+            close()
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    同步生成器由 Starlette 在线程池中迭代，但客户端断开时不会关闭它，要等垃圾回收才释放其中的资源。
+    响应结束、客户端断开或出错时立即关闭生成器
+    """
+
+    def __init__(self, content: Iterator[bytes], **kwargs):
+        super().__init__(content, **kwargs)
+        self.source = content
+
+    async def stream_response(self, send):
+        try:
+            await super().stream_response(send)
+        finally:
+            close = getattr(self.source, "close", None)
+            if close:
+                # 断开时所在的取消范围已取消，需屏蔽取消才能等待关闭完成
+                with anyio.CancelScope(shield=True):
+                    await run_in_threadpool(close)
+
+
+@router.get("/export")
+def export_data(
+    request: Request,
+    fields: str = Query(None, description="逗号分隔的导出字段，默认全部"),
+    compress: bool = Query(False, description="客户端支持时以 gzip 压缩传输"),
+):
+    """以 NDJSON 流式导出 /data 范围内的全部讨论，每行一条"""
+    try:
+        columns = export_columns([f.strip() for f in fields.split(",") if f.strip()] if fields else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    chunks = data_manager.export_open_discussions(columns, settings.export_itersize)
+    headers = {"Content-Disposition": 'attachment; filename="discussion.ndjson"'}
+    if compress and "gzip" in request.headers.get("accept-encoding", "").lower():
+        chunks = gzip_chunks(chunks)
+        headers.update({"Content-Encoding": "gzip", "Vary": "Accept-Encoding"})
+    # 数据库游标在整个响应期间占用一个连接池连接，响应结束或客户端断开时立即归还
+    return ClosingStreamingResponse(chunks, media_type="application/x-ndjson", headers=headers)
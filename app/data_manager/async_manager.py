@@ -0,0 +1,175 @@
+"""
+读接口的异步数据访问，基于 asyncpg 连接池，查询期间不占用线程池中的线程。
+SQL 与 DataManager 共用，返回的数据与同步查询一致：
+- json 列解码为 Python 对象
+- asyncpg 的 timestamptz 统一为 UTC，转换为数据库会话时区，与 psycopg2 返回的值一致
+- 不带时区的查询参数按数据库会话时区解释，与 psycopg2 一致
+"""
+import asyncio
+import json
+import logging
+import re
+from datetime import datetime, tzinfo
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from app.data_manager.manager import (
+    COUNT_SQL,
+    DATA_VERSION_SQL,
+    ESTIMATE_SQL,
+    latest_query,
+    page_query,
+    plan_rows,
+    rename_deleted,
+)
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER_RE = re.compile(r"%s")
+
+
+@lru_cache(maxsize=None)
+def to_asyncpg(sql: str) -> str:
+    """%s 占位符按顺序转换为 asyncpg 的 $1, $2 ..."""
+    counter = iter(range(1, sql.count("%s") + 1))
+    return _PLACEHOLDER_RE.sub(lambda _: f"${next(counter)}", sql)
+
+
+async def _init_connection(conn):
+    for json_type in ("json", "jsonb"):
+        await conn.set_type_codec(json_type, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+class AsyncDataManager:
+    def __init__(
+        self,
+        db_config: dict,
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout: float = 10.0,
+    ):
+        self.db_config = db_config
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.logger = logger
+        self._pool = None
+        self._lock = None
+        self._timezone: Optional[tzinfo] = None
+        self._count_sql = to_asyncpg(COUNT_SQL)
+
+    async def _get_pool(self):
+        # 首次请求时在当前事件循环中创建连接池
+        if self._pool is None:
+            if self._lock is None:
+                self._lock = asyncio.Lock()
+            async with self._lock:
+                if self._pool is None:
+                    # 只有启用异步读取时才需要 asyncpg
+                    import asyncpg
+
+                    pool = await asyncpg.create_pool(
+                        min_size=self.min_size,
+                        max_size=self.max_size,
+                        init=_init_connection,
+                        **self.db_config,
+                    )
+                    async with pool.acquire(timeout=self.timeout) as conn:
+                        self._timezone = self._load_timezone(await conn.fetchval("SHOW TimeZone"))
+                    self._pool = pool
+                    self.logger.info(f"异步数据库连接池已创建，min={self.min_size}, max={self.max_size}")
+        return self._pool
+
+    @staticmethod
+    def _load_timezone(name: str) -> Optional[tzinfo]:
+        try:
+            return ZoneInfo(name)
+        except Exception:
+            logger.warning(f"无法识别数据库时区 {name}，时间按 UTC 返回")
+            return None
+
+    def _to_dict(self, record) -> Dict[str, Any]:
+        item = dict(record)
+        if self._timezone is not None:
+            for key, value in item.items():
+                if isinstance(value, datetime) and value.tzinfo is not None:
+                    item[key] = value.astimezone(self._timezone)
+        return item
+
+    def _as_session_time(self, value: datetime) -> datetime:
+        if value.tzinfo is None and self._timezone is not None:
+            return value.replace(tzinfo=self._timezone)
+        return value
+
+    async def _fetch(self, sql: str, *args) -> List[Dict[str, Any]]:
+        pool = await self._get_pool()
+        async with pool.acquire(timeout=self.timeout) as conn:
+            records = await conn.fetch(sql, *args)
+        return [self._to_dict(record) for record in records]
+
+    async def fetch_paginated_from_pg(self, page=1, page_size=10, after_id: Optional[int] = None):
+        sql, params = page_query(page, page_size, after_id)
+        try:
+            return rename_deleted(await self._fetch(to_asyncpg(sql), *params))
+        except Exception as e:
+            self.logger.error(f"分页查询失败: {str(e)}")
+            raise
+
+    async def fetch_posts_created_after(
+        self,
+        created_after: datetime,
+        page: int = 1,
+        page_size: int = 100,
+        after: Optional[Tuple[datetime, int]] = None,
+    ) -> List[Dict[str, Any]]:
+        try:
+            await self._get_pool()
+            sql, params = latest_query(self._as_session_time(created_after), page, page_size, after)
+            return await self._fetch(to_asyncpg(sql), *params)
+        except Exception as e:
+            self.logger.error(f"查询创建时间在 {created_after} 之后的帖子失败: {str(e)}")
+            raise
+
+    async def get_total_count(self):
+        try:
+            pool = await self._get_pool()
+            async with pool.acquire(timeout=self.timeout) as conn:
+                return await conn.fetchval(self._count_sql)
+        except Exception as e:
+            self.logger.error(f"总数查询失败: {str(e)}")
+            raise
+
+    async def estimate_total_count(self):
+        try:
+            pool = await self._get_pool()
+            async with pool.acquire(timeout=self.timeout) as conn:
+                return plan_rows(await conn.fetchval(ESTIMATE_SQL))
+        except Exception as e:
+            self.logger.error(f"总数估算失败: {str(e)}")
+            raise
+
+    async def get_data_version(self):
+        pool = await self._get_pool()
+        async with pool.acquire(timeout=self.timeout) as conn:
+            return await conn.fetchval(DATA_VERSION_SQL)
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+
+async_data_manager = AsyncDataManager(
+    {
+        "database": settings.db_name,
+        "user": settings.db_user,
+        "password": settings.db_password,
+        "host": settings.db_host,
+        "port": int(settings.db_port) if settings.db_port else None,
+    },
+    min_size=settings.db_pool_min_size,
+    max_size=settings.db_pool_max_size,
+    timeout=settings.db_pool_timeout,
+)
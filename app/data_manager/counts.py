@@ -0,0 +1,56 @@
+"""
+/api/v1/data 的总数缓存。总数在数据版本号变化（写入提交）或超过 max_age 秒后才重新计算，
+并发请求同一时间只计算一次。mode 为 estimate 时用规划器统计信息估算，不执行 COUNT(*)。
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
+
+from app.db.data_version import DataVersion, data_version
+from config.settings import settings
+
+COUNT_MODES = ("exact", "estimate")
+
+
+class CountCache:
+    def __init__(self, versions: DataVersion, max_age: float = 300):
+        self.versions = versions
+        self.max_age = max_age
+        self._entries = {}
+        self._lock = None
+
+    def _fresh(self, entry) -> bool:
+        return (
+            entry is not None
+            and entry["version"] == self.versions.current
+            and time.monotonic() - entry["computed_at"] < self.max_age
+        )
+
+    async def get(self, mode: str, compute: Callable[[], Awaitable[int]]) -> dict:
+        """返回 {"total", "estimated", "counted_at"}，counted_at 为计算总数的 UTC 时间"""
+        entry = self._entries.get(mode)
+        if not self._fresh(entry):
+            if self._lock is None:
+                self._lock = asyncio.Lock()
+            async with self._lock:
+                entry = self._entries.get(mode)
+                if not self._fresh(entry):
+                    # 先取版本号再计算，计算期间有写入时下一次请求会重新计算
+                    version = self.versions.current
+                    total = await compute()
+                    entry = {
+                        "total": total,
+                        "version": version,
+                        "computed_at": time.monotonic(),
+                        "counted_at": datetime.now(timezone.utc),
+                    }
+                    self._entries[mode] = entry
+        return {
+            "total": entry["total"],
+            "estimated": mode == "estimate",
+            "counted_at": entry["counted_at"],
+        }
+
+
+count_cache = CountCache(data_version, max_age=settings.count_cache_max_age)
@@ -1,80 +1,197 @@
-from datetime import datetime
-import psycopg2
-from typing import List, Dict, Any
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import List, Dict, Any, Iterator, Optional, Sequence, Tuple
 import logging
-from config.settings import settings
+from psycopg2 import sql
+from app.data_manager.pool import ConnectionPool, db_pool
+from app.db import base
+from app.db.data_version import data_version
+
+# 内部使用的列，不出现在接口和导出的数据中
+INTERNAL_COLUMNS = {"content_hash"}
+PUBLIC_COLUMNS = tuple(
+    column.name for column in base.Discussion.__table__.columns if column.name not in INTERNAL_COLUMNS
+)
+_SELECT_COLUMNS = ", ".join(PUBLIC_COLUMNS)
+
+# 同步与异步（async_manager）查询共用的 SQL，参数占位符为 %s
+OPEN_PREDICATE = """
+    topic_closed = FALSE
+    AND (
+        (topic_summary IS NOT NULL AND topic_summary <> '')
+        OR ((topic_summary IS NULL OR topic_summary = '') AND is_deleted = FALSE)
+    )
+"""
+PAGE_SQL = f"SELECT {_SELECT_COLUMNS} FROM discussion WHERE {OPEN_PREDICATE} ORDER BY id LIMIT %s OFFSET %s"
+# 游标分页：从上一页最后一条之后继续读取，不扫描并丢弃前面的行
+PAGE_AFTER_SQL = f"SELECT {_SELECT_COLUMNS} FROM discussion WHERE {OPEN_PREDICATE} AND id > %s ORDER BY id LIMIT %s"
+LATEST_SQL = f"""
+    SELECT {_SELECT_COLUMNS} FROM discussion
+    WHERE created_at >= %s AND is_deleted = FALSE
+    ORDER BY created_at ASC, id ASC
+    LIMIT %s OFFSET %s
+"""
+LATEST_AFTER_SQL = f"""
+    SELECT {_SELECT_COLUMNS} FROM discussion
+    WHERE created_at >= %s AND is_deleted = FALSE AND (created_at, id) > (%s, %s)
+    ORDER BY created_at ASC, id ASC
+    LIMIT %s
+"""
+# 总数与分页查询使用同一过滤条件，total_pages 才与实际页数一致
+COUNT_SQL = f"SELECT COUNT(*) FROM discussion WHERE {OPEN_PREDICATE}"
+# 估算总数：取规划器按统计信息估计的行数
+ESTIMATE_SQL = f"EXPLAIN (FORMAT JSON) SELECT 1 FROM discussion WHERE {OPEN_PREDICATE}"
+# 数据版本号，由 discussion 上的触发器维护（迁移 3）
+DATA_VERSION_SQL = "SELECT version FROM data_version WHERE id = 1"
+
+
+def check_page(page: int, page_size: int) -> int:
+    """校验分页参数，返回 offset"""
+    if page < 1 or page_size < 1:
+        raise ValueError("页码和分页大小必须大于0")
+    return (page - 1) * page_size
+
+
+def page_query(page: int, page_size: int, after_id: Optional[int] = None) -> Tuple[str, tuple]:
+    if after_id is not None:
+        check_page(1, page_size)
+        return PAGE_AFTER_SQL, (after_id, page_size)
+    return PAGE_SQL, (page_size, check_page(page, page_size))
+
+
+def latest_query(
+    created_after: datetime, page: int, page_size: int, after: Optional[Tuple[datetime, int]] = None
+) -> Tuple[str, tuple]:
+    if after is not None:
+        check_page(1, page_size)
+        return LATEST_AFTER_SQL, (created_after, after[0], after[1], page_size)
+    return LATEST_SQL, (created_after, page_size, check_page(page, page_size))
+
+
+def encode_cursor(kind: str, **values) -> str:
+    """游标对调用方不透明：类型和上一页最后一条的排序键，JSON 后 base64 编码"""
+    payload = json.dumps({"k": kind, **values}, separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, kind: str) -> dict:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("无效的分页游标")
+    if not isinstance(payload, dict) or payload.get("k") != kind:
+        raise ValueError("无效的分页游标")
+    return payload
+
+
+def data_cursor_after(cursor: str) -> int:
+    payload = decode_cursor(cursor, "data")
+    if not isinstance(payload.get("id"), int):
+        raise ValueError("无效的分页游标")
+    return payload["id"]
+
+
+def latest_cursor_after(cursor: str) -> Tuple[datetime, int]:
+    payload = decode_cursor(cursor, "latest")
+    try:
+        created_at = datetime.fromisoformat(payload["created_at"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("无效的分页游标")
+    if not isinstance(payload.get("id"), int):
+        raise ValueError("无效的分页游标")
+    return created_at, payload["id"]
+
+
+def next_cursor(kind: str, rows: List[Dict[str, Any]], page_size: int) -> Optional[str]:
+    """不足一页时已到末尾，返回 None"""
+    if len(rows) < page_size:
+        return None
+    last = rows[-1]
+    if kind == "latest":
+        return encode_cursor(kind, created_at=last["created_at"].isoformat(), id=last["id"])
+    return encode_cursor(kind, id=last["id"])
+
+
+def plan_rows(explain) -> int:
+    """EXPLAIN (FORMAT JSON) 输出中根节点的估计行数"""
+    if isinstance(explain, str):
+        explain = json.loads(explain)
+    return int(explain[0]["Plan"]["Plan Rows"])
+
+
+# 导出字段：接口中 is_deleted 以 source_deleted 返回
+EXPORT_FIELDS = {("source_deleted" if column == "is_deleted" else column): column for column in PUBLIC_COLUMNS}
+
+
+def export_columns(fields: Optional[Sequence[str]]) -> List[Tuple[str, str]]:
+    """校验导出字段，返回 [(输出字段名, 列名)]；未指定时导出全部字段"""
+    if not fields:
+        return list(EXPORT_FIELDS.items())
+    unknown = [field for field in fields if field not in EXPORT_FIELDS]
+    if unknown:
+        raise ValueError(f"未知的导出字段: {', '.join(unknown)}")
+    return [(field, EXPORT_FIELDS[field]) for field in dict.fromkeys(fields)]
+
+
+def _json_default(value):
+    # 与 FastAPI jsonable_encoder 的转换一致
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+def rename_deleted(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    for item in results:
+        if "is_deleted" in item:
+            item["source_deleted"] = item.pop("is_deleted")
+    return results
 
 
 class DataManager:
     VALID_FIELDS = {"id", "url", "topic_closed", "topic_summary"}
 
-    def __init__(self):
-        # 数据库配置（请根据实际情况修改）
-        self.DB_CONFIG = {
-            "dbname": settings.db_name,
-            "user": settings.db_user,
-            "password": settings.db_password,
-            "host": settings.db_host,
-            "port": settings.db_port,
-        }
+    def __init__(self, pool: ConnectionPool = None):
+        self.pool = pool or db_pool
         self.logger = logging.getLogger(__name__)
         self.table_name = "discussion"
 
-    def fetch_paginated_from_pg(self, page=1, page_size=10):
-        if page < 1 or page_size < 1:
-            raise ValueError("页码和分页大小必须大于0")
-
-        offset = (page - 1) * page_size
+    def fetch_paginated_from_pg(self, page=1, page_size=10, after_id: Optional[int] = None):
+        sql, params = page_query(page, page_size, after_id)
         try:
-            with psycopg2.connect(**self.DB_CONFIG) as conn:
+            with self.pool.connection() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute(
-                        f"""
-                        SELECT * FROM {self.table_name} 
-                        WHERE topic_closed = FALSE 
-                        AND (
-                            (topic_summary IS NOT NULL AND topic_summary <> '')
-                            OR ((topic_summary IS NULL OR topic_summary = '') AND is_deleted = FALSE)
-                        )
-                        ORDER BY id 
-                        LIMIT %s OFFSET %s;
-                        """,
-                        (page_size, offset),
-                    )
+                    cursor.execute(sql, params)
                     columns = [desc[0] for desc in cursor.description]
                     results = [dict(zip(columns, row)) for row in cursor.fetchall()]
-                    for item in results:
-                        if "is_deleted" in item:
-                            item["source_deleted"] = item.pop("is_deleted")
-                    return results
+                    return rename_deleted(results)
         except Exception as e:
             self.logger.error(f"分页查询失败: {str(e)}")
             raise
 
-    def fetch_posts_created_after(self, created_after: datetime, page: int = 1, page_size: int = 100) -> List[Dict[str, Any]]:
+    def fetch_posts_created_after(
+        self,
+        created_after: datetime,
+        page: int = 1,
+        page_size: int = 100,
+        after: Optional[Tuple[datetime, int]] = None,
+    ) -> List[Dict[str, Any]]:
         """
         获取指定时间之后创建的帖子列表
 
         :param created_after: 起始时间，查询该时间之后创建的帖子
+        :param after: 游标分页时上一页最后一条的 (created_at, id)，指定时忽略 page
         :return: 帖子字典列表
         """
-        if page < 1 or page_size < 1:
-            raise ValueError("页码和分页大小必须大于0")
-
-        offset = (page - 1) * page_size
+        sql, params = latest_query(created_after, page, page_size, after)
         try:
-            with psycopg2.connect(**self.DB_CONFIG) as conn:
+            with self.pool.connection() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute(
-                        f"""
-                        SELECT * FROM {self.table_name}
-                        WHERE created_at >= %s AND is_deleted = FALSE
-                        ORDER BY created_at ASC
-                        LIMIT %s OFFSET %s;
-                        """,
-                        (created_after, page_size, offset),
-                        
-                    )
+                    cursor.execute(sql, params)
                     columns = [desc[0] for desc in cursor.description]
                     results = [dict(zip(columns, row)) for row in cursor.fetchall()]
                     return results
@@ -85,16 +202,63 @@ class DataManager:
 
     def get_total_count(self):
         try:
-            with psycopg2.connect(**self.DB_CONFIG) as conn:
+            with self.pool.connection() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute(
-                        f"SELECT COUNT(*) FROM {self.table_name} WHERE topic_closed = FALSE AND is_deleted = FALSE;"
-                    )
+                    cursor.execute(COUNT_SQL)
                     return cursor.fetchone()[0]
         except Exception as e:
             self.logger.error(f"总数查询失败: {str(e)}")
             raise
 
+    def estimate_total_count(self):
+        try:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(ESTIMATE_SQL)
+                    return plan_rows(cursor.fetchone()[0])
+        except Exception as e:
+            self.logger.error(f"总数估算失败: {str(e)}")
+            raise
+
+    def get_data_version(self):
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(DATA_VERSION_SQL)
+                return cursor.fetchone()[0]
+
+    def export_open_discussions(self, columns: List[Tuple[str, str]], itersize: int = 2000) -> Iterator[bytes]:
+        """
+        以 NDJSON 逐块导出 /data 范围内的全部讨论。使用命名的服务端游标，每次从数据库取 itersize 行，
+        内存占用与结果集大小无关；调用方中途停止迭代时归还连接
+        """
+        query = sql.SQL("SELECT {columns} FROM discussion WHERE {predicate} ORDER BY id").format(
+            columns=sql.SQL(", ").join(sql.Identifier(column) for _, column in columns),
+            predicate=sql.SQL(OPEN_PREDICATE),
+        )
+        names = [name for name, _ in columns]
+        exported = 0
+        try:
+            with self.pool.connection() as conn:
+                with conn.cursor(name="discussion_export") as cursor:
+                    cursor.itersize = itersize
+                    cursor.execute(query)
+                    while True:
+                        rows = cursor.fetchmany(itersize)
+                        if not rows:
+                            break
+                        exported += len(rows)
+                        yield "".join(
+                            json.dumps(dict(zip(names, row)), ensure_ascii=False, default=_json_default) + "\n"
+                            for row in rows
+                        ).encode("utf-8")
+            self.logger.info(f"导出完成，共 {exported} 条")
+        except GeneratorExit:
+            self.logger.info(f"导出在 {exported} 条时被中断")
+            raise
+        except Exception as e:
+            self.logger.error(f"导出失败（已输出 {exported} 条）: {str(e)}")
+            raise
+
     def validate_update_data(self, data: List[Dict]) -> bool:
         for item in data:
             if "id" not in item:
@@ -107,11 +271,7 @@ class DataManager:
         if not data_list:
             return 0
 
-        conn = None
         try:
-            conn = psycopg2.connect(**self.DB_CONFIG)
-            cursor = conn.cursor()
-
             # 过滤非法字段
             filtered_data = [
                 {
@@ -131,15 +291,15 @@ class DataManager:
                 for item in filtered_data
             ]
 
-            cursor.executemany(sql, params_list)
-            conn.commit()
-            return cursor.rowcount
+            # 正常结束时提交，异常时回滚
+            with self.pool.connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.executemany(sql, params_list)
+                    updated = cursor.rowcount
+            if updated:
+                data_version.invalidate("update_pg_data")
+            return updated
 
         except Exception as e:
-            if conn:
-                conn.rollback()
             self.logger.error(f"批量更新失败: {str(e)}")
             raise
-        finally:
-            if conn:
-                conn.close()
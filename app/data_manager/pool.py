@@ -0,0 +1,164 @@
+"""
+DataManager 查询使用的 psycopg2 连接池，与 app/db/base.py 中采集清洗任务使用的 SQLAlchemy 连接池分开，
+批量写入占满连接时不影响接口读取。
+- 连接数有上限，连接用尽时最多等待 timeout 秒
+- 空闲超过 health_check_interval 秒的连接在取出时先执行 SELECT 1，失效的连接丢弃后重新建立
+- stats() 返回等待时间、超时次数、丢弃连接数等指标
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+from psycopg2 import extensions
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        db_config: dict,
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout: float = 10.0,
+        health_check_interval: float = 30.0,
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("连接池大小配置无效")
+        self.db_config = db_config
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._pool = None
+        self._init_lock = threading.Lock()
+        # ThreadedConnectionPool 连接用尽时直接抛错，用信号量实现有上限的等待
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._last_used = {}
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "discarded": 0,
+            "in_use": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    def _get_pool(self):
+        # 首次使用时才建立连接，导入模块时不连接数据库
+        if self._pool is None:
+            with self._init_lock:
+                if self._pool is None:
+                    self._pool = pg_pool.ThreadedConnectionPool(self.min_size, self.max_size, **self.db_config)
+                    logger.info(f"数据库连接池已创建，min={self.min_size}, max={self.max_size}")
+        return self._pool
+
+    def _record(self, **values):
+        with self._stats_lock:
+            for key, value in values.items():
+                if key == "wait_seconds_max":
+                    self._stats[key] = max(self._stats[key], value)
+                else:
+                    self._stats[key] += value
+
+    def _healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        # 新建立的连接不检查
+        if last_used is None or time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            self._record(timeouts=1)
+            raise PoolTimeout(f"等待数据库连接超时（{self.timeout}s，连接池上限 {self.max_size}）")
+        try:
+            pool = self._get_pool()
+            conn = pool.getconn()
+            while not self._healthy(conn):
+                self._last_used.pop(id(conn), None)
+                pool.putconn(conn, close=True)
+                self._record(discarded=1)
+                conn = pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+        waited = time.monotonic() - started
+        self._record(checkouts=1, in_use=1, wait_seconds_total=waited, wait_seconds_max=waited)
+        return conn
+
+    def putconn(self, conn):
+        close = bool(conn.closed)
+        if not close and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                close = True
+        if close:
+            self._last_used.pop(id(conn), None)
+            self._record(discarded=1)
+        else:
+            self._last_used[id(conn)] = time.monotonic()
+        try:
+            self._get_pool().putconn(conn, close=close)
+        finally:
+            self._record(in_use=-1)
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """取出连接，正常结束时提交、异常时回滚，之后归还连接池"""
+        conn = self.getconn()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self.putconn(conn)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        checkouts = stats["checkouts"]
+        stats["wait_seconds_avg"] = stats["wait_seconds_total"] / checkouts if checkouts else 0.0
+        stats.update(min_size=self.min_size, max_size=self.max_size)
+        return stats
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.closeall()
+            self._pool = None
+            self._last_used.clear()
+
+
+db_pool = ConnectionPool(
+    {
+        "dbname": settings.db_name,
+        "user": settings.db_user,
+        "password": settings.db_password,
+        "host": settings.db_host,
+        "port": settings.db_port,
+    },
+    min_size=settings.db_pool_min_size,
+    max_size=settings.db_pool_max_size,
+    timeout=settings.db_pool_timeout,
+    health_check_interval=settings.db_pool_health_check_interval,
+)
@@ -0,0 +1,91 @@
+"""
+读接口的响应缓存。按接口和参数缓存序列化后的 JSON，缓存项绑定数据库中的数据版本号（app/db/data_version.py），
+任何进程写入 discussion 后版本号变化，旧缓存不再命中。每个响应带强 ETag（响应内容的哈希），
+请求的 If-None-Match 与缓存中当前版本的 ETag 一致时直接返回 304，不查询数据库。
+按条数和总字节数限制内存，超出时淘汰最久未使用的项。
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Hashable, NamedTuple, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from config.settings import settings
+
+
+class CachedResponse(NamedTuple):
+    version: int
+    body: bytes
+    etag: str
+
+
+def render(payload) -> bytes:
+    """与 FastAPI 的 JSONResponse 输出一致的序列化"""
+    return json.dumps(
+        jsonable_encoder(payload), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 使用弱比较，忽略 W/ 前缀"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: Hashable, version: int) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                if entry is not None:
+                    self._remove(key)
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry
+
+    def put(self, key: Hashable, version: int, body: bytes) -> CachedResponse:
+        entry = CachedResponse(version, body, make_etag(body))
+        # 单个响应超过上限时不缓存
+        if len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+        return entry
+
+    def _remove(self, key: Hashable):
+        self._bytes -= len(self._entries.pop(key).body)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries), "bytes": self._bytes}
+
+
+response_cache = ResponseCache(
+    max_entries=settings.response_cache_max_entries, max_bytes=settings.response_cache_max_bytes
+)
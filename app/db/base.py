@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, inspect, Column, Integer, String, Text, Boolean, DateTime, JSON, UniqueConstraint
+from sqlalchemy import create_engine, inspect, Column, Integer, BigInteger, String, Text, Boolean, DateTime, JSON, UniqueConstraint, ForeignKey
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -39,6 +39,8 @@ class Discussion(Base):
     solution = Column(Text)
     url = Column(String(512))
     clean_data = Column(Text)
+    # 标题和正文的内容哈希，变化时重新生成摘要
+    content_hash = Column(String(64))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now())
     topic_summary = Column(Text)
@@ -50,6 +52,94 @@ class Discussion(Base):
     posted = Column(Boolean, default=False)
 
 
+class LLMCache(Base):
+    __tablename__ = 'llm_cache'
+
+    # sha256(model, system prompt, user content)
+    cache_key = Column(String(64), primary_key=True)
+    model = Column(String(128), nullable=False)
+    response = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    last_hit_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    hit_count = Column(Integer, default=0)
+
+
+class DiscussionSignature(Base):
+    __tablename__ = 'discussion_signature'
+
+    __table_args__ = (
+        UniqueConstraint('source_id', 'source_type', name='uq_discussion_signature_source'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    source_id = Column(Text, nullable=False)
+    source_type = Column(String(50), nullable=False)
+    # MinHash 签名
+    signature = Column(JSON, nullable=False)
+    summary = Column(Text)
+    # 近似重复记录关联到的规范记录，规范记录本身为空
+    canonical_source_id = Column(Text)
+    canonical_source_type = Column(String(50))
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class SignatureBand(Base):
+    __tablename__ = 'signature_band'
+
+    # LSH 分桶键
+    band_key = Column(BigInteger, primary_key=True)
+    signature_id = Column(
+        Integer, ForeignKey('discussion_signature.id', ondelete='CASCADE'), primary_key=True, index=True
+    )
+
+
+class WorkRun(Base):
+    __tablename__ = 'work_run'
+
+    id = Column(Integer, primary_key=True)
+    community = Column(String(50), nullable=False)
+    # 本轮采集的起始时间，恢复运行时沿用
+    window_start = Column(DateTime, nullable=False)
+    # 已完成采集并入队的数据源
+    collected_sources = Column(JSON, default=list)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), index=True)
+
+
+class WorkItem(Base):
+    __tablename__ = 'work_item'
+
+    __table_args__ = (
+        UniqueConstraint('run_id', 'source_type', 'source_id', name='uq_work_item_run_source'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    run_id = Column(Integer, ForeignKey('work_run.id', ondelete='CASCADE'), nullable=False)
+    source_type = Column(String(50), nullable=False)
+    source_id = Column(Text, nullable=False)
+    # collected / cleaned / stored / failed / rejected / dead
+    state = Column(String(20), nullable=False, index=True)
+    # 采集到的原始数据
+    payload = Column(JSON, nullable=False)
+    # 清洗结果，即待写入 discussion 的记录
+    result = Column(JSON)
+    error = Column(Text)
+    error_class = Column(String(100))
+    # 清洗失败次数，及死信队列中下一次重试的时间
+    attempts = Column(Integer, default=0)
+    next_retry_at = Column(DateTime(timezone=True), index=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class SchemaVersion(Base):
+    __tablename__ = 'schema_version'
+
+    # 已执行的迁移版本，见 app/db/migrations.py
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String(255), nullable=False)
+    applied_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
 def check_and_create_tables():
     inspector = inspect(engine)
     try:
@@ -63,3 +153,4 @@ def check_and_create_tables():
     if missing_tables:
         Base.metadata.create_all(bind=engine)
         logging.info(f"已自动创建缺失的数据表: {', '.join(missing_tables)}")
+
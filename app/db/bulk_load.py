@@ -0,0 +1,215 @@
+"""
+大批量回填入库：记录经 COPY FROM STDIN 流式写入 UNLOGGED 暂存表，
+再用一条 INSERT ... SELECT ... ON CONFLICT DO UPDATE 合并到 discussion。
+冲突时的更新规则与逐批 upsert 共用 on_conflict_update。
+专题同步按块执行 UPDATE discussion ... FROM (VALUES ...)，每块一次往返。
+"""
+import json
+import logging
+import time
+from typing import Iterable, Iterator, List, Tuple
+
+from sqlalchemy import (
+    Boolean,
+    DateTime,
+    Integer,
+    JSON,
+    Text,
+    case,
+    cast,
+    column,
+    func,
+    or_,
+    select,
+    table,
+    text,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import insert
+from app.data_collect_clean import normalize
+from app.db import base
+
+logger = logging.getLogger(__name__)
+
+STAGING_TABLE = "discussion_staging"
+TOPIC_CHUNK_SIZE = 1000
+# 写入暂存表并合并的列，与 build_upsert_statement 插入的列一致
+COLUMNS = (
+    "source_id",
+    "source_type",
+    "title",
+    "body",
+    "url",
+    "topic_summary",
+    "topic_closed",
+    "created_at",
+    "updated_at",
+    "clean_data",
+    "history",
+    "source_closed",
+    "content_hash",
+)
+# 冲突时直接覆盖的可变字段
+UPSERT_MUTABLE_COLUMNS = ("title", "body", "url", "source_closed", "updated_at")
+
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def on_conflict_update(stmt):
+    """discussion 的 INSERT 语句加上冲突更新规则；可变字段都未变化的行不更新"""
+    target = base.Discussion.__table__
+    excluded = stmt.excluded
+    set_ = {col: excluded[col] for col in UPSERT_MUTABLE_COLUMNS}
+    # 没有哈希的记录不清空库中的哈希
+    set_["content_hash"] = func.coalesce(excluded.content_hash, target.c.content_hash)
+    # 只有新摘要或内容变化后重新生成的摘要才覆盖 clean_data，未变化的记录 clean_data 为空
+    set_["clean_data"] = case(
+        (func.coalesce(excluded.clean_data, "") != "", excluded.clean_data), else_=target.c.clean_data
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=["source_id", "source_type"],
+        set_=set_,
+        where=or_(*(target.c[col].is_distinct_from(value) for col, value in set_.items())),
+    )
+
+
+def _formatters():
+    """按 discussion 的列类型生成 COPY 文本格式的转换函数"""
+    columns = base.Discussion.__table__.c
+    formatters = []
+    for name in COLUMNS:
+        column_type = columns[name].type
+        if isinstance(column_type, JSON):
+            formatters.append(lambda v: json.dumps(v, ensure_ascii=False, default=str))
+        elif isinstance(column_type, Boolean):
+            formatters.append(lambda v: "t" if v else "f")
+        elif isinstance(column_type, DateTime):
+            formatters.append(lambda v: v.isoformat() if hasattr(v, "isoformat") else str(v))
+        else:
+            formatters.append(str)
+    return formatters
+
+
+def copy_rows(records: Iterable[dict]) -> Iterator[str]:
+    """把记录转换为 COPY 文本格式的行，None 写为 \\N"""
+    formatters = _formatters()
+    for record in records:
+        record["clean_data"] = normalize.decode_quoted_json(record.get("clean_data"))
+        fields = []
+        for name, fmt in zip(COLUMNS, formatters):
+            value = record.get(name)
+            fields.append("\\N" if value is None else fmt(value).translate(_COPY_ESCAPES))
+        yield "\t".join(fields) + "\n"
+
+
+class CopyStream:
+    """按需从行迭代器读取的只读文件对象，COPY 期间不在内存中拼接整个数据集"""
+
+    def __init__(self, lines: Iterator[str]):
+        self._lines = lines
+        self._buffer = b""
+        self.rows = 0
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._buffer += line.encode("utf-8")
+            self.rows += 1
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+def merge_statement():
+    """暂存表中同一记录只取最后写入的一行，合并到 discussion"""
+    staging = table(STAGING_TABLE, *(column(name) for name in COLUMNS + ("seq",)))
+    latest = (
+        select(*(staging.c[name] for name in COLUMNS))
+        .distinct(staging.c.source_id, staging.c.source_type)
+        .order_by(staging.c.source_id, staging.c.source_type, staging.c.seq.desc())
+    )
+    return on_conflict_update(insert(base.Discussion).from_select(list(COLUMNS), latest))
+
+
+def ensure_staging_table(conn):
+    # 列类型取自 discussion，seq 记录写入顺序
+    conn.execute(
+        text(
+            f"CREATE UNLOGGED TABLE IF NOT EXISTS {STAGING_TABLE} AS "
+            f"SELECT {', '.join(COLUMNS)} FROM discussion WITH NO DATA"
+        )
+    )
+    conn.execute(text(f"ALTER TABLE {STAGING_TABLE} ADD COLUMN IF NOT EXISTS seq BIGSERIAL"))
+
+
+def copy_merge(records: List[dict]) -> int:
+    """
+    在一个事务中清空暂存表、COPY 写入、合并到 discussion，返回实际写入的行数。
+    TRUNCATE 持有排他锁，并发的回填会依次执行。
+    """
+    started = time.monotonic()
+    with base.engine.begin() as conn:
+        ensure_staging_table(conn)
+        conn.execute(text(f"TRUNCATE {STAGING_TABLE}"))
+        stream = CopyStream(copy_rows(records))
+        with conn.connection.dbapi_connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {STAGING_TABLE} ({', '.join(COLUMNS)}) FROM STDIN", stream)
+        copied = time.monotonic()
+        written = conn.execute(merge_statement()).rowcount
+        conn.execute(text(f"TRUNCATE {STAGING_TABLE}"))
+    finished = time.monotonic()
+    elapsed = finished - started
+    logger.info(
+        f"COPY 写入暂存表 {stream.rows} 条，耗时 {copied - started:.2f}s；合并写入 {written} 条，"
+        f"耗时 {finished - copied:.2f}s；{stream.rows / elapsed if elapsed > 0 else 0:.0f} 行/秒"
+    )
+    return written
+
+
+def update_topics(session, assignments: Iterable[dict]) -> Tuple[int, List]:
+    """
+    批量更新 discussion 的专题字段，assignments 中每项包含 id、topic_summary、topic_closed、posted；
+    同一 id 以最后一项为准。返回 (更新的行数, 库中不存在的 id)，由调用方提交事务
+    """
+    rows = {}
+    for assignment in assignments:
+        try:
+            discussion_id = int(assignment["id"])
+        except (TypeError, ValueError):
+            logger.warning(f"无效的 discussion id: {assignment.get('id')}")
+            continue
+        rows[discussion_id] = (
+            discussion_id,
+            assignment.get("topic_summary"),
+            assignment.get("topic_closed"),
+            assignment.get("posted"),
+        )
+    rows = list(rows.values())
+    target = base.Discussion.__table__
+    matched = set()
+    for i in range(0, len(rows), TOPIC_CHUNK_SIZE):
+        chunk = values(
+            column("id", Integer),
+            column("topic_summary", Text),
+            column("topic_closed", Boolean),
+            column("posted", Boolean),
+            name="topic",
+        ).data(rows[i : i + TOPIC_CHUNK_SIZE])
+        result = session.execute(
+            update(target)
+            .where(target.c.id == chunk.c.id)
+            # 整块都为 NULL 时 VALUES 列会被推断为 text，布尔列显式转换
+            .values(
+                topic_summary=chunk.c.topic_summary,
+                topic_closed=cast(chunk.c.topic_closed, Boolean),
+                posted=cast(chunk.c.posted, Boolean),
+            )
+            .returning(target.c.id)
+        )
+        matched.update(result.scalars())
+    unmatched = [row[0] for row in rows if row[0] not in matched]
+    return len(matched), unmatched
@@ -0,0 +1,55 @@
+"""
+discussion 表的数据版本号，读接口的缓存以版本号判断是否失效。
+版本号保存在数据库的 data_version 表中，有行变化的写入事务提交时由 discussion 上的触发器递增（迁移 3），
+因此其他进程、其他部署等任何写入都会使缓存失效；未改变任何行的写入（如跳过未变化记录的 upsert）不递增。
+读取方最多每 poll_interval 秒查询一次版本号；本进程的写入提交后调用 invalidate，下一次读取立即重新查询。
+版本号读取失败（如迁移尚未执行）时 current 为 None，调用方不使用缓存。
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DataVersion:
+    def __init__(self, poll_interval: float = 2.0):
+        self.poll_interval = poll_interval
+        self._version: Optional[int] = None
+        self._checked_at: Optional[float] = None
+        self._lock = None
+
+    @property
+    def current(self) -> Optional[int]:
+        return self._version
+
+    def _stale(self) -> bool:
+        return self._checked_at is None or time.monotonic() - self._checked_at >= self.poll_interval
+
+    async def refresh(self, fetch: Callable[[], Awaitable[int]]) -> Optional[int]:
+        """距上次查询超过 poll_interval 秒时从数据库读取版本号，并发请求只查询一次"""
+        if self._stale():
+            if self._lock is None:
+                self._lock = asyncio.Lock()
+            async with self._lock:
+                if self._stale():
+                    try:
+                        self._version = await fetch()
+                    except Exception as e:
+                        # 迁移未执行时每次查询都会失败，只在首次失败时告警
+                        log = logger.warning if self._version is not None or self._checked_at is None else logger.debug
+                        log(f"读取数据版本号失败，不使用缓存: {str(e)}")
+                        self._version = None
+                    self._checked_at = time.monotonic()
+        return self._version
+
+    def invalidate(self, reason: str):
+        """本进程写入提交后调用，下一次 refresh 立即重新查询"""
+        self._checked_at = None
+        logger.debug(f"数据已变化（{reason}），下次读取时重新查询版本号")
+
+
+data_version = DataVersion(poll_interval=settings.data_version_poll_interval)
@@ -0,0 +1,210 @@
+"""
+版本化的数据库结构迁移。
+新表由 base.check_and_create_tables 按模型创建；已有表上的新增列、索引等结构变更写成迁移，
+按版本号顺序执行，已执行的版本记录在 schema_version 表中。
+索引可用 CREATE INDEX CONCURRENTLY 构建，不阻塞 discussion 的读写；该语句不能在事务中执行，
+因此索引在自动提交的连接上逐个构建，构建失败留下的无效索引会在下次执行前删除。
+
+服务启动时（main.initialize_processing_environment）总是执行未应用的迁移，也可在部署前手动执行:
+python -m app.db.migrations {status,upgrade} [--target N] [--no-concurrent]
+"""
+import argparse
+import logging
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import text
+from app.db import base
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_lock 的键，避免多个进程同时执行迁移
+LOCK_KEY = 7243001
+
+
+class IndexSpec(NamedTuple):
+    name: str
+    table: str
+    columns: str
+    where: str = ""
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    statements: Tuple[str, ...] = ()
+    indexes: Tuple[IndexSpec, ...] = ()
+
+
+MIGRATIONS: Tuple[Migration, ...] = (
+    Migration(
+        1,
+        "补齐此前由 add_missing_columns 自动添加的列",
+        statements=(
+            "ALTER TABLE discussion ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+            "ALTER TABLE work_item ADD COLUMN IF NOT EXISTS error_class VARCHAR(100)",
+            "ALTER TABLE work_item ADD COLUMN IF NOT EXISTS attempts INTEGER DEFAULT 0",
+            "ALTER TABLE work_item ADD COLUMN IF NOT EXISTS next_retry_at TIMESTAMP WITH TIME ZONE",
+        ),
+        indexes=(IndexSpec("ix_work_item_next_retry_at", "work_item", "next_retry_at"),),
+    ),
+    Migration(
+        2,
+        "discussion 查询索引",
+        indexes=(
+            # fetch_paginated_from_pg 与 get_total_count：按 id 排序的未关闭讨论。
+            # 谓词是创建索引时 manager.OPEN_PREDICATE 的快照，查询条件与之一致时规划器才能使用该索引
+            IndexSpec(
+                "ix_discussion_open_page",
+                "discussion",
+                "id",
+                "topic_closed = FALSE AND ("
+                "(topic_summary IS NOT NULL AND topic_summary <> '') "
+                "OR ((topic_summary IS NULL OR topic_summary = '') AND is_deleted = FALSE))",
+            ),
+            # fetch_posts_created_after：按创建时间排序的未删除讨论
+            IndexSpec("ix_discussion_live_created_at", "discussion", "created_at, id", "is_deleted = FALSE"),
+        ),
+    ),
+    Migration(
+        3,
+        "discussion 的数据版本号，有行变化的事务提交时由触发器递增",
+        statements=(
+            "CREATE TABLE IF NOT EXISTS data_version ("
+            "id INTEGER PRIMARY KEY, version BIGINT NOT NULL DEFAULT 0, "
+            "changed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now())",
+            "INSERT INTO data_version (id) VALUES (1) ON CONFLICT DO NOTHING",
+            # 有行变化的事务在此登记一次，提交时由延迟触发器递增版本号并删除登记，表中平时为空
+            "CREATE TABLE IF NOT EXISTS data_version_pending (txid BIGINT PRIMARY KEY)",
+            # 语句级触发器，通过转换表判断是否有行变化：ON CONFLICT ... WHERE 跳过的行不在转换表中
+            "CREATE OR REPLACE FUNCTION data_version_mark() RETURNS trigger AS $$ "
+            "BEGIN "
+            "IF TG_OP = 'TRUNCATE' THEN "
+            "INSERT INTO data_version_pending VALUES (txid_current()) ON CONFLICT DO NOTHING; "
+            "ELSIF EXISTS (SELECT 1 FROM changed_rows) THEN "
+            "INSERT INTO data_version_pending VALUES (txid_current()) ON CONFLICT DO NOTHING; "
+            "END IF; "
+            "RETURN NULL; "
+            "END $$ LANGUAGE plpgsql",
+            # 版本号行只在提交时加锁，写入事务执行期间不互相等待
+            "CREATE OR REPLACE FUNCTION data_version_bump() RETURNS trigger AS $$ "
+            "BEGIN "
+            "UPDATE data_version SET version = version + 1, changed_at = now() WHERE id = 1; "
+            "DELETE FROM data_version_pending WHERE txid = NEW.txid; "
+            "RETURN NULL; "
+            "END $$ LANGUAGE plpgsql",
+            "DROP TRIGGER IF EXISTS data_version_bump ON data_version_pending",
+            "CREATE CONSTRAINT TRIGGER data_version_bump AFTER INSERT ON data_version_pending "
+            "DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE PROCEDURE data_version_bump()",
+            # 带转换表的触发器只能对应一种事件
+            "DROP TRIGGER IF EXISTS discussion_data_version_insert ON discussion",
+            "CREATE TRIGGER discussion_data_version_insert AFTER INSERT ON discussion "
+            "REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT EXECUTE PROCEDURE data_version_mark()",
+            "DROP TRIGGER IF EXISTS discussion_data_version_update ON discussion",
+            "CREATE TRIGGER discussion_data_version_update AFTER UPDATE ON discussion "
+            "REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT EXECUTE PROCEDURE data_version_mark()",
+            "DROP TRIGGER IF EXISTS discussion_data_version_delete ON discussion",
+            "CREATE TRIGGER discussion_data_version_delete AFTER DELETE ON discussion "
+            "REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT EXECUTE PROCEDURE data_version_mark()",
+            "DROP TRIGGER IF EXISTS discussion_data_version_truncate ON discussion",
+            "CREATE TRIGGER discussion_data_version_truncate AFTER TRUNCATE ON discussion "
+            "FOR EACH STATEMENT EXECUTE PROCEDURE data_version_mark()",
+        ),
+    ),
+)
+
+
+def index_sql(index: IndexSpec, concurrent: bool) -> str:
+    sql = (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrent else ''}IF NOT EXISTS {index.name} "
+        f"ON {index.table} ({index.columns})"
+    )
+    return f"{sql} WHERE {index.where}" if index.where else sql
+
+
+def pending(applied: Iterable[int], target: Optional[int] = None) -> List[Migration]:
+    applied = set(applied)
+    return [
+        m for m in MIGRATIONS if m.version not in applied and (target is None or m.version <= target)
+    ]
+
+
+def applied_versions(conn) -> List[int]:
+    return [row[0] for row in conn.execute(text("SELECT version FROM schema_version ORDER BY version"))]
+
+
+def _drop_invalid_index(conn, name: str):
+    """CONCURRENTLY 构建中断会留下无效索引，IF NOT EXISTS 会跳过它，需要先删除"""
+    invalid = conn.execute(
+        text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ),
+        {"name": name},
+    ).first()
+    if invalid:
+        logger.warning(f"删除构建未完成的无效索引 {name}")
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+
+def apply(lock_conn, migration: Migration, concurrent: bool):
+    with base.engine.begin() as conn:
+        for statement in migration.statements:
+            conn.execute(text(statement))
+        if not concurrent:
+            for index in migration.indexes:
+                conn.execute(text(index_sql(index, concurrent=False)))
+    if concurrent:
+        for index in migration.indexes:
+            _drop_invalid_index(lock_conn, index.name)
+            lock_conn.execute(text(index_sql(index, concurrent=True)))
+    with base.engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO schema_version (version, name) VALUES (:version, :name) ON CONFLICT DO NOTHING"),
+            {"version": migration.version, "name": migration.name},
+        )
+
+
+def upgrade(target: Optional[int] = None, concurrent: bool = True) -> List[int]:
+    """执行未应用的迁移，返回本次执行的版本号"""
+    base.SchemaVersion.__table__.create(bind=base.engine, checkfirst=True)
+    done = []
+    with base.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_conn:
+        lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": LOCK_KEY})
+        try:
+            for migration in pending(applied_versions(lock_conn), target):
+                logger.info(f"执行数据库迁移 {migration.version}: {migration.name}")
+                apply(lock_conn, migration, concurrent)
+                done.append(migration.version)
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": LOCK_KEY})
+    logger.info(f"数据库迁移完成，本次执行的版本: {done}")
+    return done
+
+
+def status() -> dict:
+    base.SchemaVersion.__table__.create(bind=base.engine, checkfirst=True)
+    with base.engine.connect() as conn:
+        applied = applied_versions(conn)
+    return {
+        "current": max(applied, default=0),
+        "latest": MIGRATIONS[-1].version,
+        "pending": [m.version for m in pending(applied)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据库结构迁移")
+    parser.add_argument("command", choices=["status", "upgrade"])
+    parser.add_argument("--target", type=int, default=None)
+    parser.add_argument("--no-concurrent", action="store_true", help="在事务中构建索引，构建期间会锁表")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        logger.info(f"数据库结构版本: {status()}")
+    else:
+        upgrade(args.target, concurrent=settings.migration_concurrent_indexes and not args.no_concurrent)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+采集、清洗、存储之间的持久化工作队列。
+每轮运行记录在 work_run 中，每条数据在 work_item 中按 collected -> cleaned -> stored 推进，
+进程中断后重新运行会恢复未完成的一轮：已采集的数据源不再采集，已清洗的记录不再调用大模型。
+状态更新都带有前置状态条件，重复执行是幂等的。
+
+清洗失败的记录进入死信队列：可重试的错误标记为 failed，按指数间隔设置 next_retry_at，
+由重试任务只重新处理这些记录；超过最大次数标记为 dead；数据校验不通过（ValueError）标记为 rejected，不再重试。
+"""
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from app.data_collect_clean.llm_controller import classify_error
+from app.db import base
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+COLLECTED = "collected"
+CLEANED = "cleaned"
+STORED = "stored"
+FAILED = "failed"
+REJECTED = "rejected"
+DEAD = "dead"
+
+
+def is_retryable(error: Exception) -> bool:
+    """校验不通过和大模型拒绝的请求重试也不会成功"""
+    return not isinstance(error, ValueError) and classify_error(error) != "client"
+
+
+def to_json(value):
+    """采集数据中含有 datetime 等类型，转换为可存入 JSON 列的形式"""
+    return json.loads(json.dumps(value, ensure_ascii=False, default=str))
+
+
+class WorkQueue:
+    CHUNK_SIZE = 500
+
+    def __init__(self, max_attempts: int = 5, retry_base_minutes: float = 15, retry_max_minutes: float = 720):
+        self.max_attempts = max_attempts
+        self.retry_base = timedelta(minutes=retry_base_minutes)
+        self.retry_max = timedelta(minutes=retry_max_minutes)
+
+    def open_run(self, community: str, window_start: datetime) -> base.WorkRun:
+        """返回该社区未完成的一轮运行；没有时新建"""
+        with base.SessionLocal() as session:
+            run = (
+                session.query(base.WorkRun)
+                .filter(base.WorkRun.community == community, base.WorkRun.finished_at.is_(None))
+                .order_by(base.WorkRun.id.desc())
+                .first()
+            )
+            if run:
+                logger.info(
+                    f"恢复未完成的运行 {run.id}（起始时间 {run.window_start}，已采集 {run.collected_sources or []}）"
+                )
+            else:
+                run = base.WorkRun(community=community, window_start=window_start, collected_sources=[])
+                session.add(run)
+                session.commit()
+                session.refresh(run)
+            session.expunge(run)
+            return run
+
+    def enqueue(self, run_id: int, source_type: str, records: Iterable[dict]) -> int:
+        """采集结果入队；同一轮中已存在的记录保持原状态"""
+        rows = {}
+        for record in records:
+            if "id" not in record:
+                continue
+            rows[str(record["id"])] = {
+                "run_id": run_id,
+                "source_type": source_type,
+                "source_id": str(record["id"]),
+                "state": COLLECTED,
+                "payload": to_json(record),
+            }
+        rows = list(rows.values())
+        with base.SessionLocal() as session:
+            for i in range(0, len(rows), self.CHUNK_SIZE):
+                session.execute(
+                    insert(base.WorkItem).values(rows[i : i + self.CHUNK_SIZE]).on_conflict_do_nothing()
+                )
+            session.commit()
+        return len(rows)
+
+    def mark_source_collected(self, run_id: int, source_type: str):
+        with base.SessionLocal() as session:
+            run = session.get(base.WorkRun, run_id)
+            collected = list(run.collected_sources or [])
+            if source_type not in collected:
+                run.collected_sources = collected + [source_type]
+                session.commit()
+
+    def load(self, run_id: int, state: str, source_type: Optional[str] = None) -> List[base.WorkItem]:
+        with base.SessionLocal() as session:
+            query = session.query(base.WorkItem).filter(
+                base.WorkItem.run_id == run_id, base.WorkItem.state == state
+            )
+            if source_type:
+                query = query.filter(base.WorkItem.source_type == source_type)
+            items = query.order_by(base.WorkItem.id).all()
+            session.expunge_all()
+            return items
+
+    def mark_cleaned(self, run_id: int, source_type: str, source_id: str, result: dict, from_state: str = COLLECTED):
+        """清洗结果逐条落盘，作为断点"""
+        self._transition(
+            run_id, source_type, [str(source_id)], from_state, CLEANED, result=to_json(result), next_retry_at=None
+        )
+
+    def mark_failed(
+        self, run_id: int, source_type: str, failures: Dict[str, Exception], from_state: str = COLLECTED
+    ):
+        """失败记录进入死信队列，记录错误类型、失败次数和下一次重试时间"""
+        if not failures:
+            return
+        now = datetime.now(timezone.utc)
+        with base.SessionLocal() as session:
+            items = session.query(base.WorkItem).filter(
+                base.WorkItem.run_id == run_id,
+                base.WorkItem.source_type == source_type,
+                base.WorkItem.source_id.in_([str(source_id) for source_id in failures]),
+                base.WorkItem.state == from_state,
+            )
+            for item in items:
+                error = failures[item.source_id]
+                item.attempts = (item.attempts or 0) + 1
+                item.error_class = type(error).__name__
+                item.error = str(error)
+                if not is_retryable(error):
+                    item.state, item.next_retry_at = REJECTED, None
+                elif item.attempts >= self.max_attempts:
+                    item.state, item.next_retry_at = DEAD, None
+                    logger.warning(f"{source_type}:{item.source_id} 已失败 {item.attempts} 次，不再重试: {item.error}")
+                else:
+                    item.state = FAILED
+                    item.next_retry_at = now + self.retry_delay(item.attempts)
+            session.commit()
+
+    def retry_delay(self, attempts: int) -> timedelta:
+        return min(self.retry_max, self.retry_base * 2 ** (attempts - 1))
+
+    def load_due_retries(self, limit: int = 1000) -> List[base.WorkItem]:
+        """到达重试时间的失败记录，跨所有运行"""
+        with base.SessionLocal() as session:
+            items = (
+                session.query(base.WorkItem)
+                .filter(
+                    base.WorkItem.state == FAILED,
+                    base.WorkItem.next_retry_at <= datetime.now(timezone.utc),
+                )
+                .order_by(base.WorkItem.next_retry_at)
+                .limit(limit)
+                .all()
+            )
+            session.expunge_all()
+            return items
+
+    def dead_letter_stats(self) -> dict:
+        now = datetime.now(timezone.utc)
+        with base.SessionLocal() as session:
+            by_state = dict(
+                session.query(base.WorkItem.state, func.count())
+                .filter(base.WorkItem.state.in_([FAILED, DEAD, REJECTED]))
+                .group_by(base.WorkItem.state)
+            )
+            due = (
+                session.query(func.count())
+                .select_from(base.WorkItem)
+                .filter(base.WorkItem.state == FAILED, base.WorkItem.next_retry_at <= now)
+                .scalar()
+            )
+            by_error = dict(
+                session.query(base.WorkItem.error_class, func.count())
+                .filter(base.WorkItem.state == FAILED)
+                .group_by(base.WorkItem.error_class)
+            )
+        return {
+            "depth": by_state.get(FAILED, 0),
+            "due": due,
+            "dead": by_state.get(DEAD, 0),
+            "rejected": by_state.get(REJECTED, 0),
+            "by_error_class": by_error,
+        }
+
+    def mark_stored(self, run_id: Optional[int], keys: List[tuple]):
+        """run_id 为空时按 keys 中的 (run_id, source_type, source_id) 分组"""
+        if run_id is None:
+            by_run = {}
+            for key_run_id, source_type, source_id in keys:
+                by_run.setdefault(key_run_id, []).append((source_type, source_id))
+            for key_run_id, run_keys in by_run.items():
+                self.mark_stored(key_run_id, run_keys)
+            return
+        by_source = {}
+        for source_type, source_id in keys:
+            by_source.setdefault(source_type, []).append(str(source_id))
+        for source_type, source_ids in by_source.items():
+            for i in range(0, len(source_ids), self.CHUNK_SIZE):
+                self._transition(run_id, source_type, source_ids[i : i + self.CHUNK_SIZE], CLEANED, STORED)
+
+    def finish_run(self, run_id: int):
+        with base.SessionLocal() as session:
+            counts = dict(
+                session.query(base.WorkItem.state, func.count())
+                .filter(base.WorkItem.run_id == run_id)
+                .group_by(base.WorkItem.state)
+            )
+            session.query(base.WorkRun).filter(base.WorkRun.id == run_id).update(
+                {base.WorkRun.finished_at: datetime.now(timezone.utc)}
+            )
+            session.commit()
+        logger.info(f"运行 {run_id} 完成: {counts}")
+        return counts
+
+    def purge(self, keep_days: int):
+        """删除已完成且超过保留期的运行，work_item 随外键级联删除；仍有待重试记录的运行保留"""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=keep_days)
+        with base.SessionLocal() as session:
+            pending_retry = session.query(base.WorkItem.id).filter(
+                base.WorkItem.run_id == base.WorkRun.id, base.WorkItem.state == FAILED
+            )
+            deleted = (
+                session.query(base.WorkRun)
+                .filter(
+                    base.WorkRun.finished_at.isnot(None),
+                    base.WorkRun.finished_at < cutoff,
+                    ~pending_retry.exists(),
+                )
+                .delete(synchronize_session=False)
+            )
+            session.commit()
+        if deleted:
+            logger.info(f"已清理 {deleted} 轮过期的运行记录")
+
+    def _transition(self, run_id, source_type, source_ids, from_state, to_state, **values):
+        with base.SessionLocal() as session:
+            session.query(base.WorkItem).filter(
+                base.WorkItem.run_id == run_id,
+                base.WorkItem.source_type == source_type,
+                base.WorkItem.source_id.in_(source_ids),
+                base.WorkItem.state == from_state,
+            ).update({"state": to_state, **values}, synchronize_session=False)
+            session.commit()
+
+
+queue = WorkQueue(
+    max_attempts=settings.dlq_max_attempts,
+    retry_base_minutes=settings.dlq_retry_base_minutes,
+    retry_max_minutes=settings.dlq_retry_max_minutes,
+)
@@ -1,20 +1,22 @@
 import asyncio
 from encodings.punycode import T
-import json
 import logging
+import time
 from datetime import datetime, timedelta
 
 from apscheduler.executors.pool import ProcessPoolExecutor, ThreadPoolExecutor
 from fastapi import FastAPI
 import requests
 from config.settings import settings
-from app.data_collect_clean import collector, clean, validator
-from app.data_manager import api
-from app.db import base, init_db
+from app.data_collect_clean import collector, clean, normalize, validator
+from app.data_manager import api, pool, response_cache
+from app.db import base, bulk_load, init_db, migrations, work_queue
+from app.db.data_version import data_version
 from sqlalchemy.dialects.postgresql import insert, JSONB
 from sqlalchemy import text, cast
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from contextlib import asynccontextmanager
 
 scheduler = BackgroundScheduler(
@@ -37,6 +39,13 @@ def scheduled_task():
         logging.error(f"Scheduled task failed: {str(e)}")
 
 
+def scheduled_retry_failed():
+    try:
+        retry_failed_records()
+    except Exception as e:
+        logging.error(f"Scheduled retry failed: {str(e)}")
+
+
 def scheduled_fetch_top_n():
     try:
         fetch_top_n()
@@ -58,8 +67,16 @@ async def lifespan(app: FastAPI):
         trigger=trigger_week,
         executor="default",
     )
+    if settings.work_queue_enabled:
+        scheduler.add_job(
+            scheduled_retry_failed,
+            trigger=IntervalTrigger(minutes=settings.dlq_retry_interval_minutes),
+            executor="default",
+        )
     yield
     scheduler.shutdown()
+    pool.db_pool.close()
+    await api.async_data_manager.close()
 
 
 app = FastAPI(
@@ -82,6 +99,24 @@ async def manual_trigger():
     return {"status": "manual run completed"}
 
 
+@app.get("/dead-letter", tags=["监控"])
+async def dead_letter_stats():
+    """死信队列深度：待重试、已到期、放弃重试的记录数"""
+    return await run_in_process(work_queue.queue.dead_letter_stats)
+
+
+@app.get("/db-pool", tags=["监控"])
+async def db_pool_stats():
+    """数据查询接口连接池：取连接次数、等待时间、超时和丢弃的连接数"""
+    return pool.db_pool.stats()
+
+
+@app.get("/response-cache", tags=["监控"])
+async def response_cache_stats():
+    """读接口响应缓存：命中、未命中、淘汰次数及占用"""
+    return {**response_cache.response_cache.stats(), "data_version": data_version.current}
+
+
 @app.post("/manual-fetch")
 async def manual_fetch_top_n():
     await run_in_process(fetch_top_n)
@@ -104,8 +139,11 @@ def auto_process():
 
     try:
         start_time = calculate_start_time()
-        raw_data = collect_data(start_time)
-        store_processed_data(raw_data)
+        if settings.work_queue_enabled:
+            process_with_work_queue(start_time)
+        else:
+            raw_data = collect_data(start_time)
+            store_processed_data(raw_data)
     except Exception as e:
         handle_processing_error(e)
 
@@ -116,6 +154,9 @@ def initialize_processing_environment():
 
     init_db.init_database()
     base.check_and_create_tables()
+    # 已有表上的新增列（如 discussion.content_hash）只由迁移添加，启动时总是执行未应用的迁移；
+    # 多个进程同时启动时由迁移内的 advisory lock 保证只执行一次，迁移失败时服务不启动
+    migrations.upgrade(concurrent=settings.migration_concurrent_indexes)
 
 
 def clean_invalid_urls(batch_size=100):
@@ -155,6 +196,7 @@ def clean_invalid_urls(batch_size=100):
 
                 if update_count > 0:
                     session.commit()
+                    data_version.invalidate("clean_invalid_urls")
                     total_deleted += update_count
                     logging.info(f"已标记 {update_count} 条无效URL记录")
 
@@ -180,26 +222,13 @@ def fetch_unpost_topics():
     if not response or "data" not in response or "topics" not in response["data"]:
         return
 
-    topics = response["data"]["topics"]
-    with base.SessionLocal() as session:
-        for topic in topics:
-            summary = topic.get("title")
-
-            for dss in topic.get("dss", []):
-                dss_id = dss.get("id")
-                if dss_id is None:
-                    continue
-                record = (
-                    session.query(base.Discussion)
-                    .filter(base.Discussion.id == dss_id)
-                    .first()
-                )
-                if record:
-                    record.topic_summary = summary
-                    record.topic_closed = dss.get("closed")
-                    record.posted = False
-                    session.add(record)
-        session.commit()
+    assignments = [
+        {"id": dss["id"], "topic_summary": topic.get("title"), "topic_closed": dss.get("closed"), "posted": False}
+        for topic in response["data"]["topics"]
+        for dss in topic.get("dss", [])
+        if dss.get("id") is not None
+    ]
+    sync_topic_assignments("fetch_unpost_topics", assignments)
 
 
 def fetch_top_n():
@@ -215,29 +244,30 @@ def fetch_top_n():
         return
 
     topics = response["data"]["topics"]
+    assignments = []
+    for topic in topics:
+        summary = topic.get("title")
+        resolved = topic.get("status", {}).get("status", "") == "Resolved"
+        logging.debug(f"{summary} {resolved}")
+        assignments.extend(
+            {"id": dss["id"], "topic_summary": summary, "topic_closed": resolved, "posted": True}
+            for dss in topic.get("dss", [])
+            if dss.get("id") is not None
+        )
+    sync_topic_assignments("fetch_top_n", assignments)
+    logging.info(f"已提交 {len(topics)}/{len(topics)} 条数据")
+
+
+def sync_topic_assignments(source: str, assignments: list):
+    """专题同步结果按块批量写入 discussion"""
     with base.SessionLocal() as session:
-        for topic in topics:
-            summary = topic.get("title")
-            resolved = topic.get("status", {}).get("status", "") == "Resolved"
-            topic_closed = True if resolved else False
-
-            for dss in topic.get("dss", []):
-                dss_id = dss.get("id")
-                if dss_id is None:
-                    continue
-                record = (
-                    session.query(base.Discussion)
-                    .filter(base.Discussion.id == dss_id)
-                    .first()
-                )
-                if record:
-                    record.topic_summary = summary
-                    record.topic_closed = topic_closed
-                    record.posted = True
-                    session.add(record)
-            print(summary, resolved)
+        matched, unmatched = bulk_load.update_topics(session, assignments)
         session.commit()
-        logging.info(f"已提交 {len(topics)}/{len(topics)} 条数据")
+    if matched:
+        data_version.invalidate(source)
+    logging.info(f"{source} 更新 {matched} 条讨论，未找到 {len(unmatched)} 条")
+    if unmatched:
+        logging.warning(f"{source} 未找到的讨论 id: {unmatched[:20]}")
 
 
 def calculate_start_time() -> datetime:
@@ -249,14 +279,8 @@ def calculate_start_time() -> datetime:
     return last_friday.replace(hour=0, minute=0, second=0, microsecond=0)
 
 
-def collect_data(start_time: datetime) -> list:
-    """
-    根据 settings.community 采集对应社区的数据。
-    openubmc 采集 forum 和 issue，
-    cann 采集 forum 和 mail，
-    opengauss 采集 issue。
-    """
-    data = []
+def get_source_pipelines():
+    """当前社区的 (数据源, 采集器构造函数, 清洗器构造函数) 列表"""
     community_map = {
         "openubmc": [
             ("forum", collector.get_forum_collector, clean.get_forum_cleaner),
@@ -309,83 +333,201 @@ def collect_data(start_time: datetime) -> list:
         ],
     }
 
-    collectors = community_map.get(settings.community)
+    return community_map.get(settings.community)
+
+
+def collect_data(start_time: datetime) -> list:
+    """
+    根据 settings.community 采集对应社区的数据。
+    openubmc 采集 forum 和 issue，
+    cann 采集 forum 和 mail，
+    opengauss 采集 issue。
+    """
+    data = []
+    collectors = get_source_pipelines()
     if not collectors:
         logging.warning(f"未知的 community 类型: {settings.community}")
         return data
 
+    # 整轮运行共用一个截止时间，传递给每次大模型调用
+    deadline = time.monotonic() + settings.llm_run_deadline if settings.llm_run_deadline else None
     for source_type, collector_func, cleaner_func in collectors:
         logging.debug(f"开始处理{source_type}数据")
         col = collector_func(settings.community)
         cleaner = cleaner_func(settings.community, col)
-        cleaned_data = cleaner.process(start_time)
+        cleaned_data = cleaner.process(start_time, deadline=deadline)
         data.extend([r.__dict__ for r in cleaned_data])
 
     return data
 
 
-def store_processed_data(raw_data: list):
-    """批量存储处理后的数据"""
-    with base.SessionLocal() as session:
+def process_with_work_queue(start_time: datetime):
+    """
+    经持久化工作队列执行采集、清洗、存储。每条清洗结果立即落盘，
+    中断后再次运行会恢复未完成的一轮，不重新采集已入队的数据源，也不重新清洗已完成的记录。
+    """
+    collectors = get_source_pipelines()
+    if not collectors:
+        logging.warning(f"未知的 community 类型: {settings.community}")
+        return
+
+    queue = work_queue.queue
+    run = queue.open_run(settings.community, start_time)
+    deadline = time.monotonic() + settings.llm_run_deadline if settings.llm_run_deadline else None
+    for source_type, collector_func, cleaner_func in collectors:
+        col = collector_func(settings.community)
+        cleaner = cleaner_func(settings.community, col)
+        if source_type not in (run.collected_sources or []):
+            enqueued = queue.enqueue(run.id, cleaner.source_type, col.collect(run.window_start))
+            queue.mark_source_collected(run.id, source_type)
+            logging.info(f"{source_type} 入队 {enqueued} 条")
+
+        pending = queue.load(run.id, work_queue.COLLECTED, cleaner.source_type)
+        logging.info(f"{source_type} 待清洗 {len(pending)} 条")
+        for record in cleaner.process_records([item.payload for item in pending], deadline=deadline):
+            queue.mark_cleaned(run.id, cleaner.source_type, record.source_id, record.__dict__)
+        queue.mark_failed(run.id, cleaner.source_type, cleaner.failures)
+
+    results = [item.result for item in queue.load(run.id, work_queue.CLEANED)]
+    failed = {(source_type, str(source_id)) for source_type, source_id in store_processed_data(results)}
+    queue.mark_stored(
+        run.id,
+        [(r["source_type"], r["source_id"]) for r in results if (r["source_type"], str(r["source_id"])) not in failed],
+    )
+    queue.finish_run(run.id)
+    queue.purge(settings.work_queue_keep_days)
+
+
+def retry_failed_records():
+    """死信队列重试：只重新清洗到期的失败记录并写入，不重新采集"""
+    queue = work_queue.queue
+    items = queue.load_due_retries()
+    if not items:
+        return
+    pipelines = {source_type: (c, f) for source_type, c, f in get_source_pipelines() or []}
+    by_source = {}
+    for item in items:
+        by_source.setdefault(item.source_type, []).append(item)
+
+    results, stored_keys = [], []
+    for source_type, source_items in by_source.items():
+        if source_type not in pipelines:
+            logging.warning(f"未知的数据源 {source_type}，跳过 {len(source_items)} 条重试")
+            continue
+        collector_func, cleaner_func = pipelines[source_type]
+        cleaner = cleaner_func(settings.community, collector_func(settings.community))
+        # 同一条记录可能在多轮运行中都失败，只清洗一次（取最新一轮的采集数据），结果同步到每一轮的记录
+        by_id = {}
+        for item in source_items:
+            by_id.setdefault(item.source_id, []).append(item)
+        latest = [max(run_items, key=lambda item: item.run_id) for run_items in by_id.values()]
+        for record in cleaner.process_records([item.payload for item in latest]):
+            results.append(work_queue.to_json(record.__dict__))
+            for item in by_id[str(record.source_id)]:
+                queue.mark_cleaned(item.run_id, source_type, record.source_id, record.__dict__, work_queue.FAILED)
+                stored_keys.append((item.run_id, source_type, record.source_id))
+        failures_by_run = {}
+        for source_id, error in cleaner.failures.items():
+            for item in by_id[source_id]:
+                failures_by_run.setdefault(item.run_id, {})[source_id] = error
+        for run_id, failures in failures_by_run.items():
+            queue.mark_failed(run_id, source_type, failures, work_queue.FAILED)
+
+    if results:
+        failed = {(source_type, str(source_id)) for source_type, source_id in store_processed_data(results)}
+        queue.mark_stored(None, [key for key in stored_keys if (key[1], str(key[2])) not in failed])
+    logging.info(f"死信队列重试 {len(items)} 条，成功 {len(results)} 条")
+
+
+def store_processed_data(raw_data: list) -> list:
+    """
+    批量存储处理后的数据：每批一条多行 INSERT ... ON CONFLICT，批次失败时逐行隔离。
+    记录数达到 BULK_LOAD_MIN_ROWS 时（如长时间回填）改为经暂存表 COPY 导入。
+    返回写入失败的 (source_type, source_id) 列表
+    """
+    records = dedupe_records(raw_data)
+    if settings.bulk_load_min_rows and len(records) >= settings.bulk_load_min_rows:
         try:
-            BATCH_SIZE = 50
-            for i in range(0, len(raw_data), BATCH_SIZE):
-                process_batch(session, raw_data[i : i + BATCH_SIZE], i, BATCH_SIZE)
+            if bulk_load.copy_merge(records):
+                data_version.invalidate("store")
+            return []
         except Exception as e:
-            session.rollback()
-            raise e
+            logging.warning(f"COPY 批量导入失败，改为分批写入: {str(e)}")
+    batch_size = max(1, settings.store_batch_size)
+    written, failed = 0, []
+    started = time.monotonic()
+    with base.SessionLocal() as session:
+        for i in range(0, len(records), batch_size):
+            batch_written, batch_failed = process_batch(session, records[i : i + batch_size])
+            written += batch_written
+            failed.extend(batch_failed)
+            logging.info(f"已提交 {min(i + batch_size, len(records))}/{len(records)} 条数据")
+    if written:
+        data_version.invalidate("store")
+    elapsed = time.monotonic() - started
+    rate = len(records) / elapsed if elapsed > 0 else 0.0
+    logging.info(
+        f"本次写入 {written}/{len(records)} 条，跳过未变化记录 {len(records) - written - len(failed)} 条，"
+        f"失败 {len(failed)} 条，耗时 {elapsed:.2f}s，{rate:.0f} 行/秒"
+    )
+    return failed
+
+
+def dedupe_records(raw_data: list) -> list:
+    """同一条 INSERT 中不能两次更新同一行，批内按 (source_type, source_id) 只保留最后一条"""
+    records = {}
+    for record in raw_data:
+        records[(record["source_type"], str(record["source_id"]))] = record
+    return list(records.values())
 
 
-def process_batch(session, batch: list, index: int, batch_size: int):
-    """处理单个数据批次"""
+def process_batch(session, batch: list):
+    """处理单个数据批次，返回 (实际写入的行数, 写入失败的记录)"""
     for record in batch:
-        if isinstance(
-            clean_data := record["clean_data"], str
-        ) and clean_data.startswith('"'):
-            try:
-                record["clean_data"] = json.loads(clean_data)
-            except json.JSONDecodeError:
-                pass
-
-        title, url = record["title"], record["url"]
-        logging.info(f"正在提交记录: {title} - {url}")
-        session.execute(build_upsert_statement(record))
+        record["clean_data"] = normalize.decode_quoted_json(record["clean_data"])
+    try:
+        # 内容和可变字段都未变化的行 WHERE 不成立，不产生写入，也不计入 rowcount
+        written = session.execute(build_upsert_statement(batch)).rowcount
+        session.commit()
+        return written, []
+    except Exception as e:
+        session.rollback()
+        logging.warning(f"批量写入 {len(batch)} 条失败，改为逐行写入: {str(e)}")
 
+    written, failed = 0, []
+    for record in batch:
+        try:
+            with session.begin_nested():
+                written += session.execute(build_upsert_statement([record])).rowcount
+        except Exception as e:
+            logging.error(f"写入失败: {record['title']} - {record['url']}: {str(e)}")
+            failed.append((record["source_type"], record["source_id"]))
     session.commit()
-    logging.info(f"已提交 {min(index + batch_size, len(batch))}/{len(batch)} 条数据")
-
-
-def build_upsert_statement(record: dict):
-    return (
-        insert(base.Discussion)
-        .values(
-            source_id=record["source_id"],
-            source_type=record["source_type"],
-            title=record["title"],
-            body=record["body"],
-            url=record["url"],
-            topic_summary=record["topic_summary"],
-            topic_closed=record["topic_closed"],
-            created_at=record["created_at"],
-            updated_at=record["updated_at"],
-            clean_data=record["clean_data"],
-            history=record["history"],
-            source_closed=record["source_closed"],
-        )
-        .on_conflict_do_update(
-            index_elements=["source_id", "source_type"],
-            set_={
-                # 'history': text(
-                #     "history || jsonb_build_array(jsonb_build_object('title', EXCLUDED.title, 'body', EXCLUDED.body, 'time', NOW()::timestamp))"
-                # ),
+    return written, failed
+
+
+def build_upsert_statement(records: list):
+    stmt = insert(base.Discussion).values(
+        [
+            {
+                "source_id": record["source_id"],
+                "source_type": record["source_type"],
                 "title": record["title"],
                 "body": record["body"],
                 "url": record["url"],
-                "source_closed": record["source_closed"],
+                "topic_summary": record["topic_summary"],
+                "topic_closed": record["topic_closed"],
+                "created_at": record["created_at"],
                 "updated_at": record["updated_at"],
-            },
-        )
+                "clean_data": record["clean_data"],
+                "history": record["history"],
+                "source_closed": record["source_closed"],
+                "content_hash": record.get("content_hash"),
+            }
+            for record in records
+        ]
     )
+    return bulk_load.on_conflict_update(stmt)
 
 
 def handle_processing_error(e: Exception):
@@ -0,0 +1,90 @@
+"""
+入库路径基准测试（需要可连接的 PostgreSQL，使用 SECRET_CONFIG 中的数据库配置）
+
+用法: python -m benchmarks.bench_bulk_load [--rows 100000 1000000] [--modes row batch copy]
+
+对同样的合成记录比较三种写入 discussion 的方式：
+- row: 每条记录一条 upsert（STORE_BATCH_SIZE=1）
+- batch: 每批一条多行 upsert（STORE_BATCH_SIZE）
+- copy: COPY 写入暂存表后一条 INSERT ... SELECT 合并
+每种方式先写入新记录，再写入一遍修改过正文的同批记录（冲突更新）。
+测试记录的 source_type 为 bench，结束后删除。
+"""
+import argparse
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app import main as app_main
+from app.db import base, bulk_load
+from config.settings import settings
+
+SOURCE_TYPE = "bench"
+
+
+def make_records(count, revision):
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return [
+        {
+            "source_id": str(i),
+            "source_type": SOURCE_TYPE,
+            "title": f"基准测试记录 {i}",
+            "body": f"第 {revision} 版正文，编译安装内核模块时报错 {i}\n" * 4,
+            "url": f"https://example.com/{i}",
+            "topic_summary": "",
+            "topic_closed": False,
+            "created_at": now,
+            "updated_at": now,
+            "clean_data": f"摘要 {i} 第 {revision} 版",
+            "history": "[]",
+            "source_closed": False,
+            "content_hash": f"{revision:064d}",
+        }
+        for i in range(count)
+    ]
+
+
+def clear():
+    with base.engine.begin() as conn:
+        conn.execute(text("DELETE FROM discussion WHERE source_type = :t"), {"t": SOURCE_TYPE})
+
+
+def run_store(mode, records):
+    if mode == "copy":
+        bulk_load.copy_merge(records)
+    else:
+        app_main.store_processed_data(records)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--modes", nargs="+", default=["row", "batch", "copy"], choices=["row", "batch", "copy"])
+    args = parser.parse_args()
+
+    batch_size = settings.store_batch_size
+    settings.bulk_load_min_rows = 0
+    try:
+        for count in args.rows:
+            for mode in args.modes:
+                settings.store_batch_size = 1 if mode == "row" else batch_size
+                clear()
+                timings = []
+                for revision in (1, 2):
+                    records = make_records(count, revision)
+                    start = time.perf_counter()
+                    run_store(mode, records)
+                    timings.append(time.perf_counter() - start)
+                insert_s, update_s = timings
+                print(
+                    f"{count:>8} 条 {mode:<5}: 插入 {insert_s:8.2f}s ({count / insert_s:>9.0f} 行/秒)  "
+                    f"更新 {update_s:8.2f}s ({count / update_s:>9.0f} 行/秒)"
+                )
+    finally:
+        settings.store_batch_size = batch_size
+        clear()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+文本规范化基准测试
+
+用法: python -m benchmarks.bench_normalize [--repeat 2000]
+
+在 tests/fixtures/normalize_corpus.json 的 issue / forum / mail 正文上，
+对比原先 BaseCleaner 中的多次 re.sub 与 normalize 模块的耗时，并校验输出逐字节一致。
+"""
+import argparse
+import json
+import os
+import re
+import time
+
+from app.data_collect_clean import normalize
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures", "normalize_corpus.json")
+
+
+def legacy_basic_clean(text):
+    text = re.sub(r"<.*?>", "", text)
+    return re.sub(r"[^一-龥a-zA-Z0-9，。！？；：、]", " ", text).strip()
+
+
+def legacy_basic_clean_before_llm(text):
+    text = re.sub(r"(?m)^\s*发件人：.*$", "", text)
+    text = re.sub(r"(?m)^\s*发送日期：.*$", "", text)
+    text = re.sub(r"(?m)^\s*收件人：.*$", "", text)
+    text = re.sub(r"\s+", " ", text)
+    return text.strip()
+
+
+def timeit(fn, texts):
+    start = time.perf_counter()
+    result = [fn(t) for t in texts]
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(CORPUS_PATH, "r", encoding="utf-8") as f:
+        corpus = json.load(f)
+
+    cases = [
+        ("basic_clean", legacy_basic_clean, normalize.basic_clean),
+        ("clean_before_llm", legacy_basic_clean_before_llm, normalize.clean_before_llm),
+    ]
+    print(f"{'source':<8}{'step':<18}{'legacy(s)':>11}{'new(s)':>10}{'speedup':>9}{'parity':>8}")
+    for source_type, bodies in corpus.items():
+        texts = bodies * args.repeat
+        for step, legacy, new in cases:
+            expected, legacy_elapsed = timeit(legacy, texts)
+            actual, new_elapsed = timeit(new, texts)
+            print(
+                f"{source_type:<8}{step:<18}{legacy_elapsed:>11.3f}{new_elapsed:>10.3f}"
+                f"{legacy_elapsed / new_elapsed:>8.2f}x{str(expected == actual):>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+读接口压测
+
+用法: python -m benchmarks.load_test --url http://127.0.0.1:8000 [--clients 200] [--duration 30]
+
+以 clients 个并发客户端持续请求 /api/v1/data 和 /api/v1/latest（随机页码），
+输出每个接口的请求数、每秒请求数、p50 / p99 延迟和错误数。
+对比前后效果：分别以 READ_ASYNC_ENABLED: false / true 启动服务，用相同参数各运行一次。
+"""
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ENDPOINTS = ("/api/v1/data", "/api/v1/latest")
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def client(base_url, deadline, max_page, page_size, results, lock):
+    session = requests.Session()
+    rng = random.Random()
+    local = {endpoint: ([], 0) for endpoint in ENDPOINTS}
+    while time.monotonic() < deadline:
+        endpoint = rng.choice(ENDPOINTS)
+        params = {"page": rng.randint(1, max_page), "page_size": page_size}
+        started = time.perf_counter()
+        try:
+            ok = session.get(base_url + endpoint, params=params, timeout=30).status_code == 200
+        except requests.RequestException:
+            ok = False
+        latencies, errors = local[endpoint]
+        if ok:
+            latencies.append(time.perf_counter() - started)
+        else:
+            local[endpoint] = (latencies, errors + 1)
+    with lock:
+        for endpoint, (latencies, errors) in local.items():
+            results[endpoint][0].extend(latencies)
+            results[endpoint][1] += errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--max-page", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    results = {endpoint: [[], 0] for endpoint in ENDPOINTS}
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+    with ThreadPoolExecutor(max_workers=args.clients) as executor:
+        for _ in range(args.clients):
+            executor.submit(client, args.url.rstrip("/"), deadline, args.max_page, args.page_size, results, lock)
+
+    print(f"并发 {args.clients}，持续 {args.duration:.0f}s")
+    for endpoint, (latencies, errors) in results.items():
+        print(
+            f"{endpoint:<16} 请求 {len(latencies):>7}  {len(latencies) / args.duration:>8.1f} 次/秒  "
+            f"p50 {percentile(latencies, 0.5) * 1000:>7.1f}ms  p99 {percentile(latencies, 0.99) * 1000:>7.1f}ms  "
+            f"错误 {errors}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,66 @@ class Settings:
             config = yaml.safe_load(f)
             self.llm_api_url: str = config.get("LLM_API_URL")
             self.llm_model: str = config.get("LLM_MODEL")
+            self.llm_concurrency: int = config.get("LLM_CONCURRENCY", 1)
+            self.llm_min_concurrency: int = config.get("LLM_MIN_CONCURRENCY", 1)
+            self.llm_latency_target: float = config.get("LLM_LATENCY_TARGET", 30)
+            self.llm_request_timeout: float = config.get("LLM_REQUEST_TIMEOUT", 120)
+            self.llm_max_attempts: int = config.get("LLM_MAX_ATTEMPTS", 3)
+            self.llm_retry_base_delay: float = config.get("LLM_RETRY_BASE_DELAY", 1.0)
+            self.llm_retry_max_delay: float = config.get("LLM_RETRY_MAX_DELAY", 60)
+            self.llm_run_deadline: float = config.get("LLM_RUN_DEADLINE", 0)
+            self.llm_hedge_enabled: bool = config.get("LLM_HEDGE_ENABLED", False)
+            self.llm_hedge_api_url: str = config.get("LLM_HEDGE_API_URL")
+            self.llm_hedge_model: str = config.get("LLM_HEDGE_MODEL")
+            self.llm_hedge_percentile: float = config.get("LLM_HEDGE_PERCENTILE", 95)
+            self.llm_hedge_min_samples: int = config.get("LLM_HEDGE_MIN_SAMPLES", 20)
+            self.llm_hedge_min_delay: float = config.get("LLM_HEDGE_MIN_DELAY", 5)
+            self.llm_cache_enabled: bool = config.get("LLM_CACHE_ENABLED", False)
+            self.llm_cache_bypass: bool = config.get("LLM_CACHE_BYPASS", False)
+            self.llm_cache_max_entries: int = config.get("LLM_CACHE_MAX_ENTRIES", 50000)
+            self.llm_cache_ttl_days: int = config.get("LLM_CACHE_TTL_DAYS", 30)
+            self.llm_cache_memory_entries: int = config.get("LLM_CACHE_MEMORY_ENTRIES", 2048)
+            self.llm_max_input_tokens: int = config.get("LLM_MAX_INPUT_TOKENS", 6000)
+            self.llm_map_reduce_threshold: int = config.get("LLM_MAP_REDUCE_THRESHOLD", 12000)
+            self.llm_chunk_tokens: int = config.get("LLM_CHUNK_TOKENS", 4000)
+            self.llm_block_head_lines: int = config.get("LLM_BLOCK_HEAD_LINES", 20)
+            self.llm_block_tail_lines: int = config.get("LLM_BLOCK_TAIL_LINES", 10)
+            self.llm_batch_enabled: bool = config.get("LLM_BATCH_ENABLED", False)
+            self.llm_batch_max_records: int = config.get("LLM_BATCH_MAX_RECORDS", 8)
+            self.llm_batch_token_budget: int = config.get("LLM_BATCH_TOKEN_BUDGET", 4000)
+            self.llm_batch_record_max_tokens: int = config.get("LLM_BATCH_RECORD_MAX_TOKENS", 600)
+            self.dedup_enabled: bool = config.get("DEDUP_ENABLED", False)
+            self.dedup_threshold: float = config.get("DEDUP_THRESHOLD", 0.85)
+            self.dedup_num_perm: int = config.get("DEDUP_NUM_PERM", 64)
+            self.dedup_bands: int = config.get("DEDUP_BANDS", 16)
+            self.dedup_shingle_size: int = config.get("DEDUP_SHINGLE_SIZE", 4)
+            self.dedup_max_chars: int = config.get("DEDUP_MAX_CHARS", 4000)
+            self.dedup_window_days: int = config.get("DEDUP_WINDOW_DAYS", 90)
+            self.mail_strip_quotes: bool = config.get("MAIL_STRIP_QUOTES", True)
+            self.relevance_mode: str = config.get("RELEVANCE_MODE", "off")
+            self.relevance_model_path: str = config.get("RELEVANCE_MODEL_PATH", "")
+            self.relevance_threshold: float = config.get("RELEVANCE_THRESHOLD", 0.2)
+            self.work_queue_enabled: bool = config.get("WORK_QUEUE_ENABLED", False)
+            self.work_queue_keep_days: int = config.get("WORK_QUEUE_KEEP_DAYS", 7)
+            self.dlq_max_attempts: int = config.get("DLQ_MAX_ATTEMPTS", 5)
+            self.dlq_retry_base_minutes: float = config.get("DLQ_RETRY_BASE_MINUTES", 15)
+            self.dlq_retry_max_minutes: float = config.get("DLQ_RETRY_MAX_MINUTES", 720)
+            self.dlq_retry_interval_minutes: int = config.get("DLQ_RETRY_INTERVAL_MINUTES", 15)
+            self.store_batch_size: int = config.get("STORE_BATCH_SIZE", 500)
+            self.bulk_load_min_rows: int = config.get("BULK_LOAD_MIN_ROWS", 0)
+            self.migration_concurrent_indexes: bool = config.get("MIGRATION_CONCURRENT_INDEXES", True)
+            self.db_pool_min_size: int = config.get("DB_POOL_MIN_SIZE", 1)
+            self.db_pool_max_size: int = config.get("DB_POOL_MAX_SIZE", 10)
+            self.db_pool_timeout: float = config.get("DB_POOL_TIMEOUT", 10)
+            self.db_pool_health_check_interval: float = config.get("DB_POOL_HEALTH_CHECK_INTERVAL", 30)
+            self.read_async_enabled: bool = config.get("READ_ASYNC_ENABLED", False)
+            self.count_mode: str = config.get("COUNT_MODE", "exact")
+            self.count_cache_max_age: float = config.get("COUNT_CACHE_MAX_AGE", 300)
+            self.response_cache_enabled: bool = config.get("RESPONSE_CACHE_ENABLED", False)
+            self.response_cache_max_entries: int = config.get("RESPONSE_CACHE_MAX_ENTRIES", 256)
+            self.response_cache_max_bytes: int = config.get("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+            self.data_version_poll_interval: float = config.get("DATA_VERSION_POLL_INTERVAL", 2)
+            self.export_itersize: int = config.get("EXPORT_ITERSIZE", 2000)
             self.cann_forum_prompt: str = config.get("CANN_FORUM_PROMPT")
             self.cann_issue_prompt: str = config.get("CANN_ISSUE_PROMPT")
             self.openubmc_forum_prompt: str = config.get("OPENUBMC_FORUM_PROMPT")
@@ -22,6 +82,7 @@ class Settings:
             self.openeuler_forum_prompt: str = config.get("OPENEULER_FORUM_PROMPT")
             self.openeuler_issue_prompt: str = config.get("OPENEULER_ISSUE_PROMPT")
             self.openeuler_mail_prompt: str = config.get("OPENEULER_MAIL_PROMPT")
+            self.clean_filters: dict = config.get("CLEAN_FILTERS", {})
 
         secret_config_path = os.getenv("SECRET_CONFIG")
         if not secret_config_path:
@@ -39,6 +100,7 @@ class Settings:
             self.forum_api: str = config.get("FORUM_API")
             self.forum_topic_detail_api: str = config.get("FORUM_DETAIL_API")
             self.llm_api_key: str = config.get("LLM_API_KEY")
+            self.llm_hedge_api_key: str = config.get("LLM_HEDGE_API_KEY")
             self.community: str = config.get("COMMUNITY")
             self.dws_name: str = config.get("DWS_NAME")
             self.mail_dws_name: str = config.get("MAIL_DWS_NAME")
@@ -0,0 +1,86 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+
+from app.data_manager import api
+from app.data_manager.async_manager import AsyncDataManager, to_asyncpg
+from app.data_manager.manager import PAGE_SQL
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    async def fetch(self, sql, *args):
+        self.calls.append((sql, args))
+        return self.rows
+
+    async def fetchval(self, sql, *args):
+        self.calls.append((sql, args))
+        return 42
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def acquire(self, timeout=None):
+        pool = self
+
+        class Acquire:
+            async def __aenter__(self):
+                return pool.conn
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return Acquire()
+
+
+def make_manager(rows, tz='Asia/Shanghai'):
+    manager = AsyncDataManager({})
+    conn = FakeConnection(rows)
+    manager._pool = FakePool(conn)
+    manager._timezone = ZoneInfo(tz)
+    return manager, conn
+
+
+class TestAsyncDataManager:
+    def test_placeholders_converted_in_order(self):
+        assert to_asyncpg('a = %s AND b = %s LIMIT %s') == 'a = $1 AND b = $2 LIMIT $3'
+        assert to_asyncpg(PAGE_SQL).endswith('LIMIT $1 OFFSET $2')
+
+    def test_page_matches_sync_shape(self):
+        created = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        manager, conn = make_manager([{'id': 1, 'is_deleted': False, 'created_at': created, 'history': []}])
+        result = asyncio.run(manager.fetch_paginated_from_pg(page=3, page_size=10))
+        assert result == [{'id': 1, 'source_deleted': False, 'created_at': created, 'history': []}]
+        assert result[0]['created_at'].utcoffset() == timedelta(hours=8)
+        assert conn.calls[0][1] == (10, 20)
+
+    def test_naive_parameter_uses_session_timezone(self):
+        manager, conn = make_manager([])
+        asyncio.run(manager.fetch_posts_created_after(datetime(2024, 1, 5), 1, 100))
+        created_after = conn.calls[0][1][0]
+        assert created_after.utcoffset() == timedelta(hours=8)
+
+    def test_total_count(self):
+        manager, _ = make_manager([])
+        assert asyncio.run(manager.get_total_count()) == 42
+
+
+class TestReadDispatch:
+    def test_uses_async_manager_when_enabled(self):
+        async def fetch(page, page_size):
+            return ['async']
+
+        with patch.object(api.settings, 'read_async_enabled', True, create=True), \
+                patch.object(api.async_data_manager, 'fetch_paginated_from_pg', fetch):
+            assert asyncio.run(api.read('fetch_paginated_from_pg', 1, 10)) == ['async']
+
+    def test_falls_back_to_sync_manager_in_threadpool(self):
+        with patch.object(api.settings, 'read_async_enabled', False, create=True), \
+                patch.object(api.data_manager, 'get_total_count', return_value=7):
+            assert asyncio.run(api.read('get_total_count')) == 7
@@ -0,0 +1,46 @@
+from app.data_collect_clean.batching import (
+    build_batch_prompt,
+    pack_batches,
+    parse_batch_response,
+)
+
+
+class TestPackBatches:
+    def test_respects_record_limit(self):
+        items = [(str(i), "abcd") for i in range(5)]
+        batches = pack_batches(items, max_records=2, token_budget=1000)
+        assert [len(b) for b in batches] == [2, 2, 1]
+
+    def test_respects_token_budget(self):
+        items = [("1", "中" * 60), ("2", "中" * 60), ("3", "中" * 10)]
+        batches = pack_batches(items, max_records=10, token_budget=100)
+        assert [[k for k, _ in b] for b in batches] == [["1"], ["2", "3"]]
+
+
+class TestBatchPrompt:
+    def test_labels_records(self):
+        content, keys = build_batch_prompt([("101", "标题：a"), ("202", "标题：b")])
+        assert content == "[r1]\n标题：a\n\n[r2]\n标题：b"
+        assert keys == {"r1": "101", "r2": "202"}
+
+
+class TestParseBatchResponse:
+    keys = {"r1": "101", "r2": "202"}
+
+    def test_plain_json(self):
+        assert parse_batch_response('{"r1": "摘要一", "r2": "摘要二"}', self.keys) == {
+            "101": "摘要一",
+            "202": "摘要二",
+        }
+
+    def test_fenced_json_with_think_block(self):
+        text = '<think>分析</think>\n```json\n{"[r1]": "摘要一"}\n```'
+        assert parse_batch_response(text, self.keys) == {"101": "摘要一"}
+
+    def test_drops_unknown_and_empty_entries(self):
+        text = '结果如下：{"r1": "", "r2": "摘要二", "r9": "多余"}'
+        assert parse_batch_response(text, self.keys) == {"202": "摘要二"}
+
+    def test_invalid_response(self):
+        assert parse_batch_response("无法处理", self.keys) == {}
+        assert parse_batch_response('["r1"]', self.keys) == {}
@@ -0,0 +1,94 @@
+import json
+from unittest.mock import MagicMock, patch
+from sqlalchemy.dialects import postgresql
+from app.db.bulk_load import COLUMNS, CopyStream, copy_rows, merge_statement, update_topics
+from tests.test_main import make_record
+
+
+def parse_row(line):
+    return dict(zip(COLUMNS, line.rstrip('\n').split('\t')))
+
+
+class TestCopyRows:
+    def test_escapes_copy_special_characters(self):
+        row = parse_row(next(copy_rows([make_record(body='第一行\n第二\t列\\结束')])))
+        assert row['body'] == '第一行\\n第二\\t列\\\\结束'
+
+    def test_null_boolean_and_json_columns(self):
+        row = parse_row(next(copy_rows([make_record(content_hash=None, topic_closed=True, history=[{'a': '中'}])])))
+        assert row['content_hash'] == '\\N'
+        assert row['topic_closed'] == 't'
+        assert row['source_closed'] == 'f'
+        assert json.loads(row['history']) == [{'a': '中'}]
+
+    def test_quoted_json_summary_is_decoded(self):
+        row = parse_row(next(copy_rows([make_record(clean_data='"摘要"')])))
+        assert row['clean_data'] == '摘要'
+
+
+class TestCopyStream:
+    def test_reads_in_chunks_without_losing_bytes(self):
+        lines = [f'{i}\t行{i}\n' for i in range(100)]
+        stream = CopyStream(iter(lines))
+        chunks = []
+        while True:
+            chunk = stream.read(7)
+            if not chunk:
+                break
+            assert len(chunk) <= 7
+            chunks.append(chunk)
+        assert b''.join(chunks).decode('utf-8') == ''.join(lines)
+        assert stream.rows == 100
+
+
+class TestMergeStatement:
+    def test_merges_latest_staged_row_with_upsert_rules(self):
+        sql = str(merge_statement().compile(dialect=postgresql.dialect()))
+        assert 'SELECT DISTINCT ON (discussion_staging.source_id, discussion_staging.source_type)' in sql
+        assert 'discussion_staging.seq DESC' in sql
+        assert 'ON CONFLICT (source_id, source_type) DO UPDATE' in sql
+        assert 'content_hash = coalesce(excluded.content_hash, discussion.content_hash)' in sql
+
+
+class TestUpdateTopics:
+    def make_session(self, existing):
+        session = MagicMock()
+        statements = []
+
+        def execute(stmt):
+            statements.append(stmt)
+            params = stmt.compile(dialect=postgresql.dialect()).params
+            ids = [v for k, v in params.items() if isinstance(v, int) and not isinstance(v, bool)]
+            return MagicMock(scalars=lambda: [i for i in ids if i in existing])
+
+        session.execute.side_effect = execute
+        return session, statements
+
+    def test_one_update_from_values_per_chunk(self):
+        session, statements = self.make_session({1, 2})
+        assignments = [
+            {'id': 1, 'topic_summary': '旧专题', 'topic_closed': False, 'posted': True},
+            {'id': '2', 'topic_summary': '专题', 'topic_closed': None, 'posted': True},
+            {'id': 3, 'topic_summary': '专题', 'topic_closed': True, 'posted': True},
+            {'id': 1, 'topic_summary': '新专题', 'topic_closed': True, 'posted': True},
+        ]
+        matched, unmatched = update_topics(session, assignments)
+        assert (matched, unmatched) == (2, [3])
+        assert len(statements) == 1
+        sql = str(statements[0].compile(dialect=postgresql.dialect()))
+        assert sql.startswith('UPDATE discussion SET')
+        assert 'FROM (VALUES' in sql
+        assert 'RETURNING discussion.id' in sql
+        assert '新专题' in statements[0].compile(dialect=postgresql.dialect()).params.values()
+
+    def test_invalid_ids_are_skipped(self):
+        session, statements = self.make_session(set())
+        assert update_topics(session, [{'id': 'abc'}]) == (0, [])
+        assert statements == []
+
+    @patch('app.db.bulk_load.TOPIC_CHUNK_SIZE', 2)
+    def test_large_payload_is_chunked(self):
+        session, statements = self.make_session(set(range(5)))
+        matched, _ = update_topics(session, [{'id': i} for i in range(5)])
+        assert matched == 5
+        assert len(statements) == 3
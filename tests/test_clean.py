@@ -6,7 +6,10 @@ from app.data_collect_clean.clean import (
     CANNForumCleaner,
     OpenGaussMailCleaner,
     FormattedRecord,
+    content_hash,
 )
+from app.data_collect_clean.dedup import NearDuplicateIndex
+from app.data_collect_clean.tokens import estimate_tokens, split_chunks
 
 
 # Fixtures
@@ -56,6 +59,212 @@ class TestBaseCleaner:
             assert cleaner._is_exist("123") is False
 
 
+# Existence Prefetch Tests
+class TestExistencePrefetch:
+    def test_prefetch_builds_index_scoped_by_source_type(self):
+        cleaner = CANNForumCleaner(Mock())
+        with patch('app.db.base.SessionLocal') as mock_session:
+            session = mock_session.return_value.__enter__.return_value
+            session.query.return_value.filter.return_value = [('1', 'summary', 'abc'), ('2', '', None)]
+            cleaner._prefetch_existing([{'id': 1}, {'id': 2}, {'id': 3}])
+            session.query.assert_called_once()
+
+        assert cleaner._existing_index == {'1': True, '2': False, '3': False}
+        with patch('app.db.base.SessionLocal') as mock_session:
+            assert cleaner._is_exist('1') is True
+            assert cleaner._is_exist('3') is False
+            mock_session.assert_not_called()
+        assert cleaner._stored_hashes == {'1': 'abc', '2': None}
+
+
+# Change Detection Tests
+class TestChangeDetection:
+    def test_content_hash_ignores_whitespace(self):
+        assert content_hash('标题', '第一行\n第二行') == content_hash('标题 ', '第一行  \n 第二行')
+        assert content_hash('标题', '第一行') != content_hash('标题', '第二行')
+
+    def test_change_status(self):
+        cleaner = CANNForumCleaner(Mock())
+        cleaner._existing_index = {'1': True, '2': True, '3': True, '4': False}
+        cleaner._stored_hashes = {'1': content_hash('t', 'b'), '2': content_hash('t', 'old'), '3': None}
+        assert cleaner._change_status({'id': 1, 'title': 't', 'body': 'b'}) == 'unchanged'
+        assert cleaner._change_status({'id': 2, 'title': 't', 'body': 'b'}) == 'changed'
+        # 旧记录没有哈希时沿用已有摘要
+        assert cleaner._change_status({'id': 3, 'title': 't', 'body': 'b'}) == 'unchanged'
+        assert cleaner._change_status({'id': 4, 'title': 't', 'body': 'b'}) == 'new'
+
+    def test_changed_record_is_resummarized(self):
+        cleaner = CANNForumCleaner(Mock())
+        raw = {'id': 2, 'title': 't', 'body': 'new body', 'solution': ''}
+        cleaner._existing_index = {'2': True}
+        cleaner._stored_hashes = {'2': content_hash('t', 'old body')}
+        with patch.object(cleaner, '_summarize', return_value=('新摘要', 0)) as mock_summarize:
+            record = cleaner._build_record(raw)
+        mock_summarize.assert_called_once()
+        assert record.change_status == 'changed'
+        assert record.clean_data == '新摘要'
+        assert record.content_hash == content_hash('t', 'new body')
+
+
+# Concurrency Tests
+class TestConcurrentProcess:
+    def test_preserves_order_and_isolates_errors(self, mock_collector):
+        mock_collector.collect.return_value = [{'id': i} for i in range(10)]
+        cleaner = CANNForumCleaner(mock_collector)
+        cleaner.concurrency = 4
+
+        def build(raw_data):
+            if raw_data['id'] == 3:
+                raise ValueError("boom")
+            return raw_data['id']
+
+        with patch.object(cleaner, '_build_record', side_effect=build):
+            processed = list(cleaner.process(datetime.now()))
+
+        assert processed == [0, 1, 2, 4, 5, 6, 7, 8, 9]
+        assert cleaner.stats['succeeded'] == 9
+        assert cleaner.stats['failed'] == 1
+
+
+# Token Budget Tests
+class TestSummarize:
+    def test_long_body_uses_map_reduce(self):
+        cleaner = CANNForumCleaner(Mock())
+        body = "\n".join("中文内容" * 50 for _ in range(100))
+        with patch('app.data_collect_clean.clean.settings') as mock_settings, \
+                patch.object(cleaner, '_llm_process', return_value="摘要") as mock_llm:
+            mock_settings.llm_block_head_lines = 20
+            mock_settings.llm_block_tail_lines = 10
+            mock_settings.llm_map_reduce_threshold = 5000
+            mock_settings.llm_chunk_tokens = 4000
+            mock_settings.llm_max_input_tokens = 6000
+            summary, tokens_saved = cleaner._summarize("标题", body)
+
+        assert summary == "摘要"
+        # 每块一次摘要，再加一次汇总
+        assert mock_llm.call_count == len(split_chunks(body, 4000)) + 1
+        # 单次请求不超过预算；分块各请求合计超过全文，节省数记为 0 而不是负数
+        assert all(estimate_tokens(c.args[0]) <= 6000 for c in mock_llm.call_args_list)
+        assert tokens_saved == 0
+
+
+# Batch Mode Tests
+class TestBatchMode:
+    def test_missing_records_fall_back_to_single_call(self):
+        raw = [
+            {'id': 1, 'title': '安装失败', 'body': '报错信息'},
+            {'id': 2, 'title': '启动失败', 'body': '内核崩溃'},
+        ]
+        cleaner = CANNForumCleaner(Mock())
+        cleaner.batch_enabled = True
+        cleaner.llm_cache = Mock(enabled=False)
+        cleaner.dedup_index = None
+        cleaner._existing_index = {'1': False, '2': False}
+        with patch.object(cleaner, '_llm_request', return_value='{"r1": "摘要一"}') as mock_request:
+            cleaner._prepare_llm_work(raw)
+            mock_request.assert_called_once()
+
+        assert cleaner._batched_summaries == {'1': '摘要一'}
+        assert cleaner._batch_stats['fallback'] == 1
+        with patch.object(cleaner, '_summarize', return_value=("单条摘要", 0)) as mock_summarize:
+            assert cleaner._clean_content(raw[0]) == ("摘要一", 0)
+            assert cleaner._clean_content(raw[1]) == ("单条摘要", 0)
+            mock_summarize.assert_called_once_with('启动失败', '内核崩溃')
+
+
+class TestNearDuplicates:
+    def test_duplicate_reuses_canonical_summary(self):
+        body = '安装 CANN 8.0 时 npu-smi 报错 driver not found，重装驱动后仍然失败，请问如何解决'
+        raw = [
+            {'id': 1, 'title': '安装失败', 'body': body},
+            {'id': 2, 'title': '安装失败', 'body': body + '！'},
+            {'id': 3, 'title': '训练中断', 'body': '多机训练时 HCCL 超时，日志显示 socket 连接被重置'},
+        ]
+        cleaner = CANNForumCleaner(Mock())
+        cleaner.batch_enabled = False
+        cleaner.dedup_index = NearDuplicateIndex(threshold=0.8)
+        cleaner._existing_index = {'1': False, '2': False, '3': False}
+        with patch.object(cleaner.dedup_index, 'load_candidates'):
+            cleaner._prepare_llm_work(raw)
+        assert cleaner._dedup_stats['in_run'] == 1
+
+        with patch.object(cleaner, '_summarize', side_effect=[("摘要一", 0), ("摘要三", 0)]) as mock_summarize:
+            assert cleaner._clean_content(raw[0]) == ("摘要一", 0)
+            summary, tokens_saved = cleaner._clean_content(raw[1])
+            assert cleaner._clean_content(raw[2]) == ("摘要三", 0)
+        assert summary == "摘要一"
+        assert tokens_saved > 0
+        assert mock_summarize.call_count == 2
+        assert cleaner._dedup_report()['llm_calls_avoided'] == 1
+        assert [e['canonical'] for e in cleaner._dedup_entries] == [None, ('1', 'forum'), None]
+
+    def test_falls_back_when_canonical_fails(self):
+        raw = [
+            {'id': 1, 'title': '安装失败', 'body': '驱动安装报错 driver not found'},
+            {'id': 2, 'title': '安装失败', 'body': '驱动安装报错 driver not found'},
+        ]
+        cleaner = CANNForumCleaner(Mock())
+        cleaner.batch_enabled = False
+        cleaner.dedup_index = NearDuplicateIndex()
+        cleaner._existing_index = {'1': False, '2': False}
+        with patch.object(cleaner.dedup_index, 'load_candidates'):
+            cleaner._prepare_llm_work(raw)
+        with patch.object(cleaner, '_summarize', side_effect=[RuntimeError("超时"), ("单独摘要", 0)]):
+            with pytest.raises(RuntimeError):
+                cleaner._clean_content(raw[0])
+            assert cleaner._clean_content(raw[1]) == ("单独摘要", 0)
+        assert '2' not in cleaner._duplicate_of
+
+
+    def test_repeated_source_id_processed_once(self):
+        body = '安装 CANN 8.0 时 npu-smi 报错 driver not found，重装驱动后仍然失败，请问如何解决'
+        raw = [
+            {'id': 1, 'title': '安装失败', 'body': body, 'solution': ''},
+            {'id': 2, 'title': '安装失败', 'body': body + '！', 'solution': ''},
+            {'id': 1, 'title': '安装失败', 'body': body, 'solution': ''},
+        ]
+        cleaner = CANNForumCleaner(Mock())
+        cleaner.batch_enabled = False
+        cleaner.concurrency = 1
+        cleaner.dedup_index = NearDuplicateIndex(threshold=0.8)
+        with patch.object(cleaner, '_prefetch_existing'), \
+                patch.object(cleaner, '_report_throughput'), \
+                patch.object(cleaner.dedup_index, 'load_candidates'), \
+                patch.object(cleaner.dedup_index, 'persist'), \
+                patch.object(cleaner.dedup_index, 'purge'), \
+                patch.object(cleaner, '_summarize', return_value=("摘要一", 0)) as mock_summarize:
+            cleaner._existing_index = {'1': False, '2': False}
+            records = list(cleaner.process_records(raw))
+
+        assert [r.source_id for r in records] == [1, 2]
+        assert [r.clean_data for r in records] == ["摘要一", "摘要一"]
+        assert cleaner.failures == {}
+        mock_summarize.assert_called_once()
+
+
+class TestRelevanceGate:
+    def make_cleaner(self, mode):
+        cleaner = CANNForumCleaner(Mock())
+        gate = Mock(enabled=True, mode=mode)
+        gate.is_relevant.side_effect = lambda source_type, raw: (raw['title'] != '例会通知', 0.1)
+        cleaner.relevance_gate = gate
+        cleaner._existing_index = {'1': False, '2': False}
+        return cleaner
+
+    def test_drop_mode_skips_llm(self):
+        cleaner = self.make_cleaner('drop')
+        with patch.object(cleaner, '_summarize') as mock_summarize:
+            with pytest.raises(ValueError):
+                cleaner._build_record({'id': 1, 'title': '例会通知', 'body': '纪要', 'solution': ''})
+        mock_summarize.assert_not_called()
+        assert cleaner._relevance_report()['below_threshold'] == 1
+
+    def test_deprioritize_moves_low_scores_last(self):
+        cleaner = self.make_cleaner('deprioritize')
+        raw = [{'id': 1, 'title': '例会通知', 'body': '纪要'}, {'id': 2, 'title': '安装失败', 'body': '报错'}]
+        assert [r['id'] for r in cleaner._deprioritize_irrelevant(raw)] == [2, 1]
+
+
 # CANNForumCleaner Tests
 class TestCANNForumCleaner:
     @pytest.mark.parametrize("title,expected", [
@@ -71,6 +280,14 @@ class TestCANNForumCleaner:
 
 # OpenGaussMailCleaner Tests
 class TestOpenGaussMailCleaner:
+    def test_quoted_history_is_stripped_before_llm(self):
+        cleaner = OpenGaussMailCleaner(Mock())
+        body = "新问题" * 10 + "\n\n在 2024-01-10 09:00，王五 写道：\n" + "> 旧内容\n" * 300
+        body_to_llm, passthrough = cleaner._llm_body({'id': 1, 'title': 't', 'body': body})
+        assert body_to_llm is None
+        assert passthrough == "标题：t\n内容：" + "新问题" * 10
+        assert cleaner._mail_reduction_report()['removed_chars'] == len(body) - 30
+
     @pytest.mark.parametrize("title,body,expected", [
         ('正常问题', '详细描述', True),
         ('例会通知', '内容', False),
@@ -81,6 +298,14 @@ class TestOpenGaussMailCleaner:
         cleaner = OpenGaussMailCleaner(Mock())
         assert cleaner._is_valid(title, body) == expected
 
+    def test_exclusion_hits_recorded_until_merged(self):
+        cleaner = OpenGaussMailCleaner(Mock())
+        assert not cleaner._is_valid('例会通知', '内容')
+        assert not cleaner._is_valid('测试邮件', '包含会议主题')
+        assert cleaner.exclusion_filter.hit_counts() == {}
+        cleaner.exclusion_filter.merge_hits(cleaner._exclusion_hits)
+        assert sum(cleaner.exclusion_filter.hit_counts().values()) == 2
+
 
 # Integration Tests
 class TestIntegration:
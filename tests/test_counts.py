@@ -0,0 +1,99 @@
+import asyncio
+
+from app.data_manager.counts import CountCache
+from app.db.data_version import DataVersion
+
+
+def make_counter(values):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0)
+        return values[len(calls) - 1]
+
+    return compute, calls
+
+
+class TestCountCache:
+    def test_cached_until_data_version_changes(self):
+        versions = DataVersion()
+        cache = CountCache(versions)
+        compute, calls = make_counter([10, 11])
+        stored = [1]
+
+        async def fetch_version():
+            return stored[0]
+
+        async def scenario():
+            await versions.refresh(fetch_version)
+            first = await cache.get('exact', compute)
+            second = await cache.get('exact', compute)
+            stored[0] = 2
+            versions.invalidate('store')
+            await versions.refresh(fetch_version)
+            third = await cache.get('exact', compute)
+            return first, second, third
+
+        first, second, third = asyncio.run(scenario())
+        assert (first['total'], second['total'], third['total']) == (10, 10, 11)
+        assert len(calls) == 2
+        assert first['estimated'] is False
+        assert first['counted_at'] == second['counted_at'] < third['counted_at']
+
+    def test_expires_after_max_age(self):
+        cache = CountCache(DataVersion(), max_age=60)
+        compute, calls = make_counter([1, 2])
+        assert asyncio.run(cache.get('exact', compute))['total'] == 1
+        cache.max_age = 0
+        assert asyncio.run(cache.get('exact', compute))['total'] == 2
+        assert len(calls) == 2
+
+    def test_concurrent_requests_compute_once(self):
+        cache = CountCache(DataVersion())
+        compute, calls = make_counter([5])
+
+        async def scenario():
+            return await asyncio.gather(*(cache.get('exact', compute) for _ in range(20)))
+
+        assert {r['total'] for r in asyncio.run(scenario())} == {5}
+        assert len(calls) == 1
+
+    def test_modes_cached_separately(self):
+        cache = CountCache(DataVersion())
+        exact, _ = make_counter([100])
+        estimate, _ = make_counter([98])
+
+        async def scenario():
+            return await cache.get('exact', exact), await cache.get('estimate', estimate)
+
+        exact_result, estimate_result = asyncio.run(scenario())
+        assert (exact_result['total'], estimate_result['total']) == (100, 98)
+        assert estimate_result['estimated'] is True
+
+
+class TestDataVersion:
+    def test_polls_database_at_most_once_per_interval(self):
+        versions = DataVersion(poll_interval=60)
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            return len(calls)
+
+        async def scenario():
+            results = [await versions.refresh(fetch) for _ in range(3)]
+            versions.invalidate('store')
+            results.append(await versions.refresh(fetch))
+            return results
+
+        assert asyncio.run(scenario()) == [1, 1, 1, 2]
+
+    def test_unavailable_version_disables_caching(self):
+        versions = DataVersion()
+
+        async def fetch():
+            raise RuntimeError('relation "data_version" does not exist')
+
+        assert asyncio.run(versions.refresh(fetch)) is None
+        assert versions.current is None
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+from app.data_collect_clean.dedup import NearDuplicateIndex, band_keys, minhash, normalize, similarity
+
+
+BODY = "升级到 openEuler 22.03 LTS SP3 后 dnf update 报错 GPG check FAILED，导入公钥后依然无法安装软件包"
+
+
+class TestMinHash:
+    def test_normalize_ignores_case_and_punctuation(self):
+        assert normalize("Install Failed!", "dnf: error.") == normalize("install failed", "dnf error")
+
+    def test_similar_texts_score_high(self):
+        a = minhash(normalize("dnf 报错", BODY))
+        b = minhash(normalize("dnf 报错", BODY + "，请问怎么解决"))
+        c = minhash(normalize("内核崩溃", "加载 ko 模块时出现 kernel panic，dmesg 显示空指针访问"))
+        assert similarity(a, b) >= 0.8
+        assert similarity(a, c) < 0.3
+
+    def test_signature_is_stable(self):
+        assert minhash("abcdefgh") == minhash("abcdefgh")
+        assert len(minhash("", num_perm=32)) == 32
+
+    def test_band_keys_match_for_identical_bands(self):
+        sig = minhash(normalize("", BODY))
+        other = list(sig)
+        other[0] += 1
+        keys, other_keys = band_keys(sig, 16), band_keys(other, 16)
+        assert keys[0] != other_keys[0]
+        assert keys[1:] == other_keys[1:]
+
+
+class TestNearDuplicateIndex:
+    def test_bands_must_divide_num_perm(self):
+        with pytest.raises(ValueError):
+            NearDuplicateIndex(num_perm=64, bands=10)
+
+    def test_find_in_run(self):
+        index = NearDuplicateIndex(threshold=0.8)
+        sig = index.signature("dnf 报错", BODY)
+        index.add_to_run(("1", "issue"), sig)
+        assert index.find_in_run(index.signature("dnf 报错", BODY + "。")) == ("1", "issue")
+        assert index.find_in_run(sig, exclude=("1", "issue")) is None
+        assert index.find_in_run(index.signature("内核崩溃", "kernel panic 空指针")) is None
+
+    def test_find_persisted_returns_summary(self):
+        index = NearDuplicateIndex()
+        sig = index.signature("dnf 报错", BODY)
+        index._persisted = {("7", "mail"): (sig, "已有摘要")}
+        index._persisted_buckets = {key: [("7", "mail")] for key in band_keys(sig, index.bands)}
+        assert index.find_persisted(sig) == (("7", "mail"), "已有摘要")
+        assert index.find_persisted(sig, exclude=("7", "mail")) is None
+
+    def test_purge_deletes_signatures_outside_window(self):
+        index = NearDuplicateIndex(window_days=30)
+        session = MagicMock()
+        session.query.return_value.filter.return_value.delete.return_value = 3
+        with patch('app.data_collect_clean.dedup.base.SessionLocal') as session_local:
+            session_local.return_value.__enter__.return_value = session
+            assert index.purge() == 3
+        cutoff = session.query.return_value.filter.call_args.args[0].right.value
+        assert abs(cutoff - (datetime.now(timezone.utc) - timedelta(days=30))) < timedelta(seconds=5)
+        session.commit.assert_called_once()
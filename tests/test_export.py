@@ -0,0 +1,148 @@
+import asyncio
+import json
+from contextlib import contextmanager
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi import FastAPI
+from starlette.requests import ClientDisconnect
+from fastapi.testclient import TestClient
+
+from app.data_manager import api
+from app.data_manager.manager import DataManager, export_columns
+
+
+class FakePool:
+    def __init__(self, rows):
+        self.rows = rows
+        self.released = False
+        self.cursor = MagicMock()
+        self.cursor.fetchmany.side_effect = self._fetchmany
+        self.conn = MagicMock()
+        self.conn.cursor.return_value.__enter__.return_value = self.cursor
+
+    def _fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    @contextmanager
+    def connection(self):
+        try:
+            yield self.conn
+        finally:
+            self.released = True
+
+
+class TestExportColumns:
+    def test_defaults_to_all_fields_with_public_names(self):
+        names = [name for name, _ in export_columns(None)]
+        assert 'source_deleted' in names and 'is_deleted' not in names
+        assert 'content_hash' not in names
+
+    def test_internal_columns_cannot_be_selected(self):
+        with pytest.raises(ValueError):
+            export_columns(['content_hash'])
+
+    def test_selected_fields_deduplicated(self):
+        assert export_columns(['id', 'source_deleted', 'id']) == [('id', 'id'), ('source_deleted', 'is_deleted')]
+
+    def test_unknown_field(self):
+        with pytest.raises(ValueError):
+            export_columns(['id', 'password'])
+
+
+class TestExportOpenDiscussions:
+    def test_streams_ndjson_in_itersize_chunks(self):
+        pool = FakePool([(i, datetime(2024, 1, 1), '标题') for i in range(5)])
+        manager = DataManager(pool)
+        columns = [('id', 'id'), ('created_at', 'created_at'), ('title', 'title')]
+        chunks = list(manager.export_open_discussions(columns, itersize=2))
+
+        assert len(chunks) == 3
+        lines = b''.join(chunks).decode('utf-8').splitlines()
+        assert json.loads(lines[0]) == {'id': 0, 'created_at': '2024-01-01T00:00:00', 'title': '标题'}
+        assert len(lines) == 5
+        pool.conn.cursor.assert_called_once_with(name='discussion_export')
+        assert pool.cursor.itersize == 2
+        assert pool.released
+
+    def test_connection_released_when_client_stops(self):
+        pool = FakePool([(i,) for i in range(10)])
+        chunks = DataManager(pool).export_open_discussions([('id', 'id')], itersize=2)
+        next(chunks)
+        chunks.close()
+        assert pool.released
+
+
+class TestExportEndpoint:
+    def make_client(self):
+        app = FastAPI()
+        app.include_router(api.router, prefix='/api/v1')
+        return TestClient(app)
+
+    def test_gzip_when_requested_and_accepted(self):
+        with patch.object(api.data_manager, 'export_open_discussions', return_value=iter([b'{"id":1}\n', b'{"id":2}\n'])):
+            response = self.make_client().get(
+                '/api/v1/export', params={'fields': 'id', 'compress': 'true'}, headers={'Accept-Encoding': 'gzip'}
+            )
+        assert response.status_code == 200
+        assert response.headers['content-type'] == 'application/x-ndjson'
+        assert response.headers['content-encoding'] == 'gzip'
+        # httpx 已按 Content-Encoding 解压
+        assert response.text.splitlines() == ['{"id":1}', '{"id":2}']
+
+    def test_unknown_field_rejected_before_streaming(self):
+        with patch.object(api.data_manager, 'export_open_discussions') as export:
+            response = self.make_client().get('/api/v1/export', params={'fields': 'id,secret'})
+        assert response.status_code == 400
+        export.assert_not_called()
+
+
+class TestClientDisconnect:
+    def start(self, itersize=2):
+        pool = FakePool([(i,) for i in range(100)])
+        chunks = DataManager(pool).export_open_discussions([('id', 'id')], itersize=itersize)
+        return pool, chunks
+
+    def test_connection_released_when_send_fails(self):
+        # ASGI 2.4：客户端断开后 send 抛出 OSError
+        pool, chunks = self.start()
+        sent = []
+
+        async def send(message):
+            if message['type'] == 'http.response.body':
+                if sent:
+                    raise OSError('连接已断开')
+                sent.append(message)
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        response = api.ClosingStreamingResponse(chunks, media_type='application/x-ndjson')
+        with pytest.raises(ClientDisconnect):
+            asyncio.run(response({'type': 'http', 'asgi': {'spec_version': '2.4'}}, receive, send))
+        assert pool.released
+        assert pool.cursor.fetchmany.call_count == 2
+
+    def test_connection_released_when_stream_cancelled(self):
+        # 旧版 ASGI：收到 http.disconnect 后取消推送数据的任务
+        pool, chunks = self.start()
+        first_chunk = asyncio.Event()
+
+        async def send(message):
+            if message['type'] == 'http.response.body':
+                first_chunk.set()
+                await asyncio.sleep(1)
+
+        async def receive():
+            await first_chunk.wait()
+            return {'type': 'http.disconnect'}
+
+        response = api.ClosingStreamingResponse(api.gzip_chunks(chunks), media_type='application/x-ndjson')
+
+        async def scenario():
+            await response({'type': 'http', 'asgi': {'spec_version': '2.0'}}, receive, send)
+
+        asyncio.run(scenario())
+        assert pool.released
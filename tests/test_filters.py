@@ -0,0 +1,61 @@
+import pytest
+from app.data_collect_clean.filters import ExclusionFilter, RuleSet, compile_literals
+
+
+class TestCompileLiterals:
+    def test_matches_any_literal(self):
+        pattern = compile_literals(["升级", "升级通知", "公告", "[PATCH]"])
+        assert pattern.search("内核升级通知").group(0) == "升级通知"
+        assert pattern.search("社区公告").group(0) == "公告"
+        assert pattern.search("[PATCH] fix oops").group(0) == "[PATCH]"
+        assert pattern.search("PATCH A T C H") is None
+
+    def test_longer_literal_wins_regardless_of_order(self):
+        assert compile_literals(["升级", "升级通知"]).search("升级通知").group(0) == "升级通知"
+        assert compile_literals(["a.b"]).search("axb") is None
+
+    def test_empty(self):
+        assert compile_literals([]) is None
+
+
+class TestRuleSet:
+    def test_empty_rule_is_ignored(self):
+        rules = RuleSet(["分享", ""])
+        assert rules.match("安装失败") is None
+        assert rules.match("经验分享") == "分享"
+
+    def test_regex_rule_reports_pattern(self):
+        rules = RuleSet(["test"], ["指南$", "攻略$"])
+        assert rules.match("安装指南") == "指南$"
+        assert rules.match("攻略大全") is None
+        assert rules.match("unit test") == "test"
+
+
+class TestExclusionFilter:
+    @pytest.fixture
+    def config(self):
+        return {
+            "openeuler": {
+                "mail": {
+                    "title": {"literals": ["[PATCH]", "例会"]},
+                    "body": {"literals": ["会议主题"]},
+                }
+            }
+        }
+
+    def test_match_reports_field_and_rule(self, config):
+        engine = ExclusionFilter.from_config(config, "openeuler", "mail")
+        assert engine.match("[PATCH] v2", "") == ("title", "[PATCH]")
+        assert engine.match("问题", "本次会议主题") == ("body", "会议主题")
+        assert engine.match("Build Failure", "详细描述") is None
+        assert engine.hit_counts() == {}
+
+    def test_merge_hits(self, config):
+        engine = ExclusionFilter.from_config(config, "openeuler", "mail")
+        engine.merge_hits([("title", "[PATCH]"), ("body", "会议主题"), ("title", "[PATCH]")])
+        engine.merge_hits([("title", "例会")])
+        assert engine.hit_counts() == {"title:[PATCH]": 2, "body:会议主题": 1, "title:例会": 1}
+
+    def test_unknown_source_matches_nothing(self, config):
+        engine = ExclusionFilter.from_config(config, "cann", "forum")
+        assert engine.match("例会", "会议主题") is None
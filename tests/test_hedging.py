@@ -0,0 +1,107 @@
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock, Mock, patch
+from app.data_collect_clean.hedging import DeadlineExceeded, HedgedCompletion, LatencyTracker
+from app.data_collect_clean.llm_controller import LLMCallController
+
+
+def make_client(content, delay=0.0):
+    def create(**kwargs):
+        time.sleep(delay)
+        response = MagicMock()
+        response.choices[0].message.content = content
+        return response
+
+    client = Mock()
+    client.chat.completions.create.side_effect = create
+    return client
+
+
+@pytest.fixture
+def hedger():
+    hedger = HedgedCompletion(enabled=True, min_samples=3, min_delay=0.01, hedge_model="backup")
+    for latency in (0.01, 0.02, 0.03):
+        hedger.latencies.add(latency)
+    return hedger
+
+
+class TestLatencyTracker:
+    def test_percentile(self):
+        tracker = LatencyTracker()
+        for i in range(1, 101):
+            tracker.add(i)
+        assert tracker.percentile(95) == 95
+        assert tracker.percentile(50) == 50
+        assert LatencyTracker().percentile(95) is None
+
+
+class TestHedgedCompletion:
+    def test_no_hedge_without_enough_samples(self):
+        hedger = HedgedCompletion(enabled=True, min_samples=20)
+        client = make_client("primary")
+        assert hedger.complete(client, "model", []) == "primary"
+        assert hedger.stats()["hedged"] == 0
+
+    def test_hedge_wins_when_primary_is_slow(self, hedger):
+        backup = make_client("backup")
+        with patch.object(hedger, "_get_hedge_client", return_value=backup):
+            assert hedger.complete(make_client("primary", delay=0.5), "model", []) == "backup"
+        assert backup.chat.completions.create.call_args.kwargs["model"] == "backup"
+        stats = hedger.stats()
+        assert stats["hedged"] == 1
+        assert stats["hedge_wins"] == 1
+        assert stats["hedge_rate"] == 1.0
+
+    def test_primary_wins_before_hedge_delay(self, hedger):
+        hedger.min_delay = 1
+        assert hedger.complete(make_client("primary"), "model", []) == "primary"
+        assert hedger.stats()["primary_wins"] == 1
+
+    def test_deadline_is_propagated(self, hedger):
+        client = make_client("primary")
+        with pytest.raises(DeadlineExceeded):
+            hedger.complete(client, "model", [], deadline=time.monotonic() - 1)
+        client.chat.completions.create.assert_not_called()
+
+        hedger.enabled = False
+        hedger.complete(client, "model", [], deadline=time.monotonic() + 3)
+        assert client.chat.completions.create.call_args.kwargs["timeout"] <= 3
+
+    def test_primary_does_not_queue_behind_hung_requests(self):
+        hedger = HedgedCompletion(enabled=True, min_samples=3, min_delay=0.01, max_workers=1)
+        for latency in (0.01, 0.02, 0.03):
+            hedger.latencies.add(latency)
+        release = threading.Event()
+        hung = Mock()
+        hung.chat.completions.create.side_effect = lambda **kwargs: release.wait(5)
+        with patch.object(hedger, "_get_hedge_client", return_value=hung):
+            # 对冲请求挂起，占满对冲线程池
+            assert hedger.complete(make_client("first", delay=0.2), "model", []) == "first"
+            started = time.monotonic()
+            assert hedger.complete(make_client("second", delay=0.4), "model", []) == "second"
+        assert time.monotonic() - started < 1
+        assert hedger.stats()["hedge_skipped"] == 1
+        release.set()
+
+    def test_hedge_holds_controller_slot_until_both_finish(self, hedger):
+        controller = LLMCallController(max_concurrency=2)
+        backup = make_client("backup")
+        with patch.object(hedger, "_get_hedge_client", return_value=backup):
+            assert controller.call(
+                lambda: hedger.complete(make_client("primary", delay=0.3), "model", [], controller=controller)
+            ) == "backup"
+        # 落败的主请求仍在进行，继续占用对冲申请的额度
+        assert controller.stats()["in_flight"] == 1
+        time.sleep(0.4)
+        assert controller.stats()["in_flight"] == 0
+
+    def test_no_hedge_without_controller_capacity(self, hedger):
+        controller = LLMCallController(max_concurrency=1)
+        backup = make_client("backup")
+        with patch.object(hedger, "_get_hedge_client", return_value=backup):
+            assert controller.call(
+                lambda: hedger.complete(make_client("primary", delay=0.1), "model", [], controller=controller)
+            ) == "primary"
+        backup.chat.completions.create.assert_not_called()
+        assert hedger.stats()["hedge_skipped"] == 1
@@ -0,0 +1,53 @@
+import pytest
+from unittest.mock import patch
+from app.data_collect_clean.llm_cache import LLMResponseCache
+
+
+@pytest.fixture
+def cache():
+    cache = LLMResponseCache(enabled=True, memory_entries=2)
+    with patch.object(cache, "_db_get", return_value=None), patch.object(cache, "_db_set"):
+        yield cache
+
+
+class TestLLMResponseCache:
+    def test_key_depends_on_all_parts(self):
+        key = LLMResponseCache.make_key("model", "prompt", "content")
+        assert key == LLMResponseCache.make_key("model", "prompt", "content")
+        assert key != LLMResponseCache.make_key("other", "prompt", "content")
+        assert key != LLMResponseCache.make_key("model", "other", "content")
+        assert key != LLMResponseCache.make_key("model", "prompt", "other")
+
+    def test_memory_hit_after_set(self, cache):
+        assert cache.get("k") is None
+        cache.set("k", "model", "summary")
+        assert cache.get("k") == "summary"
+        stats = cache.stats()
+        assert stats["misses"] == 1
+        assert stats["memory_hits"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_memory_lru_eviction(self, cache):
+        cache.set("a", "model", "1")
+        cache.set("b", "model", "2")
+        cache.set("c", "model", "3")
+        assert cache.get("a") is None
+        assert cache.get("c") == "3"
+
+    def test_db_hit_populates_memory(self, cache):
+        with patch.object(cache, "_db_get", return_value=("from db", 10 ** 10)) as db_get:
+            assert cache.get("k") == "from db"
+            assert cache.get("k") == "from db"
+            db_get.assert_called_once()
+        assert cache.stats()["db_hits"] == 1
+
+    def test_bypass_skips_reads_but_still_writes(self, cache):
+        cache.bypass = True
+        cache.set("k", "model", "summary")
+        assert cache.get("k") is None
+        cache._db_set.assert_called_once()
+
+    def test_db_errors_are_treated_as_miss(self, cache):
+        with patch.object(cache, "_db_get", side_effect=Exception("down")):
+            assert cache.get("k") is None
+        assert cache.stats()["errors"] == 1
@@ -0,0 +1,82 @@
+import httpx
+import openai
+import pytest
+from unittest.mock import Mock, patch
+from app.data_collect_clean.llm_controller import (
+    LLMCallController,
+    classify_error,
+    retry_after_seconds,
+)
+
+
+def make_status_error(cls, status, headers=None):
+    request = httpx.Request("POST", "https://api.example.com/v1/chat/completions")
+    response = httpx.Response(status, request=request, headers=headers or {})
+    return cls("error", response=response, body=None)
+
+
+@pytest.fixture
+def controller():
+    return LLMCallController(max_attempts=3, base_delay=0.01, min_concurrency=1, max_concurrency=4, adjust_interval=0)
+
+
+class TestClassifyError:
+    @pytest.mark.parametrize("error,expected", [
+        (make_status_error(openai.RateLimitError, 429), "rate_limit"),
+        (make_status_error(openai.InternalServerError, 503), "server"),
+        (make_status_error(openai.BadRequestError, 400), "client"),
+        (openai.APITimeoutError(request=httpx.Request("POST", "https://x")), "timeout"),
+        (ValueError("bad"), "unknown"),
+    ])
+    def test_classify(self, error, expected):
+        assert classify_error(error) == expected
+
+    @pytest.mark.parametrize("headers,expected", [
+        ({"retry-after": "2"}, 2.0),
+        ({"retry-after-ms": "500"}, 0.5),
+        ({"retry-after-ms": "1500.5"}, 1.5005),
+        ({"retry-after-ms": "5s"}, None),
+        ({"retry-after-ms": "soon"}, None),
+        ({"x-ratelimit-reset-requests": "1m30s"}, 90.0),
+        ({}, None),
+    ])
+    def test_retry_after(self, headers, expected):
+        error = make_status_error(openai.RateLimitError, 429, headers)
+        assert retry_after_seconds(error) == expected
+
+
+class TestLLMCallController:
+    @patch("app.data_collect_clean.llm_controller.time.sleep")
+    def test_retries_rate_limit_honoring_header(self, mock_sleep, controller):
+        error = make_status_error(openai.RateLimitError, 429, {"retry-after": "2"})
+        fn = Mock(side_effect=[error, "ok"])
+        assert controller.call(fn) == "ok"
+        assert fn.call_count == 2
+        assert 2.0 <= mock_sleep.call_args[0][0] <= 2.01
+        stats = controller.stats()
+        assert stats["retries"] == 1
+        assert stats["throttled"] == 1
+        assert stats["concurrency_limit"] == 2
+
+    @patch("app.data_collect_clean.llm_controller.time.sleep")
+    def test_does_not_retry_bad_request(self, mock_sleep, controller):
+        fn = Mock(side_effect=make_status_error(openai.BadRequestError, 400))
+        with pytest.raises(openai.BadRequestError):
+            controller.call(fn)
+        assert fn.call_count == 1
+        mock_sleep.assert_not_called()
+
+    @patch("app.data_collect_clean.llm_controller.time.sleep")
+    def test_gives_up_after_max_attempts(self, mock_sleep, controller):
+        fn = Mock(side_effect=make_status_error(openai.InternalServerError, 502))
+        with pytest.raises(openai.InternalServerError):
+            controller.call(fn)
+        assert fn.call_count == 3
+        assert controller.stats()["failed"] == 1
+
+    def test_limit_recovers_after_successes(self, controller):
+        controller._limit = 1.0
+        for _ in range(10):
+            controller.call(lambda: "ok")
+        assert controller.limit == 4
+        assert controller.stats()["limit_increases"] == 3
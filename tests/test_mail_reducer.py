@@ -0,0 +1,42 @@
+import pytest
+from app.data_collect_clean.mail_reducer import reduce
+
+
+class TestReduce:
+    def test_removes_prefixed_quotes_and_attribution(self):
+        text = "同意这个方案，+1\n\n在 2024-01-10 09:00，王五 写道：\n> 建议把 kernel 升级到 6.6\n>\n> 谢谢"
+        reduced, removed_chars, removed_tokens = reduce(text)
+        assert reduced == "同意这个方案，+1"
+        assert removed_chars == len(text) - len(reduced)
+        assert removed_tokens > 0
+
+    def test_keeps_inline_replies(self):
+        text = "On Mon, Jan 1, 2024 at 10:00 AM Li Si <lisi@example.com>\nwrote:\n> 问题一？\n回答一\n> 问题二？\n回答二"
+        assert reduce(text)[0] == "回答一\n回答二"
+
+    @pytest.mark.parametrize("marker", [
+        "-----Original Message-----",
+        "------------------ 原始邮件 ------------------",
+        "-- ",
+        "_______________________________________________",
+        "To unsubscribe send an email to dev-leave@openeuler.org",
+        "本邮件及其附件含有华为公司的保密信息",
+    ])
+    def test_cuts_history_signature_and_footer(self, marker):
+        assert reduce(f"新的问题描述\n{marker}\n旧的内容\n更多旧内容")[0] == "新的问题描述"
+
+    def test_outlook_header_block(self):
+        text = "请看附件。\n\n发件人：张三\n发送时间：2024年3月5日 10:21\n收件人：dev\n主题：构建失败\n\n旧正文"
+        assert reduce(text)[0] == "请看附件。"
+
+    def test_unquoted_attribution_cuts_rest(self):
+        text = "已修复\n王五 <w@example.com> 于2024年1月10日周三 09:00写道：\n旧正文"
+        assert reduce(text)[0] == "已修复"
+
+    def test_leading_headers_and_plain_mail_are_untouched(self):
+        text = "发件人：张三\n发送日期：2024-03-05\n收件人：dev\n\n正文"
+        assert reduce(text) == (text, 0, 0)
+
+    def test_fully_quoted_mail_falls_back_to_original(self):
+        text = "> 只有引用\n> 没有新内容"
+        assert reduce(text) == (text, 0, 0)
@@ -0,0 +1,243 @@
+from datetime import datetime
+from unittest.mock import MagicMock, Mock, patch
+from sqlalchemy.dialects import postgresql
+from app.main import (
+    build_upsert_statement,
+    dedupe_records,
+    fetch_top_n,
+    initialize_processing_environment,
+    process_batch,
+    process_with_work_queue,
+    retry_failed_records,
+    store_processed_data,
+)
+
+
+def make_record(**overrides):
+    record = {
+        'source_id': '1',
+        'source_type': 'issue',
+        'title': '标题',
+        'body': '正文',
+        'url': 'https://example.com/1',
+        'topic_summary': '',
+        'topic_closed': False,
+        'created_at': '2024-01-01 00:00:00',
+        'updated_at': '2024-01-02 00:00:00',
+        'clean_data': '',
+        'history': '[]',
+        'source_closed': False,
+        'content_hash': 'abc',
+        'change_status': 'unchanged',
+    }
+    record.update(overrides)
+    return record
+
+
+def compile_sql(records):
+    return str(build_upsert_statement(records).compile(dialect=postgresql.dialect()))
+
+
+class TestBuildUpsertStatement:
+    def test_single_statement_for_whole_batch(self):
+        sql = compile_sql([make_record(source_id=str(i)) for i in range(3)])
+        assert sql.count('INSERT INTO') == 1
+        assert 'source_id_m2' in sql
+        assert 'WHERE discussion.title IS DISTINCT FROM excluded.title' in sql
+
+    def test_empty_summary_keeps_stored_summary(self):
+        sql = compile_sql([make_record()])
+        assert 'clean_data = CASE WHEN (coalesce(excluded.clean_data' in sql
+        assert 'ELSE discussion.clean_data END' in sql
+
+    def test_missing_hash_does_not_clear_stored_hash(self):
+        sql = compile_sql([make_record(content_hash=None)])
+        assert 'content_hash = coalesce(excluded.content_hash, discussion.content_hash)' in sql
+
+
+class TestProcessBatch:
+    def test_dedupe_keeps_last_record_per_key(self):
+        records = dedupe_records(
+            [make_record(title='旧'), make_record(source_id='2'), make_record(source_id=1, title='新')]
+        )
+        assert [r['title'] for r in records] == ['新', '标题']
+
+    def test_bulk_statement_commits_once(self):
+        session = Mock()
+        session.execute.return_value = Mock(rowcount=2)
+        written, failed = process_batch(session, [make_record(), make_record(source_id='2')])
+        assert (written, failed) == (2, [])
+        session.execute.assert_called_once()
+        session.commit.assert_called_once()
+
+    def test_falls_back_to_row_by_row_on_failure(self):
+        session = MagicMock()
+        bad = make_record(source_id='2')
+
+        def execute(stmt):
+            params = stmt.compile().params
+            if len([k for k in params if k.startswith('source_id')]) > 1:
+                raise RuntimeError('批量失败')
+            if params.get('source_id_m0', params.get('source_id')) == '2':
+                raise RuntimeError('行失败')
+            return Mock(rowcount=1)
+
+        session.execute.side_effect = execute
+        written, failed = process_batch(session, [make_record(), bad])
+        assert written == 1
+        assert failed == [('issue', '2')]
+        session.rollback.assert_called_once()
+        assert session.begin_nested.call_count == 2
+
+
+class TestStoreProcessedData:
+    @patch('app.main.settings', store_batch_size=500, bulk_load_min_rows=2)
+    @patch('app.main.bulk_load.copy_merge')
+    def test_large_loads_use_copy(self, copy_merge, settings):
+        assert store_processed_data([make_record(), make_record(source_id='2')]) == []
+        copy_merge.assert_called_once()
+
+    @patch('app.main.process_batch', return_value=(1, []))
+    @patch('app.main.base.SessionLocal', MagicMock())
+    @patch('app.main.settings', store_batch_size=500, bulk_load_min_rows=2)
+    @patch('app.main.bulk_load.copy_merge', side_effect=RuntimeError('COPY 失败'))
+    def test_copy_failure_falls_back_to_batches(self, copy_merge, settings, process_batch):
+        assert store_processed_data([make_record(), make_record(source_id='2')]) == []
+        process_batch.assert_called_once()
+
+
+class TestFetchTopN:
+    @patch('app.main.sync_topic_assignments')
+    @patch('app.main.requests.get')
+    def test_builds_one_assignment_per_discussion(self, get, sync):
+        get.return_value.json.return_value = {'data': {'topics': [
+            {'title': '专题一', 'status': {'status': 'Resolved'}, 'dss': [{'id': 1}, {'id': None}]},
+            {'title': '专题二', 'dss': [{'id': 2}]},
+        ]}}
+        fetch_top_n()
+        sync.assert_called_once_with('fetch_top_n', [
+            {'id': 1, 'topic_summary': '专题一', 'topic_closed': True, 'posted': True},
+            {'id': 2, 'topic_summary': '专题二', 'topic_closed': False, 'posted': True},
+        ])
+
+
+class TestProcessWithWorkQueue:
+    def make_pipeline(self, records, failures=None):
+        cleaner = Mock(source_type='issue', failures=failures or {})
+        cleaner.process_records.side_effect = lambda data, deadline=None: iter(records)
+        collector = Mock()
+        collector.collect.return_value = [{'id': 1}, {'id': 2}]
+        return [('issue', lambda c: collector, lambda community, col: cleaner)], collector, cleaner
+
+    @patch('app.main.store_processed_data', return_value=[])
+    @patch('app.main.work_queue.queue')
+    def test_resumed_run_skips_collection(self, queue, store):
+        pipelines, collector, cleaner = self.make_pipeline([])
+        queue.open_run.return_value = Mock(id=7, window_start='w', collected_sources=['issue'])
+        queue.load.side_effect = lambda run_id, state, source_type=None: (
+            [Mock(payload={'id': 2})] if state == 'collected' else [Mock(result={'source_type': 'issue', 'source_id': 1})]
+        )
+        with patch('app.main.get_source_pipelines', return_value=pipelines):
+            process_with_work_queue(datetime(2024, 1, 1))
+
+        collector.collect.assert_not_called()
+        cleaner.process_records.assert_called_once()
+        assert cleaner.process_records.call_args[0][0] == [{'id': 2}]
+        store.assert_called_once_with([{'source_type': 'issue', 'source_id': 1}])
+        queue.mark_stored.assert_called_once_with(7, [('issue', 1)])
+        queue.finish_run.assert_called_once_with(7)
+
+    @patch('app.main.store_processed_data', return_value=[('issue', '2')])
+    @patch('app.main.work_queue.queue')
+    def test_failed_rows_stay_cleaned(self, queue, store):
+        pipelines, _, _ = self.make_pipeline([])
+        queue.open_run.return_value = Mock(id=7, window_start='w', collected_sources=['issue'])
+        queue.load.side_effect = lambda run_id, state, source_type=None: (
+            [] if state == 'collected' else [
+                Mock(result={'source_type': 'issue', 'source_id': 1}),
+                Mock(result={'source_type': 'issue', 'source_id': 2}),
+            ]
+        )
+        with patch('app.main.get_source_pipelines', return_value=pipelines):
+            process_with_work_queue(datetime(2024, 1, 1))
+
+        queue.mark_stored.assert_called_once_with(7, [('issue', 1)])
+
+    @patch('app.main.store_processed_data', return_value=[])
+    @patch('app.main.work_queue.queue')
+    def test_checkpoints_each_cleaned_record_and_failures(self, queue, store):
+        record = Mock(source_id=1)
+        error = ValueError('bad')
+        pipelines, collector, cleaner = self.make_pipeline([record], failures={'2': error})
+        queue.open_run.return_value = Mock(id=3, window_start='w', collected_sources=[])
+        queue.load.return_value = []
+        with patch('app.main.get_source_pipelines', return_value=pipelines):
+            process_with_work_queue(datetime(2024, 1, 1))
+
+        queue.enqueue.assert_called_once_with(3, 'issue', [{'id': 1}, {'id': 2}])
+        queue.mark_source_collected.assert_called_once_with(3, 'issue')
+        queue.mark_cleaned.assert_called_once_with(3, 'issue', 1, record.__dict__)
+        queue.mark_failed.assert_called_once_with(3, 'issue', {'2': error})
+
+
+class TestRetryFailedRecords:
+    @patch('app.main.store_processed_data', return_value=[])
+    @patch('app.main.work_queue.queue')
+    def test_retries_only_due_items(self, queue, store):
+        queue.load_due_retries.return_value = [
+            Mock(run_id=1, source_type='issue', source_id='1', payload={'id': 1}),
+            Mock(run_id=2, source_type='issue', source_id='2', payload={'id': 2}),
+        ]
+        error = TimeoutError('超时')
+        cleaner = Mock(failures={'2': error})
+        cleaner.process_records.return_value = iter([Mock(source_id=1)])
+        collector = Mock()
+        pipelines = [('issue', lambda c: collector, lambda community, col: cleaner)]
+        with patch('app.main.get_source_pipelines', return_value=pipelines), \
+                patch('app.main.work_queue.to_json', side_effect=lambda value: {'source_id': 1}):
+            retry_failed_records()
+
+        collector.collect.assert_not_called()
+        cleaner.process_records.assert_called_once_with([{'id': 1}, {'id': 2}])
+        queue.mark_cleaned.assert_called_once()
+        assert queue.mark_cleaned.call_args[0][0] == 1
+        queue.mark_failed.assert_called_once_with(2, 'issue', {'2': error}, 'failed')
+        store.assert_called_once_with([{'source_id': 1}])
+        queue.mark_stored.assert_called_once_with(None, [(1, 'issue', 1)])
+
+    @patch('app.main.store_processed_data', return_value=[])
+    @patch('app.main.work_queue.queue')
+    def test_same_record_failed_in_several_runs(self, queue, store):
+        queue.load_due_retries.return_value = [
+            Mock(run_id=1, source_type='issue', source_id='1', payload={'id': 1, 'run': 1}),
+            Mock(run_id=2, source_type='issue', source_id='1', payload={'id': 1, 'run': 2}),
+            Mock(run_id=1, source_type='issue', source_id='2', payload={'id': 2, 'run': 1}),
+            Mock(run_id=2, source_type='issue', source_id='2', payload={'id': 2, 'run': 2}),
+        ]
+        error = TimeoutError('超时')
+        cleaner = Mock(failures={'2': error})
+        cleaner.process_records.return_value = iter([Mock(source_id=1)])
+        pipelines = [('issue', lambda c: Mock(), lambda community, col: cleaner)]
+        with patch('app.main.get_source_pipelines', return_value=pipelines), \
+                patch('app.main.work_queue.to_json', side_effect=lambda value: {'source_id': 1}):
+            retry_failed_records()
+
+        # 每条记录只清洗、写入一次，使用最新一轮的采集数据
+        cleaner.process_records.assert_called_once_with([{'id': 1, 'run': 2}, {'id': 2, 'run': 2}])
+        store.assert_called_once_with([{'source_id': 1}])
+        # 每一轮中的记录都推进状态
+        assert sorted(call.args[0] for call in queue.mark_cleaned.call_args_list) == [1, 2]
+        assert sorted(call.args[0] for call in queue.mark_failed.call_args_list) == [1, 2]
+        for call in queue.mark_failed.call_args_list:
+            assert call.args[1:] == ('issue', {'2': error}, 'failed')
+        queue.mark_stored.assert_called_once_with(None, [(1, 'issue', 1), (2, 'issue', 1)])
+
+
+class TestInitializeProcessingEnvironment:
+    @patch('app.main.migrations.upgrade')
+    @patch('app.main.base.check_and_create_tables')
+    @patch('app.main.init_db.init_database')
+    def test_always_applies_pending_migrations(self, init_database, create_tables, upgrade):
+        initialize_processing_environment()
+        create_tables.assert_called_once()
+        upgrade.assert_called_once()
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.data_manager.manager import (
+    COUNT_SQL,
+    ESTIMATE_SQL,
+    LATEST_AFTER_SQL,
+    LATEST_SQL,
+    OPEN_PREDICATE,
+    PAGE_AFTER_SQL,
+    PAGE_SQL,
+    data_cursor_after,
+    encode_cursor,
+    latest_cursor_after,
+    latest_query,
+    next_cursor,
+    page_query,
+    plan_rows,
+)
+
+
+class TestPageQuery:
+    def test_offset_pagination_kept_for_page(self):
+        assert page_query(3, 10) == (PAGE_SQL, (10, 20))
+
+    def test_cursor_replaces_offset(self):
+        assert page_query(3, 10, after_id=57) == (PAGE_AFTER_SQL, (57, 10))
+        assert 'OFFSET' not in PAGE_AFTER_SQL
+
+    def test_latest_cursor_compares_created_at_and_id(self):
+        since = datetime(2024, 1, 5)
+        last = datetime(2024, 1, 6, tzinfo=timezone.utc)
+        assert latest_query(since, 1, 10, (last, 9)) == (LATEST_AFTER_SQL, (since, last, 9, 10))
+        assert '(created_at, id) > (%s, %s)' in LATEST_AFTER_SQL
+
+    def test_invalid_page_size(self):
+        with pytest.raises(ValueError):
+            page_query(1, 0, after_id=1)
+
+
+class TestCursor:
+    def test_data_cursor_round_trip(self):
+        cursor = next_cursor('data', [{'id': 1}, {'id': 2}], page_size=2)
+        assert data_cursor_after(cursor) == 2
+
+    def test_latest_cursor_round_trip(self):
+        created = datetime(2024, 1, 6, 8, tzinfo=timezone(timedelta(hours=8)))
+        cursor = next_cursor('latest', [{'id': 5, 'created_at': created}], page_size=1)
+        assert latest_cursor_after(cursor) == (created, 5)
+
+    def test_last_page_has_no_cursor(self):
+        assert next_cursor('data', [{'id': 1}], page_size=2) is None
+
+    @pytest.mark.parametrize('cursor', ['不是游标', '!!!', encode_cursor('latest', id=1), encode_cursor('data', id='1')])
+    def test_invalid_data_cursor(self, cursor):
+        with pytest.raises(ValueError):
+            data_cursor_after(cursor)
+
+    def test_latest_cursor_requires_timestamp(self):
+        with pytest.raises(ValueError):
+            latest_cursor_after(encode_cursor('latest', created_at='昨天', id=1))
+
+
+class TestPublicColumns:
+    @pytest.mark.parametrize('sql', [PAGE_SQL, PAGE_AFTER_SQL, LATEST_SQL, LATEST_AFTER_SQL])
+    def test_queries_select_public_columns_only(self, sql):
+        assert 'SELECT *' not in sql
+        assert 'content_hash' not in sql
+        assert 'topic_summary' in sql and 'is_deleted' in sql
+
+
+class TestCounts:
+    def test_count_uses_page_predicate(self):
+        assert OPEN_PREDICATE in COUNT_SQL
+        assert OPEN_PREDICATE in ESTIMATE_SQL
+        assert OPEN_PREDICATE in PAGE_SQL
+
+    def test_plan_rows_from_explain_output(self):
+        explain = [{'Plan': {'Node Type': 'Index Only Scan', 'Plan Rows': 1234}}]
+        assert plan_rows(explain) == 1234
+        assert plan_rows('[{"Plan": {"Plan Rows": 7}}]') == 7
@@ -0,0 +1,42 @@
+import re
+from app.data_manager.manager import COUNT_SQL, PAGE_SQL
+from app.db.migrations import MIGRATIONS, IndexSpec, index_sql, pending
+
+
+def squash(sql):
+    return re.sub(r'\s+', ' ', sql).replace('( ', '(').replace(' )', ')')
+
+
+class TestMigrations:
+    def test_versions_are_unique_and_increasing(self):
+        versions = [m.version for m in MIGRATIONS]
+        assert versions == sorted(set(versions))
+
+    def test_pending_skips_applied_and_respects_target(self):
+        latest = MIGRATIONS[-1].version
+        assert [m.version for m in pending([])] == [m.version for m in MIGRATIONS]
+        assert pending(range(1, latest + 1)) == []
+        assert [m.version for m in pending([], target=1)] == [1]
+
+    def test_index_sql(self):
+        index = IndexSpec('ix_t', 'discussion', 'created_at, id', 'is_deleted = FALSE')
+        assert index_sql(index, concurrent=True) == (
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_t ON discussion (created_at, id) WHERE is_deleted = FALSE'
+        )
+        assert index_sql(index._replace(where=''), concurrent=False) == (
+            'CREATE INDEX IF NOT EXISTS ix_t ON discussion (created_at, id)'
+        )
+
+    def test_partial_index_predicate_matches_page_query(self):
+        # 迁移中的谓词是快照，运行时的查询条件改动后需要新的迁移重建索引
+        index = next(i for m in MIGRATIONS for i in m.indexes if i.name == 'ix_discussion_open_page')
+        assert squash(index.where) in squash(PAGE_SQL)
+        assert squash(index.where) in squash(COUNT_SQL)
+
+    def test_data_version_bumped_only_for_changed_rows_at_commit(self):
+        statements = ' '.join(next(m for m in MIGRATIONS if m.version == 3).statements)
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            assert re.search(rf'AFTER {event} ON discussion REFERENCING (NEW|OLD) TABLE AS changed_rows', statements)
+        assert 'EXISTS (SELECT 1 FROM changed_rows)' in statements
+        # 版本号行的锁只在提交时获取
+        assert 'CONSTRAINT TRIGGER data_version_bump AFTER INSERT ON data_version_pending DEFERRABLE INITIALLY DEFERRED' in statements
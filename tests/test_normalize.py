@@ -0,0 +1,59 @@
+import json
+import os
+import random
+import re
+import pytest
+from app.data_collect_clean import normalize
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "normalize_corpus.json")
+with open(CORPUS_PATH, "r", encoding="utf-8") as f:
+    CORPUS = json.load(f)
+BODIES = [body for bodies in CORPUS.values() for body in bodies]
+
+
+# 原先 BaseCleaner 中的实现，作为逐字节比对的基准
+def legacy_basic_clean(text):
+    text = re.sub(r"<.*?>", "", text)
+    return re.sub(r"[^一-龥a-zA-Z0-9，。！？；：、]", " ", text).strip()
+
+
+def legacy_basic_clean_before_llm(text):
+    text = re.sub(r"(?m)^\s*发件人：.*$", "", text)
+    text = re.sub(r"(?m)^\s*发送日期：.*$", "", text)
+    text = re.sub(r"(?m)^\s*收件人：.*$", "", text)
+    text = re.sub(r"\s+", " ", text)
+    return text.strip()
+
+
+def random_texts(count=2000, seed=0):
+    rng = random.Random(seed)
+    alphabet = list("abcXYZ019 \n\r\t\x0b\x1c<>/发件人送日期收：:安装失败，。！？；、\"'{}#*-_é 　龥龦😀")
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 200))) for _ in range(count)]
+
+
+class TestParity:
+    @pytest.mark.parametrize("body", BODIES)
+    def test_corpus(self, body):
+        assert normalize.basic_clean(body) == legacy_basic_clean(body)
+        assert normalize.clean_before_llm(body) == legacy_basic_clean_before_llm(body)
+
+    def test_random_texts(self):
+        for text in random_texts():
+            assert normalize.basic_clean(text) == legacy_basic_clean(text)
+            assert normalize.clean_before_llm(text) == legacy_basic_clean_before_llm(text)
+
+    def test_batches(self):
+        assert normalize.basic_clean_many(BODIES) == [legacy_basic_clean(b) for b in BODIES]
+        assert normalize.clean_before_llm_many(iter(BODIES)) == [legacy_basic_clean_before_llm(b) for b in BODIES]
+
+
+class TestDecodeQuotedJson:
+    @pytest.mark.parametrize("value,expected", [
+        ('"摘要\\n内容"', "摘要\n内容"),
+        ('"未闭合', '"未闭合'),
+        ("普通文本", "普通文本"),
+        ("", ""),
+        (None, None),
+    ])
+    def test_decode(self, value, expected):
+        assert normalize.decode_quoted_json(value) == expected
@@ -0,0 +1,100 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+import pytest
+from psycopg2 import extensions
+
+from app.data_manager.pool import ConnectionPool, PoolTimeout
+
+
+def make_conn(ping_error=None):
+    conn = MagicMock(closed=0)
+    conn.get_transaction_status.return_value = extensions.TRANSACTION_STATUS_IDLE
+    if ping_error:
+        conn.cursor.return_value.__enter__.return_value.execute.side_effect = ping_error
+    return conn
+
+
+class FakePool:
+    def __init__(self, conns):
+        self.conns = list(conns)
+        self.closed = []
+
+    def getconn(self):
+        return self.conns.pop(0)
+
+    def putconn(self, conn, close=False):
+        if close:
+            self.closed.append(conn)
+        else:
+            self.conns.append(conn)
+
+
+def make_pool(conns, **kwargs):
+    pool = ConnectionPool({}, min_size=0, **kwargs)
+    pool._pool = FakePool(conns)
+    return pool
+
+
+class TestConnectionPool:
+    def test_invalid_sizes(self):
+        with pytest.raises(ValueError):
+            ConnectionPool({}, min_size=3, max_size=2)
+
+    def test_lazy_creation(self):
+        with patch('app.data_manager.pool.pg_pool.ThreadedConnectionPool') as threaded:
+            pool = ConnectionPool({'dbname': 'x'}, min_size=1, max_size=2)
+            threaded.assert_not_called()
+            threaded.return_value.getconn.return_value = make_conn()
+            with pool.connection():
+                pass
+            threaded.assert_called_once_with(1, 2, dbname='x')
+
+    def test_connection_is_reused_and_counted(self):
+        conn = make_conn()
+        pool = make_pool([conn], max_size=1)
+        for _ in range(3):
+            with pool.connection() as c:
+                assert c is conn
+        stats = pool.stats()
+        assert stats['checkouts'] == 3
+        assert stats['in_use'] == 0
+        assert stats['discarded'] == 0
+
+    def test_waits_up_to_timeout_when_exhausted(self):
+        pool = make_pool([make_conn()], max_size=1, timeout=0.05)
+        held = pool.getconn()
+        with pytest.raises(PoolTimeout):
+            pool.getconn()
+        assert pool.stats()['timeouts'] == 1
+
+        released = threading.Timer(0.01, pool.putconn, args=(held,))
+        pool.timeout = 1
+        released.start()
+        assert pool.getconn() is held
+        released.join()
+
+    def test_stale_connection_failing_health_check_is_replaced(self):
+        stale, fresh = make_conn(ping_error=psycopg2.OperationalError('连接已断开')), make_conn()
+        pool = make_pool([stale, fresh], health_check_interval=0)
+        pool._last_used[id(stale)] = 0
+        assert pool.getconn() is fresh
+        assert pool._pool.closed == [stale]
+        assert pool.stats()['discarded'] == 1
+
+    def test_open_transaction_is_rolled_back_on_return(self):
+        conn = make_conn()
+        conn.get_transaction_status.return_value = extensions.TRANSACTION_STATUS_INERROR
+        pool = make_pool([conn])
+        pool.putconn(pool.getconn())
+        conn.rollback.assert_called_once()
+        assert pool._pool.conns == [conn]
+
+    def test_closed_connection_is_discarded_on_return(self):
+        conn = make_conn()
+        pool = make_pool([conn])
+        pool.getconn()
+        conn.closed = 1
+        pool.putconn(conn)
+        assert pool._pool.closed == [conn]
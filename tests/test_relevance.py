@@ -0,0 +1,72 @@
+import logging
+import pytest
+from app.data_collect_clean.relevance import RelevanceGate, RelevanceModel, evaluate, extract_features, train
+
+QUESTIONS = [
+    ("安装失败", "执行 dnf install gcc 报错 依赖冲突 请问如何解决"),
+    ("启动失败", "升级内核后系统无法启动 卡在 grub 请问怎么处理"),
+    ("编译报错", "make 时提示找不到头文件 请问需要安装哪个软件包"),
+    ("网络异常", "配置 bond 后网络不通 ping 不通网关 如何排查"),
+]
+NOTICES = [
+    ("【通知】例会纪要", "本周例会纪要如下 欢迎大家参加下周例会 会议链接见附件"),
+    ("CI 构建失败通知", "Build #1234 failed. This is an automated message from the CI bot."),
+    ("版本发布公告", "很高兴地宣布 新版本正式发布 欢迎下载试用 发布说明见官网"),
+    ("[bot] 自动同步", "This is an automated message. Sync job finished with status FAILED."),
+]
+
+
+def make_samples():
+    return [(t, b, 1) for t, b in QUESTIONS] * 5 + [(t, b, 0) for t, b in NOTICES] * 5
+
+
+@pytest.fixture(scope="module")
+def model():
+    return train(make_samples(), epochs=10)
+
+
+class TestRelevanceModel:
+    def test_features_are_normalized_and_bounded(self):
+        features = extract_features("标题", "正文" * 1000, 3, 64)
+        assert sum(1 for gram in features if "正文" in gram) == 3
+        assert abs(sum(v * v for v in features.values()) - 1.0) < 1e-9
+
+    def test_separates_questions_from_notices(self, model):
+        assert model.score("安装报错", "dnf install 依赖冲突 请问如何解决") > 0.5
+        assert model.score("例会通知", "本周例会纪要如下 欢迎大家参加") < 0.5
+        result = evaluate(model, make_samples(), 0.5)
+        assert result["precision"] == 1.0
+        assert result["recall"] == 1.0
+
+    def test_save_and_load(self, model, tmp_path):
+        path = str(tmp_path / "model.json")
+        model.save(path)
+        loaded = RelevanceModel.load(path)
+        for title, body in QUESTIONS + NOTICES:
+            assert abs(loaded.score(title, body) - model.score(title, body)) < 1e-3
+
+    def test_requires_both_labels(self):
+        with pytest.raises(ValueError):
+            train([("a", "b", 1)])
+
+    def test_prune_keeps_largest_weights(self):
+        model = RelevanceModel(weights={"abc": 0.5, "bcd": -2.0, "cde": 0.0, "def": 1.0}, max_features=2)
+        model.prune()
+        assert model.weights == {"bcd": -2.0, "def": 1.0}
+
+
+class TestRelevanceGate:
+    def test_disabled_without_model(self, tmp_path):
+        gate = RelevanceGate.from_config("drop", str(tmp_path / "missing.json"), 0.5)
+        assert not gate.enabled
+
+    def test_logs_low_score_decisions(self, model, caplog):
+        gate = RelevanceGate(model, "log", 0.5)
+        with caplog.at_level(logging.INFO, logger="app.data_collect_clean.relevance.decisions"):
+            relevant, score = gate.is_relevant("mail", {"id": 1, "title": "例会通知", "body": "本周例会纪要如下"})
+        assert not relevant
+        assert "mail:1" in caplog.text
+
+    def test_unknown_mode(self, model):
+        with pytest.raises(ValueError):
+            RelevanceGate(model, "skip")
@@ -0,0 +1,130 @@
+import asyncio
+from datetime import datetime
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from app.data_manager import api
+from app.data_manager.response_cache import ResponseCache, etag_matches, render
+from app.db.data_version import DataVersion
+
+
+class TestResponseCache:
+    def test_render_matches_json_response(self):
+        payload = {'data': [{'title': '中文', 'created_at': datetime(2024, 1, 1)}], 'n': None}
+        assert render(payload) == JSONResponse(jsonable_encoder(payload)).body
+
+    def test_entry_invalidated_by_version(self):
+        cache = ResponseCache()
+        entry = cache.put('k', 1, b'{}')
+        assert cache.get('k', 1) == entry
+        assert cache.get('k', 2) is None
+        assert cache.stats()['entries'] == 0
+
+    def test_lru_eviction_by_entries(self):
+        cache = ResponseCache(max_entries=2)
+        cache.put('a', 1, b'a')
+        cache.put('b', 1, b'b')
+        cache.get('a', 1)
+        cache.put('c', 1, b'c')
+        assert cache.get('b', 1) is None
+        assert cache.get('a', 1) is not None
+        assert cache.stats()['evictions'] == 1
+
+    def test_bounded_bytes(self):
+        cache = ResponseCache(max_bytes=10)
+        cache.put('a', 1, b'12345')
+        cache.put('b', 1, b'123456')
+        assert cache.get('a', 1) is None
+        assert cache.stats()['bytes'] == 6
+        cache.put('big', 1, b'x' * 11)
+        assert cache.get('big', 1) is None
+
+    def test_etag_matching(self):
+        assert etag_matches('"abc"', '"abc"')
+        assert etag_matches('"x", W/"abc"', '"abc"')
+        assert etag_matches('*', '"abc"')
+        assert not etag_matches('"abcd"', '"abc"')
+        assert not etag_matches(None, '"abc"')
+
+
+class TestCachedEndpoints:
+    def make_client(self):
+        app = FastAPI()
+        app.include_router(api.router, prefix='/api/v1')
+        return TestClient(app)
+
+    def test_304_without_querying_until_data_changes(self):
+        calls = []
+        stored_version = [1]
+
+        async def read(method, *args):
+            if method == 'get_data_version':
+                return stored_version[0]
+            calls.append(method)
+            return [{'id': len(calls)}]
+
+        with patch.object(api.settings, 'response_cache_enabled', True, create=True), \
+                patch.object(api, 'response_cache', ResponseCache()), \
+                patch.object(api, 'data_version', DataVersion(poll_interval=0)), \
+                patch.object(api, 'read', read):
+            client = self.make_client()
+            first = client.get('/api/v1/latest', params={'page_size': 10})
+            assert first.status_code == 200
+            etag = first.headers['etag']
+            assert first.json()['data'] == [{'id': 1}]
+
+            second = client.get('/api/v1/latest', params={'page_size': 10}, headers={'If-None-Match': etag})
+            assert second.status_code == 304
+            assert second.headers['etag'] == etag
+            assert len(calls) == 1
+
+            # 其他进程写入后数据库中的版本号变化，重新查询；内容不变时 ETag 也不变，仍返回 304
+            stored_version[0] = 2
+            assert client.get('/api/v1/latest', params={'page_size': 10}).headers['etag'] != etag
+            etag = client.get('/api/v1/latest', params={'page_size': 10}).headers['etag']
+            assert client.get(
+                '/api/v1/latest', params={'page_size': 10}, headers={'If-None-Match': etag}
+            ).status_code == 304
+            assert len(calls) == 2
+
+            stored_version[0] = 3
+            third = client.get('/api/v1/latest', params={'page_size': 10}, headers={'If-None-Match': etag})
+            assert third.status_code == 200
+            assert len(calls) == 3
+
+    def test_no_caching_without_data_version(self):
+        calls = []
+
+        async def read(method, *args):
+            if method == 'get_data_version':
+                raise RuntimeError('relation "data_version" does not exist')
+            calls.append(method)
+            return []
+
+        with patch.object(api.settings, 'response_cache_enabled', True, create=True), \
+                patch.object(api, 'response_cache', ResponseCache()) as cache, \
+                patch.object(api, 'data_version', DataVersion(poll_interval=0)), \
+                patch.object(api, 'read', read):
+            client = self.make_client()
+            assert 'etag' not in client.get('/api/v1/latest').headers
+            client.get('/api/v1/latest')
+            assert len(calls) == 2
+            assert cache.stats()['entries'] == 0
+
+    def test_invalid_cursor_is_not_cached(self):
+        versions = DataVersion(poll_interval=3600)
+
+        async def fetch_version():
+            return 1
+
+        asyncio.run(versions.refresh(fetch_version))
+        with patch.object(api.settings, 'response_cache_enabled', True, create=True), \
+                patch.object(api, 'response_cache', ResponseCache()) as cache, \
+                patch.object(api, 'data_version', versions):
+            response = self.make_client().get('/api/v1/data', params={'cursor': '!!!'})
+            assert response.status_code == 400
+            assert cache.stats()['entries'] == 0
@@ -0,0 +1,58 @@
+from app.data_collect_clean.tokens import (
+    estimate_tokens,
+    fit_to_budget,
+    split_chunks,
+    truncate_blocks,
+)
+
+
+class TestEstimateTokens:
+    def test_mixed_text(self):
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("中文") == 2
+        assert estimate_tokens("abcdefgh") == 2
+        assert estimate_tokens("中文abcd") == 3
+
+
+class TestTruncateBlocks:
+    def test_code_block_keeps_head_and_tail(self):
+        code = "\n".join(f"line {i}" for i in range(50))
+        text = f"描述\n```\n{code}\n```\n结尾"
+        result = truncate_blocks(text, head_lines=2, tail_lines=1)
+        assert result.split("\n") == [
+            "描述", "```", "line 0", "line 1", "...（省略 47 行）...", "line 49", "```", "结尾",
+        ]
+
+    def test_log_run_is_truncated(self):
+        log = "\n".join(f"2024-01-01 10:00:{i:02d} ERROR failed" for i in range(40))
+        result = truncate_blocks(f"问题描述\n{log}\n后续说明", head_lines=3, tail_lines=2)
+        lines = result.split("\n")
+        assert lines[0] == "问题描述"
+        assert lines[4] == "...（省略 35 行）..."
+        assert lines[-1] == "后续说明"
+        assert len(lines) == 8
+
+    def test_short_text_untouched(self):
+        text = "安装失败\nERROR: x\n请帮忙看看"
+        assert truncate_blocks(text) == text
+
+
+class TestBudget:
+    def test_fit_to_budget_keeps_head_and_tail(self):
+        text = "a" * 1000 + "b" * 1000
+        result = fit_to_budget(text, 100)
+        assert result.startswith("a")
+        assert result.endswith("b")
+        assert estimate_tokens(result) <= 120
+
+    def test_split_chunks_respects_budget(self):
+        text = "\n".join("中文内容" * 10 for _ in range(20))
+        chunks = split_chunks(text, 100)
+        assert len(chunks) > 1
+        assert "\n".join(chunks) == text
+        assert all(estimate_tokens(c) <= 100 for c in chunks)
+
+    def test_split_single_long_line(self):
+        chunks = split_chunks("中" * 1000, 100)
+        assert "".join(chunks) == "中" * 1000
+        assert all(estimate_tokens(c) <= 100 for c in chunks)
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock, patch
+import httpx
+import openai
+import pytest
+from app.db.work_queue import DEAD, FAILED, REJECTED, WorkQueue, is_retryable, to_json
+
+
+class TestToJson:
+    def test_serializes_datetimes(self):
+        record = {'id': 1, 'created_at': datetime(2024, 1, 2, 3, 4, 5), 'tags': ('a', 'b')}
+        assert to_json(record) == {'id': 1, 'created_at': '2024-01-02 03:04:05', 'tags': ['a', 'b']}
+
+
+class TestDeadLetter:
+    @pytest.mark.parametrize("error,expected", [
+        (TimeoutError("timeout"), True),
+        (openai.APITimeoutError(request=httpx.Request("POST", "https://x")), True),
+        (ValueError("本数据无效"), False),
+        (openai.BadRequestError(
+            "bad", response=httpx.Response(400, request=httpx.Request("POST", "https://x")), body=None
+        ), False),
+    ])
+    def test_is_retryable(self, error, expected):
+        assert is_retryable(error) == expected
+
+    def test_retry_delay_is_exponential_and_capped(self):
+        queue = WorkQueue(retry_base_minutes=15, retry_max_minutes=60)
+        assert [queue.retry_delay(n) for n in (1, 2, 3, 4)] == [
+            timedelta(minutes=15), timedelta(minutes=30), timedelta(minutes=60), timedelta(minutes=60)
+        ]
+
+    def test_mark_failed_sets_state_attempts_and_next_retry(self):
+        queue = WorkQueue(max_attempts=3)
+        items = [
+            Mock(source_id='1', attempts=0),
+            Mock(source_id='2', attempts=2),
+            Mock(source_id='3', attempts=None),
+        ]
+        failures = {'1': TimeoutError('超时'), '2': TimeoutError('超时'), '3': ValueError('本数据无效')}
+        with patch('app.db.base.SessionLocal') as mock_session:
+            session = mock_session.return_value.__enter__.return_value
+            session.query.return_value.filter.return_value = items
+            queue.mark_failed(1, 'issue', failures)
+            session.commit.assert_called_once()
+
+        assert (items[0].state, items[0].attempts, items[0].error_class) == (FAILED, 1, 'TimeoutError')
+        assert items[0].next_retry_at > datetime.now(timezone.utc)
+        assert (items[1].state, items[1].attempts, items[1].next_retry_at) == (DEAD, 3, None)
+        assert (items[2].state, items[2].attempts) == (REJECTED, 1)